@@ -1,3 +1,23 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from shop.models import Cart, Product
 
-# Create your tests here.
+User = get_user_model()
+
+
+class LoginCartMergeTests(TestCase):
+    def setUp(self):
+        User.objects.create_user("ana", "ana@example.com", "clave-segura-123")
+        self.product = Product.objects.create(name="Mesa", slug="mesa", price=Decimal("100.00"), stock=5)
+
+    def test_guest_cart_survives_login(self):
+        r = self.client.post("/api/cart/items/", {"product_id": self.product.id, "qty": 2}, content_type="application/json")
+        self.assertEqual(r.status_code, 201)
+        r = self.client.post(
+            "/api/auth/login/", {"username": "ana", "password": "clave-segura-123"}, content_type="application/json"
+        )
+        self.assertEqual(r.json(), {"detail": "logged"})
+        cart = Cart.objects.get(user__username="ana")
+        self.assertEqual(list(cart.items.values_list("product_id", "qty")), [(self.product.id, 2)])
+        self.assertFalse(Cart.objects.filter(user=None).exists())
@@ -7,6 +7,7 @@ from django.views.decorators.csrf import ensure_csrf_cookie
 from django.utils.decorators import method_decorator
 from .serializers import RegisterSerializer
 from shop.utils import merge_guest_cart_to_user
+from shop.guest_cart import read_lines, write_lines
 import logging
 
 class Ping(APIView):
@@ -43,11 +44,16 @@ class Login(APIView):
         if not user:
             return Response({"detail": "invalid_credentials"}, status=400)
 
+        guest_key = request.session.session_key  # login() rota la llave de sesión
+        guest_lines = read_lines(request)  # carrito de invitado en cookie
         login(request, user)
 
         # <-- FUSIÓN DE CARRITO INVITADO -> USUARIO
         try:
-            merged = merge_guest_cart_to_user(request, user)
+            merged = merge_guest_cart_to_user(request, user, session_key=guest_key, guest_lines=guest_lines)
+            if guest_lines:
+                write_lines(request, [])
+            logger.debug("Cart merge: %s", merged)
             # Si quieres devolver info del merge, descomenta:
             # return Response({"detail": "logged", **merged})
         except Exception as e:
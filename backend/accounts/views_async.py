@@ -0,0 +1,14 @@
+from django.views.decorators.http import require_GET
+from shop.views_async import json_response
+
+@require_GET
+async def me(request):
+    user = await request.auser()
+    if user.is_authenticated:
+        return json_response({
+            "authenticated": True,
+            "username": user.username,
+            "email": user.email,
+            "is_staff": user.is_staff,
+        })
+    return json_response({"authenticated": False})
@@ -43,12 +43,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'shop.querybudget.query_budget_middleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'shop.guest_cart.guest_cart_middleware',
+    'shop.profiling.server_timing_middleware',
+    'shop.dbrouter.replica_middleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -81,6 +85,41 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # BEGIN IMMEDIATE: las transacciones que escriben toman el lock al inicio
+        # y esperan (timeout) en vez de fallar con "database is locked" al escalar.
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # Base de tests en archivo (no en memoria compartida) para que los tests
+        # concurrentes usen el mismo locking que en producción.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+# Réplicas de lectura: alias de DATABASES a los que van las lecturas de las
+# vistas marcadas con @read_replica (ver shop/dbrouter.py). Tras escribir, el
+# cliente lee del primario por SHOP_DB_STICKY_SECONDS. Para probar en local
+# basta otro alias sobre el mismo archivo:
+#   DATABASES["replica1"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+#   SHOP_DB_REPLICAS = ["replica1"]
+SHOP_DB_REPLICAS = []
+SHOP_DB_STICKY_SECONDS = 5
+DATABASE_ROUTERS = ["shop.dbrouter.ReplicaRouter"]
+
+# Cache compartido entre procesos: ahí vive la versión del catálogo
+# (shop/catalog.py), que cada worker lee en cada request para invalidar su LRU.
+# Con el LocMemCache por defecto cada proceso tendría la suya y un cambio en uno
+# no llegaría a los demás. En archivos alcanza para varios workers en un host;
+# con varios hosts, Redis o Memcached (django.core.cache.backends.redis.RedisCache).
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+        # Si se descarta la versión sólo se pierden las páginas cacheadas
+        "OPTIONS": {"MAX_ENTRIES": 10000},
     }
 }
 
@@ -98,10 +137,131 @@ CSRF_TRUSTED_ORIGINS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.SessionAuthentication",
+        "shop.profiling.SessionAuthentication",
+    ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "shop.profiling.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ],
 }
 
+# Catálogo, búsqueda, carrito y órdenes se arman sin los serializers de DRF
+# (mismo JSON, ver shop/fastserializers.py); False vuelve a los serializers
+SHOP_FAST_SERIALIZERS = True
+
+# Catálogo: tamaño de página por defecto y máximo para /api/products/
+SHOP_CATALOG_PAGE_SIZE = 48
+SHOP_CATALOG_MAX_PAGE_SIZE = 200
+# Resultados por defecto y máximo de /api/products/search/
+SHOP_SEARCH_PAGE_SIZE = 20
+SHOP_SEARCH_MAX_PAGE_SIZE = 100
+# Operaciones por request en /api/admin/products/batch/ y /api/cart/batch/
+SHOP_PRODUCT_BATCH_MAX = 5000
+SHOP_CART_BATCH_MAX = 100
+# Listados paginados del admin (órdenes)
+SHOP_ADMIN_PAGE_SIZE = 50
+SHOP_ADMIN_MAX_PAGE_SIZE = 200
+# Cache de páginas del catálogo: entradas del LRU por proceso y TTL en el cache de Django
+SHOP_CATALOG_CACHE_SIZE = 256
+SHOP_CATALOG_CACHE_TIMEOUT = 300
+# Números de orden reservados por worker de una vez (1 = sin bloques ni huecos)
+SHOP_ORDER_NUMBER_BLOCK = 1
+# Reservas de stock al agregar al carrito (segundos de vigencia). Los vencidos
+# se limpian con `manage.py release_expired_holds`.
+SHOP_STOCK_HOLDS = False
+SHOP_STOCK_HOLD_TTL = 15 * 60
+# Variantes de imágenes de producto: lado mayor en px por variante, formatos
+# modernos a generar (además de un jpeg/png de respaldo) y procesos del pool
+# (0 = generarlas en el mismo request, útil en tests).
+SHOP_IMAGE_VARIANTS = {"thumb": 160, "card": 480, "detail": 1200}
+SHOP_IMAGE_FORMATS = ["webp"]  # agregar "avif" si Pillow tiene soporte
+SHOP_IMAGE_WORKERS = 2
+# Subidas por partes (MEDIA_ROOT/uploads/): tamaño máximo de archivo y de cada parte
+SHOP_UPLOAD_MAX_SIZE = 100 * 1024 * 1024
+SHOP_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# Segundos sin partes nuevas tras los que una subida se abandona; las vencidas
+# (y sus .part) se borran con `manage.py cleanup_uploads`
+SHOP_UPLOAD_TTL = 24 * 3600
+# Imágenes guardadas por contenido (shop/storage.py): cuánto las cachean
+# navegadores y CDN, y cuántos segundos se respeta un blob recién escrito o
+# reusado antes de borrarlo (la fila que lo usa puede no estar guardada aún)
+SHOP_MEDIA_MAX_AGE = 365 * 24 * 3600
+SHOP_MEDIA_GRACE_SECONDS = 60
+# Presupuesto de consultas por request (None = sin límite). Por ruta con
+# "<MÉTODO> <ruta>" tal como queda en request.resolver_match.route; los tests de
+# shop/tests.py exigen que cada ruta tenga el suyo y lo miden sin la transacción
+# del test (BEGIN/COMMIT y savepoints no cuentan). Con SHOP_QUERY_BUDGET_RAISE
+# (DEBUG y tests) exceder el presupuesto en un request que no escribió es un
+# error en vez de un warning. Los costos por elemento de la entrada y los de las
+# reservas de stock (SHOP_STOCK_HOLDS) se suman aparte con querybudget.allow_queries.
+SHOP_QUERY_BUDGET = 20
+SHOP_QUERY_BUDGET_RAISE = DEBUG
+SHOP_QUERY_BUDGET_ROUTES = {
+    "GET api/ping/": 0,
+    "GET api/csrf/": 0,
+    "POST api/auth/register/": 7,
+    "POST api/auth/login/": 11,
+    "POST api/auth/logout/": 4,
+    "GET api/auth/me/": 2,
+    "GET api/async/auth/me/": 2,
+    "GET api/products/": 3,
+    "GET api/async/products/": 1,
+    "GET api/products/search/": 2,
+    "GET api/products/availability/": 1,
+    "GET api/cart/": 4,
+    "GET api/async/cart/": 4,
+    "POST api/cart/items/": 7,
+    "PATCH api/cart/items/<sint:item_id>/": 6,
+    "DELETE api/cart/items/<sint:item_id>/delete/": 6,
+    # Fijo para cualquier cantidad de operaciones
+    "POST api/cart/batch/": 8,
+    "GET api/checkout/summary/": 4,
+    "GET api/async/checkout/summary/": 4,
+    # Medido 14 (+1 de margen). Aparte, un UPDATE condicional de stock por
+    # producto del carrito (sin sobreventa), que reserve_stock suma con allow_queries
+    "POST api/checkout/confirm/": 15,
+    "GET api/": 2,
+    "GET api/admin/products/$": 4,
+    "POST api/admin/products/$": 5,
+    "GET api/admin/products/(?P<pk>[^/.]+)/$": 4,
+    "PUT api/admin/products/(?P<pk>[^/.]+)/$": 7,
+    "PATCH api/admin/products/(?P<pk>[^/.]+)/$": 6,
+    "DELETE api/admin/products/(?P<pk>[^/.]+)/$": 11,
+    "POST api/admin/products/batch/$": 4,
+    "GET api/admin/products/export/$": 3,
+    "POST api/admin/products/import/$": 5,
+    "POST api/admin/products/<int:pk>/upload-main/": 5,
+    "POST api/admin/products/<int:pk>/gallery/": 4,
+    "DELETE api/admin/products/gallery/<int:img_id>/delete/": 5,
+    "POST api/admin/products/<int:pk>/gallery/uploads/": 4,
+    "GET api/admin/uploads/<uuid:upload_id>/": 3,
+    "PUT api/admin/uploads/<uuid:upload_id>/": 5,
+    "DELETE api/admin/uploads/<uuid:upload_id>/": 4,
+    "POST api/admin/uploads/<uuid:upload_id>/finalize/": 6,
+    "GET api/admin/orders/$": 4,
+    "GET api/admin/orders/(?P<pk>[^/.]+)/$": 4,
+    "GET api/admin/orders/export/$": 4,
+    # Fijo: los resúmenes de ventas se mueven con un upsert por tabla (shop/analytics.py)
+    "PATCH api/admin/orders/<int:pk>/status/": 8,
+    "GET api/admin/catalog/cache/": 2,
+    "GET api/admin/analytics/sales/": 5,
+}
+# Reportes de ventas del admin (/api/admin/analytics/sales/): rango por defecto
+# y máximo de productos en el ranking
+SHOP_ANALYTICS_DEFAULT_DAYS = 30
+SHOP_ANALYTICS_MAX_TOP = 100
+# Header Server-Timing con el tiempo por fase de cada request (ver shop/profiling.py)
+# y perfiles cProfile en SHOP_PROFILE_DIR: una fracción de requests al azar, o el
+# request de un usuario staff que mande el header X-Profile: 1. Sin DEBUG el
+# header sólo sale en ese último caso (expone tiempos y consultas de la base).
+SHOP_SERVER_TIMING = DEBUG
+SHOP_PROFILE_SAMPLE_RATE = 0.0
+SHOP_PROFILE_DIR = BASE_DIR / "profiles"
+# Carrito de invitado en cookie firmada (sin sesión ni filas hasta el checkout
+# o hasta superar SHOP_GUEST_CART_MAX_LINES líneas). Se desactiva con SHOP_STOCK_HOLDS.
+SHOP_GUEST_CART_COOKIE = True
+SHOP_GUEST_CART_MAX_LINES = 20
+
 CSRF_COOKIE_SECURE = False
 SESSION_COOKIE_SECURE = False
 SESSION_COOKIE_SAMESITE = "Lax"
@@ -14,9 +14,12 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from accounts.views import Csrf, Register, Login, Logout, Me, Ping
+from accounts import views_async as accounts_async
+from shop.media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -30,6 +33,13 @@ urlpatterns = [
 
     path('api/', include('shop.urls')),   # <— aquí
     path('api/', include('shop.urls_admin')),  # <— aquí también
+
+    # Lecturas async (ASGI), mismas respuestas que las de arriba
+    path('api/async/auth/me/', accounts_async.me),
+    path('api/async/', include('shop.urls_async')),
+
+    # Imágenes con ETag, Range y cache inmutable para los blobs (shop/media.py)
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", serve_media),
 ]
 
 
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from .analytics import record_status_change
 from .models import Product, ProductImage, Cart, CartItem, Order, OrderItem
 
 class ProductImageInline(admin.TabularInline):
@@ -24,3 +25,10 @@ class OrderItemInline(admin.TabularInline):
 class OrderAdmin(admin.ModelAdmin):
     list_display = ("number", "email", "total", "status", "created_at")
     inlines = [OrderItemInline]
+
+    def save_model(self, request, obj, form, change):
+        # Los cambios de estado mueven los resúmenes de ventas; otros cambios
+        # hechos a mano requieren `manage.py rebuild_sales_rollups`
+        super().save_model(request, obj, form, change)
+        if change and "status" in form.changed_data:
+            record_status_change(obj, form.initial["status"])
@@ -0,0 +1,188 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.apps import apps as django_apps
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .exports import local_day_start
+from .models import DailyProductSales, DailySales, Order, OrderItem, Product
+
+# Resúmenes diarios de ventas (DailySales / DailyProductSales) para los reportes
+# del admin: se mantienen con sumas incrementales en la misma transacción que
+# crea la orden o cambia su estado, así los reportes leen unas pocas filas por
+# día en vez de recorrer órdenes y líneas. El día es el local de created_at y
+# cada orden cuenta en el estado que tiene ahora.
+
+REBUILD_BATCH_SIZE = 1000
+# Filas por INSERT de _upsert (5 parámetros por fila, bajo el límite de SQLite)
+UPSERT_BATCH_SIZE = 150
+
+def _upsert(model, keys: tuple, rows: list):
+    """
+    INSERT de varias filas {campo: valor}; si ya existe la fila con esos
+    `keys`, le suma los demás campos (ON CONFLICT ... DO UPDATE, SQLite y
+    Postgres). Una consulta por cada UPSERT_BATCH_SIZE filas, sin savepoints.
+    """
+    if not rows:
+        return
+    connection = connections[router.db_for_write(model)]
+    qn = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in rows[0]]
+    table = qn(model._meta.db_table)
+    columns = ", ".join(qn(f.column) for f in fields)
+    conflict = ", ".join(qn(model._meta.get_field(k).column) for k in keys)
+    sums = ", ".join(
+        f"{qn(f.column)} = {table}.{qn(f.column)} + excluded.{qn(f.column)}" for f in fields if f.name not in keys
+    )
+    placeholder = f"({', '.join(['%s'] * len(fields))})"
+    with connection.cursor() as c:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            c.execute(
+                f"INSERT INTO {table} ({columns}) VALUES {', '.join([placeholder] * len(batch))} "
+                f"ON CONFLICT ({conflict}) DO UPDATE SET {sums}",
+                [f.get_db_prep_save(row[f.name], connection) for row in batch for f in fields],
+            )
+
+def _order_lines(order) -> dict:
+    """{product_id: (unidades, venta)} de la orden."""
+    rows = (
+        OrderItem.objects.filter(order=order).values("product_id")
+        .annotate(units=Sum("qty"), revenue=Sum("subtotal")).order_by()
+    )
+    return {r["product_id"]: (r["units"], r["revenue"]) for r in rows}
+
+def _apply(order, moves):
+    """
+    Suma la orden con signo en cada estado de `moves` = [(estado, líneas, ±1)]:
+    un upsert para DailySales y otro para todas las filas de producto.
+    """
+    day = timezone.localdate(order.created_at)
+    daily, products = [], []
+    for status, lines, sign in moves:
+        daily.append({
+            "day": day, "status": status, "orders": sign,
+            "units": sign * sum(units for units, _ in lines.values()),
+            "revenue": sign * order.total,
+        })
+        products += [
+            {"day": day, "status": status, "product": product_id, "units": sign * units, "revenue": sign * revenue}
+            for product_id, (units, revenue) in sorted(lines.items())
+        ]
+    _upsert(DailySales, ("day", "status"), daily)
+    _upsert(DailyProductSales, ("day", "status", "product"), products)
+
+def record_order(order, lines: dict = None):
+    """Suma una orden recién creada. `lines` = {product_id: (unidades, venta)} si ya se conocen."""
+    _apply(order, [(order.status, _order_lines(order) if lines is None else lines, 1)])
+
+def record_status_change(order, old_status: str):
+    """Mueve la orden de `old_status` a su estado actual."""
+    if old_status == order.status:
+        return
+    lines = _order_lines(order)
+    _apply(order, [(old_status, lines, -1), (order.status, lines, 1)])
+
+@transaction.atomic
+def rebuild_rollups(date_from=None, date_to=None, apps=django_apps) -> dict:
+    """
+    Recalcula los resúmenes desde las órdenes (todo, o los días entre
+    date_from y date_to inclusive). `apps` permite usarlo desde una migración.
+    """
+    Order = apps.get_model("shop", "Order")
+    OrderItem = apps.get_model("shop", "OrderItem")
+    DailySales = apps.get_model("shop", "DailySales")
+    DailyProductSales = apps.get_model("shop", "DailyProductSales")
+
+    orders = Order.objects.all()
+    days = {}
+    if date_from:
+        orders = orders.filter(created_at__gte=local_day_start(date_from))
+        days["day__gte"] = date_from
+    if date_to:
+        orders = orders.filter(created_at__lt=local_day_start(date_to + timedelta(days=1)))
+        days["day__lte"] = date_to
+    DailySales.objects.filter(**days).delete()
+    DailyProductSales.objects.filter(**days).delete()
+
+    daily = {
+        (r["day"], r["status"]): DailySales(day=r["day"], status=r["status"], orders=r["orders"], revenue=r["revenue"])
+        for r in orders.annotate(day=TruncDate("created_at")).values("day", "status")
+        .annotate(orders=Count("id"), revenue=Sum("total")).order_by()
+    }
+    products = []
+    for r in (
+        OrderItem.objects.filter(order__in=orders)
+        .annotate(day=TruncDate("order__created_at"), status=F("order__status"))
+        .values("day", "status", "product_id").annotate(units=Sum("qty"), revenue=Sum("subtotal")).order_by()
+    ):
+        daily[r["day"], r["status"]].units += r["units"]
+        products.append(DailyProductSales(
+            day=r["day"], status=r["status"], product_id=r["product_id"], units=r["units"], revenue=r["revenue"],
+        ))
+    DailySales.objects.bulk_create(daily.values(), batch_size=REBUILD_BATCH_SIZE)
+    DailyProductSales.objects.bulk_create(products, batch_size=REBUILD_BATCH_SIZE)
+    return {"days": len({day for day, _ in daily}), "rows": len(daily), "product_rows": len(products)}
+
+def parse_range(params, default_days: int):
+    """date_from y date_to (YYYY-MM-DD, inclusive); por defecto los últimos `default_days` días."""
+    parsed = {}
+    for key in ("date_from", "date_to"):
+        raw = params.get(key)
+        if not raw:
+            continue
+        try:
+            parsed[key] = parse_date(raw)
+        except ValueError:
+            parsed[key] = None
+        if parsed[key] is None:
+            raise ValueError("invalid_date")
+    date_to = parsed.get("date_to") or timezone.localdate()
+    date_from = parsed.get("date_from") or date_to - timedelta(days=default_days - 1)
+    if date_from > date_to:
+        raise ValueError("invalid_date")
+    return date_from, date_to
+
+def parse_statuses(raw) -> list:
+    """Lista separada por comas; por defecto todo menos las canceladas."""
+    valid = dict(Order.STATUS_CHOICES)
+    if not raw:
+        return [s for s in valid if s != "cancelled"]
+    statuses = [s.strip() for s in raw.split(",") if s.strip()]
+    if not statuses or any(s not in valid for s in statuses):
+        raise ValueError("invalid_status")
+    return statuses
+
+def _money(value) -> str:
+    return f"{value or Decimal('0'):.2f}"
+
+def sales_report(date_from, date_to, statuses, top: int) -> dict:
+    """Serie diaria, totales y productos más vendidos del rango, leídos de los resúmenes."""
+    scope = {"day__gte": date_from, "day__lte": date_to, "status__in": statuses}
+    days = list(
+        DailySales.objects.filter(**scope).exclude(orders=0).values("day")
+        .annotate(orders=Sum("orders"), units=Sum("units"), revenue=Sum("revenue")).order_by("day")
+    )
+    top_products = list(
+        DailyProductSales.objects.filter(**scope).exclude(units=0).values("product_id")
+        .annotate(units=Sum("units"), revenue=Sum("revenue")).order_by("-units", "-revenue", "product_id")[:top]
+    )
+    # Los nombres al final, sólo para el top (el JOIN por fila encarece la agregación)
+    names = dict(Product.objects.filter(pk__in=[p["product_id"] for p in top_products]).values_list("id", "name"))
+    return {
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "statuses": statuses,
+        "totals": {
+            "orders": sum(d["orders"] for d in days),
+            "units": sum(d["units"] for d in days),
+            "revenue": _money(sum((d["revenue"] for d in days), Decimal("0"))),
+        },
+        "days": [{**d, "day": d["day"].isoformat(), "revenue": _money(d["revenue"])} for d in days],
+        "top_products": [
+            {"product_id": p["product_id"], "name": names.get(p["product_id"]), "units": p["units"], "revenue": _money(p["revenue"])}
+            for p in top_products
+        ],
+    }
@@ -0,0 +1,131 @@
+from decimal import Decimal
+from django.db import transaction
+from .guest_cart import GuestCart, guest_cookie_mode, read_lines, save_guest_lines
+from .holds import hold_stock_many, holds_enabled, release_holds
+from .models import CartItem, Product
+from .utils import get_or_create_cart, prefetch_cart
+
+# Varias operaciones sobre el carrito en un request (add / set / remove, en
+# orden). Se aplican primero en memoria sobre {product_id: (qty, precio)}, así
+# un lote que falla no escribe nada, y después se escriben sólo las diferencias:
+# un bulk_create, un bulk_update y un DELETE, en vez de un request (y un
+# get_or_create_cart y un CartSerializer completo) por línea.
+# Las líneas se identifican con item_id (negativo = -product_id, como en el
+# carrito de invitado) o con product_id.
+
+CART_OPS = ("add", "set", "remove")
+
+class CartBatchError(ValueError):
+    """El lote no se aplicó; `errors` trae {index, errors} por operación."""
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("invalid_operations")
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def clean_cart_operation(op):
+    """(operación normalizada, errores por campo)."""
+    if not isinstance(op, dict):
+        return None, {"operation": "invalid"}
+    kind = op.get("op")
+    clean, errors = {"op": kind}, {}
+    if kind not in CART_OPS:
+        errors["op"] = "invalid"
+    keys = ("product_id",) if kind == "add" else ("item_id", "product_id")
+    given = [k for k in keys if op.get(k) is not None]
+    if len(given) != 1:
+        errors[keys[0]] = "required" if kind == "add" else "item_id_or_product_id_required"
+    elif not _is_int(op[given[0]]) or (given[0] == "product_id" and op[given[0]] < 1):
+        errors[given[0]] = "invalid"
+    else:
+        clean[given[0]] = op[given[0]]
+    if kind in ("add", "set"):
+        qty = op.get("qty", 1 if kind == "add" else None)
+        if not _is_int(qty) or qty < (1 if kind == "add" else 0):
+            errors["qty"] = "invalid"
+        clean["qty"] = qty
+    return clean, errors
+
+def _apply(cleaned, lines: dict, item_ids: dict, products: dict):
+    """
+    Aplica las operaciones sobre una copia de `lines` ({product_id: (qty, precio)}).
+    Devuelve (líneas finales, product_ids creados o cambiados, product_ids
+    quitados, {product_id: índice de la última operación}).
+    """
+    final, last, errors = dict(lines), {}, []
+    for index, c in cleaned:
+        key = "product_id" if "product_id" in c else "item_id"
+        pid = c["product_id"] if key == "product_id" else item_ids.get(c["item_id"])
+        if c["op"] == "add":
+            product = products.get(pid)
+            if product is None:
+                errors.append({"index": index, "errors": {key: "not_found"}})
+                continue
+            qty, price = final.get(pid, (0, product.price))
+            final[pid] = (qty + c["qty"], price)
+        elif pid not in final:
+            errors.append({"index": index, "errors": {key: "not_found"}})
+            continue
+        elif c["op"] == "remove" or c["qty"] < 1:
+            del final[pid]
+        else:
+            final[pid] = (c["qty"], final[pid][1])
+        last[pid] = index
+    if errors:
+        raise CartBatchError(errors)
+    changed = [pid for pid, (qty, _) in final.items() if lines.get(pid, (None,))[0] != qty]
+    removed = [pid for pid in lines if pid not in final]
+    return final, changed, removed, last
+
+def apply_cart_batch(request, operations):
+    """
+    Aplica todas las operaciones o ninguna (CartBatchError). Devuelve
+    (carrito con sus items cargados, product_ids creados o cambiados, ids de
+    los items quitados). Si el lote pasó un carrito de invitado a la base, los
+    ids de sus items cambian y no hay delta: devuelve (carrito, None, None).
+    """
+    cleaned, errors = [], []
+    for index, op in enumerate(operations):
+        clean, errs = clean_cart_operation(op)
+        if errs:
+            errors.append({"index": index, "errors": errs})
+        else:
+            cleaned.append((index, clean))
+    if errors:
+        raise CartBatchError(errors)
+    add_ids = {c["product_id"] for _, c in cleaned if c["op"] == "add"}
+    products = Product.objects.filter(is_active=True).in_bulk(add_ids) if add_ids else {}
+
+    if guest_cookie_mode(request, request.user):
+        lines = {pid: (qty, Decimal(price)) for pid, qty, price in read_lines(request)}
+        final, changed, removed, _ = _apply(cleaned, lines, {-pid: pid for pid in lines}, products)
+        cart = save_guest_lines(request, [[pid, qty, str(price)] for pid, (qty, price) in final.items()])
+        if not isinstance(cart, GuestCart):
+            return cart, None, None
+        return cart, changed, [-pid for pid in removed]
+
+    # Fuera del atomic: si el lote falla, la sesión recién creada tiene que quedar
+    cart = get_or_create_cart(request)
+    with transaction.atomic():
+        items = {it.product_id: it for it in CartItem.objects.filter(cart=cart).order_by("id")}
+        lines = {pid: (it.qty, it.unit_price) for pid, it in items.items()}
+        item_ids = {**{-pid: pid for pid in items}, **{it.id: pid for pid, it in items.items()}}
+        final, changed, removed, last = _apply(cleaned, lines, item_ids, products)
+        if holds_enabled() and changed:
+            short = hold_stock_many(cart, {pid: final[pid][0] for pid in changed}, release=removed)
+            if short:
+                raise CartBatchError([{"index": last[pid], "errors": {"qty": "no_stock"}} for pid in short])
+        elif holds_enabled() and removed:
+            release_holds(cart, removed)
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product_id=pid, qty=final[pid][0], unit_price=final[pid][1])
+            for pid in changed if pid not in items
+        ])
+        updated = [items[pid] for pid in changed if pid in items]
+        for item in updated:
+            item.qty = final[item.product_id][0]
+        CartItem.objects.bulk_update(updated, ["qty"])
+        if removed:
+            CartItem.objects.filter(cart=cart, product_id__in=removed).delete()
+    return prefetch_cart(cart), changed, [items[pid].id for pid in removed]
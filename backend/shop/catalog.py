@@ -0,0 +1,145 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.http import quote_etag
+from .models import Product
+from .pagination import akeyset_page, keyset_page
+from .fastserializers import product_list, product_values
+
+# Versión del catálogo: se guarda en el cache de Django, que tiene que ser
+# compartido entre procesos (CACHES en settings) para que un cambio en un worker
+# invalide los LRU de todos. Es un timestamp en ns, así que si el cache se
+# pierde la nueva versión nunca coincide con una anterior.
+CATALOG_VERSION_KEY = "shop:catalog:version"
+
+def catalog_version() -> int:
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(CATALOG_VERSION_KEY, version, None):
+            version = cache.get(CATALOG_VERSION_KEY, version)
+    return version
+
+async def acatalog_version() -> int:
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(CATALOG_VERSION_KEY, version, None):
+            version = await cache.aget(CATALOG_VERSION_KEY, version)
+    return version
+
+def bump_catalog_version() -> int:
+    version = time.time_ns()
+    cache.set(CATALOG_VERSION_KEY, version, None)
+    return version
+
+def catalog_last_modified(version: int) -> int:
+    return version // 1_000_000_000
+
+def catalog_digest(version: int, *parts) -> str:
+    key = ":".join(str(p) for p in (version, *parts))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def catalog_etag(version: int, *parts) -> str:
+    return quote_etag(catalog_digest(version, *parts))
+
+
+class CatalogCache:
+    """
+    Cache de dos niveles para payloads ya serializados del catálogo: un LRU en
+    memoria del proceso delante del cache de Django. Las claves incluyen la
+    versión del catálogo, así que invalidar es solo cambiar de versión; las
+    entradas viejas salen solas del LRU o expiran en el cache compartido.
+    Los contadores son por proceso.
+    """
+    def __init__(self, max_entries: int, timeout: int):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: str):
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return self._lru[key]
+        return None
+
+    def _remember(self, key: str, payload, shared: bool):
+        with self._lock:
+            if shared:
+                self.shared_hits += 1
+            else:
+                self.misses += 1
+            self._lru[key] = payload
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def get_or_build(self, key: str, build):
+        key = f"shop:catalog:{key}"
+        payload = self._lookup(key)
+        if payload is not None:
+            return payload
+        payload = cache.get(key)
+        shared = payload is not None
+        if not shared:
+            payload = build()
+            cache.set(key, payload, self.timeout)
+        self._remember(key, payload, shared)
+        return payload
+
+    async def aget_or_build(self, key: str, build):
+        """Igual que get_or_build, pero `build` es una corrutina."""
+        key = f"shop:catalog:{key}"
+        payload = self._lookup(key)
+        if payload is not None:
+            return payload
+        payload = await cache.aget(key)
+        shared = payload is not None
+        if not shared:
+            payload = await build()
+            await cache.aset(key, payload, self.timeout)
+        self._remember(key, payload, shared)
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            self.hits = self.shared_hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "entries": len(self._lru),
+                "max_entries": self.max_entries,
+            }
+
+
+catalog_cache = CatalogCache(settings.SHOP_CATALOG_CACHE_SIZE, settings.SHOP_CATALOG_CACHE_TIMEOUT)
+
+# Las páginas se arman siempre desde el primario: quedan en el cache compartido
+# con la versión nueva hasta el próximo cambio, y una réplica atrasada las
+# dejaría viejas para todos (también para quien acaba de escribir).
+
+def _active_products():
+    return Product.objects.using(DEFAULT_DB_ALIAS).filter(is_active=True)
+
+def catalog_page(after, limit: int) -> dict:
+    rows, next_cursor = keyset_page(product_values(_active_products()), after, limit)
+    return {"results": product_list(rows), "next": next_cursor}
+
+async def acatalog_page(after, limit: int) -> dict:
+    rows, next_cursor = await akeyset_page(product_values(_active_products()), after, limit)
+    return {"results": product_list(rows), "next": next_cursor}
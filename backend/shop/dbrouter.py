@@ -0,0 +1,126 @@
+import contextvars
+import random
+import time
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+
+# Réplicas de lectura. Todo va al primario salvo las vistas marcadas con
+# @read_replica (búsqueda, listados y exportaciones del admin), cuyas
+# lecturas van a una réplica de SHOP_DB_REPLICAS elegida al azar por request.
+# Siguen yendo al primario:
+#   - lo que corre dentro de transaction.atomic() (lee lo que va a escribir),
+#   - los requests de quien escribió hace menos de SHOP_DB_STICKY_SECONDS
+#     (cookie que pone replica_middleware tras un POST/PUT/PATCH/DELETE exitoso),
+#     para que vea sus propios cambios aunque la réplica vaya atrasada.
+
+STICKY_COOKIE = "db_primary_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_replica = contextvars.ContextVar("db_replica", default=None)
+_pinned = contextvars.ContextVar("db_pinned", default=False)
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las réplicas tienen los mismos datos que el primario
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.SHOP_DB_REPLICAS
+
+def _choose_replica():
+    replicas = settings.SHOP_DB_REPLICAS
+    if not replicas or _pinned.get():
+        return None
+    return random.choice(replicas)
+
+def _streamed(content, alias):
+    # Las exportaciones leen mientras se envían, después de que la vista volvió
+    iterator = iter(content)
+    while True:
+        token = _replica.set(alias)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _replica.reset(token)
+        yield chunk
+
+def _keep_streaming(response, alias):
+    if alias is not None and getattr(response, "streaming", False) and not response.is_async:
+        response.streaming_content = _streamed(response.streaming_content, alias)
+    return response
+
+def read_replica(view):
+    """Marca una vista (función o método, sync o async) para leer de una réplica."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            alias = _choose_replica()
+            token = _replica.set(alias)
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                _replica.reset(token)
+    else:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            alias = _choose_replica()
+            token = _replica.set(alias)
+            try:
+                response = view(*args, **kwargs)
+            finally:
+                _replica.reset(token)
+            return _keep_streaming(response, alias)
+    return wrapper
+
+def _is_pinned(request) -> bool:
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, "")) > time.time()
+    except ValueError:
+        return False
+
+def _stick(request, response):
+    if request.method not in SAFE_METHODS and response.status_code < 400:
+        seconds = settings.SHOP_DB_STICKY_SECONDS
+        response.set_cookie(
+            STICKY_COOKIE, f"{time.time() + seconds:.0f}", max_age=seconds, httponly=True,
+            samesite=settings.SESSION_COOKIE_SAMESITE, secure=settings.SESSION_COOKIE_SECURE,
+        )
+    return response
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not settings.SHOP_DB_REPLICAS:
+                return await get_response(request)
+            token = _pinned.set(_is_pinned(request))
+            try:
+                response = await get_response(request)
+            finally:
+                _pinned.reset(token)
+            return _stick(request, response)
+    else:
+        def middleware(request):
+            if not settings.SHOP_DB_REPLICAS:
+                return get_response(request)
+            token = _pinned.set(_is_pinned(request))
+            try:
+                response = get_response(request)
+            finally:
+                _pinned.reset(token)
+            return _stick(request, response)
+    return middleware
@@ -0,0 +1,89 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.conf import settings
+from django.db import connections
+from .catalog import bump_catalog_version
+from .imaging import render_variants, variant_name
+from .models import Product, ProductImage
+
+logger = logging.getLogger(__name__)
+
+# Campo donde cada modelo guarda sus variantes
+VARIANT_FIELDS = {Product: "image_variants", ProductImage: "variants"}
+
+_lock = threading.Lock()
+_process_pool = None
+_dispatcher = None
+
+def process_pool():
+    return _pools()[0]
+
+def _pools():
+    """
+    Pool de procesos para el trabajo de CPU (spawn, no fork, porque el servidor
+    tiene threads) y un pool de threads que espera cada resultado y lo guarda
+    en la base con su propia conexión.
+    """
+    global _process_pool, _dispatcher
+    with _lock:
+        if _process_pool is None:
+            workers = settings.SHOP_IMAGE_WORKERS
+            _process_pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+            _dispatcher = ThreadPoolExecutor(workers, thread_name_prefix="image-variants")
+        return _process_pool, _dispatcher
+
+def render_args(name: str) -> tuple:
+    # Solo valores simples: el proceso hijo no tiene Django configurado
+    return str(settings.MEDIA_ROOT), name, dict(settings.SHOP_IMAGE_VARIANTS), list(settings.SHOP_IMAGE_FORMATS)
+
+def save_variants(model, pk, name: str, variants: dict, bump: bool = True) -> bool:
+    # Solo si la imagen no cambió mientras se procesaba
+    updated = model.objects.filter(pk=pk, image=name).update(**{VARIANT_FIELDS[model]: variants})
+    if updated and bump:
+        bump_catalog_version()
+    return bool(updated)
+
+def _up_to_date(name: str, variants: dict) -> bool:
+    return all(
+        variants.get(variant, {}).get(fmt) == variant_name(name, variant, box, fmt)
+        for variant, box in settings.SHOP_IMAGE_VARIANTS.items()
+        for fmt in settings.SHOP_IMAGE_FORMATS
+    )
+
+def existing_variants(name: str) -> dict:
+    """Variantes vigentes ya generadas para el mismo archivo (imagen deduplicada), o {}."""
+    for model, field in VARIANT_FIELDS.items():
+        for variants in model.objects.filter(image=name).exclude(**{field: {}}).values_list(field, flat=True)[:5]:
+            if _up_to_date(name, variants):
+                return variants
+    return {}
+
+def _render(name: str) -> dict:
+    # Un blob ya subido antes (otro producto, la galería) trae sus variantes hechas
+    return existing_variants(name) or process_pool().submit(render_variants, *render_args(name)).result()
+
+def _job(model, pk, name):
+    try:
+        save_variants(model, pk, name, _render(name))
+    except Exception:
+        logger.exception("No se pudieron generar variantes de %s", name)
+        raise
+    finally:
+        connections.close_all()
+
+def generate_variants(instance):
+    """
+    Genera las variantes de instance.image fuera del request. Devuelve el
+    Future del trabajo, o None si SHOP_IMAGE_WORKERS = 0 (se hace en línea).
+    """
+    name = instance.image.name if instance.image else ""
+    if not name:
+        return None
+    model = type(instance)
+    if settings.SHOP_IMAGE_WORKERS <= 0:
+        save_variants(model, instance.pk, name, existing_variants(name) or render_variants(*render_args(name)))
+        return None
+    _, dispatcher = _pools()
+    return dispatcher.submit(_job, model, instance.pk, name)
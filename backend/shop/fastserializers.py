@@ -0,0 +1,180 @@
+from collections import defaultdict
+from decimal import Decimal
+from functools import lru_cache
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils.encoding import filepath_to_uri
+from rest_framework import serializers
+from .models import CartItem, Order, OrderItem, Product
+from .profiling import phase
+from .serializers import CartItemSerializer, CartSerializer, OrderSerializer, ProductSerializer
+
+# Camino rápido para las lecturas más pedidas (catálogo, búsqueda, carrito,
+# órdenes): arma los mismos dicts que ProductSerializer, CartSerializer y
+# OrderSerializer desde filas .values() (o desde las instancias que la vista ya
+# tiene cargadas, como el carrito), sin recorrer los fields de DRF por cada
+# fila. El JSON tiene que salir idéntico byte a byte: los tests comparan las
+# dos salidas, y los Decimal/datetime se convierten igual que en DRF.
+# Con SHOP_FAST_SERIALIZERS = False se usan los serializers de siempre.
+
+PRODUCT_FIELDS = tuple(ProductSerializer.Meta.fields)
+ORDER_FIELDS = tuple(f for f in OrderSerializer.Meta.fields if f != "items")
+ORDER_ITEM_FIELDS = ("order_id", "id", "product_id", "product__name", "qty", "unit_price", "subtotal")
+
+def enabled() -> bool:
+    return settings.SHOP_FAST_SERIALIZERS
+
+def _decimal(model, name):
+    """Como DecimalField de DRF (string con los decimales del campo)."""
+    field = model._meta.get_field(name)
+    exp = Decimal(1).scaleb(-field.decimal_places)
+    fallback = serializers.DecimalField(max_digits=field.max_digits, decimal_places=field.decimal_places)
+    def to_string(value):
+        if type(value) is Decimal:
+            return f"{value.quantize(exp):f}"
+        return fallback.to_representation(value)
+    return to_string
+
+@lru_cache(maxsize=4096)
+def _media_path(name: str):
+    """La ruta como la arma FileSystemStorage.url, o None si urljoin la cambiaría."""
+    path = filepath_to_uri(name).lstrip("/")
+    return None if "//" in path or "/." in "/" + path else path
+
+def _url(storage, name: str) -> str:
+    # storage.url, sin urljoin en el caso común: con varias imágenes por
+    # producto era lo más caro de armar el catálogo
+    if isinstance(storage, FileSystemStorage):
+        path = _media_path(name)
+        if path is not None:
+            return storage.base_url + path
+    return storage.url(name)
+
+def _file_url(model, name):
+    """Como FileField de DRF sin request en el contexto (url relativa o None)."""
+    storage = model._meta.get_field(name).storage
+    return lambda value: _url(storage, str(value)) if value else None
+
+def _variants(value) -> dict:
+    """Como ImageVariantsField."""
+    return {
+        variant: {fmt: _url(default_storage, name) for fmt, name in formats.items()}
+        for variant, formats in (value or {}).items()
+    }
+
+_price = _decimal(Product, "price")
+_image = _file_url(Product, "image")
+_item_price = _decimal(CartItem, "unit_price")
+_order_money = _decimal(Order, "total")
+_line_money = _decimal(OrderItem, "subtotal")
+_datetime = serializers.DateTimeField().to_representation
+
+def product_data(row) -> dict:
+    """Un producto como ProductSerializer, desde una fila con PRODUCT_FIELDS."""
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "slug": row["slug"],
+        "price": _price(row["price"]),
+        "stock": row["stock"],
+        "is_active": row["is_active"],
+        "image": _image(row["image"]),
+        "image_variants": _variants(row["image_variants"]),
+    }
+
+def _row(obj, fields) -> dict:
+    return {f: getattr(obj, f) for f in fields}
+
+def product_fields():
+    """Campos para pedir productos como filas .values(), o None sin el camino rápido."""
+    return PRODUCT_FIELDS if enabled() else None
+
+def product_values(qs):
+    """Con el camino rápido, el queryset como filas .values() (más created_at, para el cursor)."""
+    return qs.values(*PRODUCT_FIELDS, "created_at") if enabled() else qs
+
+def product_list(rows) -> list:
+    """Filas de product_values() o de search_products(..., product_fields())."""
+    if not enabled():
+        return list(ProductSerializer(rows, many=True).data)
+    with phase("serialize"):
+        return [product_data(r) for r in rows]
+
+def _cart_item(item) -> dict:
+    return {
+        "id": item.id,
+        "product": product_data(_row(item.product, PRODUCT_FIELDS)),
+        "qty": item.qty,
+        "unit_price": _item_price(item.unit_price),
+        # Propiedad del modelo: DRF la deja como Decimal (número en el JSON)
+        "subtotal": item.subtotal,
+    }
+
+def cart_items_data(items) -> list:
+    """Items ya cargados (con su producto) como CartItemSerializer(many=True)."""
+    if not enabled():
+        return CartItemSerializer(items, many=True).data
+    with phase("serialize"):
+        return [_cart_item(it) for it in items]
+
+def cart_data(cart) -> dict:
+    """
+    Cart (con los items en el cache de prefetch) o GuestCart como
+    CartSerializer. Los items ya están en memoria para el envío y las reservas,
+    así que se arman desde las instancias en vez de consultar de nuevo.
+    """
+    if not enabled():
+        return CartSerializer(cart).data
+    with phase("serialize"):
+        items = cart.items.all()
+        return {
+            "id": cart.id,
+            "items": [_cart_item(it) for it in items],
+            # Igual que Cart.total: 0 (int) si no hay items
+            "total": sum((it.subtotal for it in items), 0),
+        }
+
+def _order(row, items) -> dict:
+    data = {f: row[f] for f in ORDER_FIELDS}
+    for f in ("subtotal", "shipping", "total"):
+        data[f] = _order_money(row[f])
+    data["created_at"] = _datetime(row["created_at"])
+    data["items"] = [
+        {
+            "id": it["id"],
+            "product": it["product_id"],
+            "product_name": it["product__name"],
+            "qty": it["qty"],
+            "unit_price": _line_money(it["unit_price"]),
+            "subtotal": _line_money(it["subtotal"]),
+        }
+        for it in items
+    ]
+    return data
+
+def _order_items(order_ids) -> dict:
+    """{order_id: [filas]} en una consulta, con el nombre del producto por JOIN."""
+    grouped = defaultdict(list)
+    for it in OrderItem.objects.filter(order_id__in=order_ids).order_by("id").values(*ORDER_ITEM_FIELDS):
+        grouped[it["order_id"]].append(it)
+    return grouped
+
+def order_values(qs):
+    """Con el camino rápido, el queryset de órdenes como filas .values() (sin prefetch de items)."""
+    return qs.prefetch_related(None).values(*ORDER_FIELDS) if enabled() else qs
+
+def order_list(rows, serializer_class=OrderSerializer) -> list:
+    """Filas de order_values() como serializer_class(many=True) (mismos campos que OrderSerializer)."""
+    if not enabled():
+        return serializer_class(rows, many=True).data
+    items = _order_items([r["id"] for r in rows])
+    with phase("serialize"):
+        return [_order(r, items.get(r["id"], ())) for r in rows]
+
+def order_data(order, serializer_class=OrderSerializer) -> dict:
+    """Una orden ya cargada; sus líneas salen de una consulta .values()."""
+    if not enabled():
+        return serializer_class(order).data
+    items = _order_items([order.id])
+    with phase("serialize"):
+        return _order(_row(order, ORDER_FIELDS), items.get(order.id, ()))
@@ -0,0 +1,156 @@
+from decimal import Decimal
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.utils.decorators import sync_and_async_middleware
+from .holds import holds_enabled
+from .models import Cart, CartItem, Product
+from .querybudget import allow_queries
+
+# Carrito de invitado en una cookie firmada (SHOP_GUEST_CART_COOKIE).
+# Un visitante sin sesión no escribe nada en la base: sus líneas
+# [product_id, qty, unit_price] viajan en la cookie y solo pasan a Cart/CartItem
+# al superar SHOP_GUEST_CART_MAX_LINES o al confirmar el checkout.
+# Los items se exponen con id = -product_id; las vistas aceptan esos ids
+# también después de que el carrito pasa a la base.
+
+COOKIE_NAME = "guest_cart"
+SALT = "shop.guest_cart"
+# Consultas de promote_guest_cart: sesión nueva (2), carrito (2), productos,
+# items y la recarga del carrito. Van aparte del presupuesto de la ruta
+PROMOTE_QUERIES = 7
+
+class GuestItems:
+    """Lo mínimo de un RelatedManager que usan CartSerializer y compute_shipping."""
+    def __init__(self, items):
+        self._items = items
+
+    def all(self):
+        return self._items
+
+    def count(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+class GuestCart:
+    """Carrito que no está en la base; se serializa igual que Cart (con id = None)."""
+    id = None
+
+    def __init__(self, items=()):
+        self.items = GuestItems(list(items))
+
+    @property
+    def total(self):
+        return sum((i.subtotal for i in self.items.all()), 0)
+
+def guest_cookie_mode(request, user) -> bool:
+    # Con reservas de stock el carrito tiene que existir en la base (StockHold.cart)
+    return (
+        settings.SHOP_GUEST_CART_COOKIE and not holds_enabled()
+        and not user.is_authenticated and not request.session.session_key
+    )
+
+def read_lines(request) -> list:
+    raw = request.COOKIES.get(COOKIE_NAME)
+    if not raw:
+        return []
+    try:
+        return signing.loads(raw, salt=SALT, max_age=settings.SESSION_COOKIE_AGE)
+    except signing.BadSignature:
+        return []
+
+def write_lines(request, lines):
+    # La cookie la escribe guest_cart_middleware; aquí solo se deja pendiente.
+    # Con un Request de DRF hay que marcar el HttpRequest de abajo.
+    getattr(request, "_request", request).guest_cart_lines = lines
+
+def _items(lines, products):
+    return [
+        CartItem(id=-pid, product=products[pid], qty=qty, unit_price=Decimal(price))
+        for pid, qty, price in lines if pid in products
+    ]
+
+def build_guest_cart(lines) -> GuestCart:
+    if not lines:
+        return GuestCart()
+    return GuestCart(_items(lines, Product.objects.in_bulk([pid for pid, _, _ in lines])))
+
+async def abuild_guest_cart(lines) -> GuestCart:
+    if not lines:
+        return GuestCart()
+    return GuestCart(_items(lines, await Product.objects.ain_bulk([pid for pid, _, _ in lines])))
+
+def save_guest_lines(request, lines):
+    if len(lines) > settings.SHOP_GUEST_CART_MAX_LINES:
+        return promote_guest_cart(request, lines)
+    write_lines(request, lines)
+    return build_guest_cart(lines)
+
+def add_guest_line(request, product, qty: int):
+    lines = read_lines(request)
+    for line in lines:
+        if line[0] == product.id:
+            line[1] += qty
+            break
+    else:
+        lines.append([product.id, qty, str(product.price)])
+    return save_guest_lines(request, lines)
+
+def set_guest_line(request, product_id: int, qty: int):
+    """Cambia la cantidad (qty < 1 la quita). Devuelve None si la línea no existe."""
+    lines = read_lines(request)
+    if not any(line[0] == product_id for line in lines):
+        return None
+    if qty < 1:
+        lines = [line for line in lines if line[0] != product_id]
+    else:
+        for line in lines:
+            if line[0] == product_id:
+                line[1] = qty
+    return save_guest_lines(request, lines)
+
+def promote_guest_cart(request, lines=None):
+    """Pasa el carrito de la cookie a Cart/CartItem y borra la cookie."""
+    from .utils import ensure_session_key, prefetch_cart
+
+    lines = read_lines(request) if lines is None else lines
+    write_lines(request, [])
+    allow_queries(PROMOTE_QUERIES)
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(session_key=ensure_session_key(request), user=None)
+        existing = set(Product.objects.filter(pk__in=[pid for pid, _, _ in lines]).values_list("pk", flat=True))
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product_id=pid, qty=qty, unit_price=Decimal(price))
+            for pid, qty, price in lines if pid in existing
+        ])
+    return prefetch_cart(cart)
+
+def _write_cookie(request, response):
+    lines = getattr(request, "guest_cart_lines", None)
+    if lines is None:
+        return response
+    if lines:
+        response.set_cookie(
+            COOKIE_NAME,
+            signing.dumps(lines, salt=SALT, compress=True),
+            max_age=settings.SESSION_COOKIE_AGE,
+            httponly=True,
+            secure=settings.SESSION_COOKIE_SECURE,
+            samesite=settings.SESSION_COOKIE_SAMESITE,
+        )
+    else:
+        response.delete_cookie(COOKIE_NAME, samesite=settings.SESSION_COOKIE_SAMESITE)
+    return response
+
+@sync_and_async_middleware
+def guest_cart_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return _write_cookie(request, await get_response(request))
+    else:
+        def middleware(request):
+            return _write_cookie(request, get_response(request))
+    return middleware
@@ -0,0 +1,107 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .housekeeping import delete_in_batches
+from .models import Product, StockHold
+from .querybudget import allow_queries
+
+# Reservas temporales de stock para carritos (opcional, SHOP_STOCK_HOLDS).
+# No se guarda un contador de "reservado" en Product: lo retenido se calcula
+# sumando los holds vigentes, así un hold vencido o borrado en cascada deja de
+# contar solo y el barrido de vencidos es únicamente limpieza de la tabla.
+# Las consultas de cada operación van aparte del presupuesto de la ruta
+# (allow_queries): sólo se hacen con SHOP_STOCK_HOLDS.
+
+HOLD_QUERIES = 4        # lock del producto, suma de holds, update_or_create (select + escritura)
+HOLD_MANY_QUERIES = 4   # lock de los productos, suma de holds, delete, bulk_create
+
+def holds_enabled() -> bool:
+    return settings.SHOP_STOCK_HOLDS
+
+def active_holds(now=None):
+    return StockHold.objects.filter(expires_at__gt=now or timezone.now())
+
+def held_qty(exclude_cart=None):
+    """Expresión con las unidades retenidas por holds vigentes del producto OuterRef('pk')."""
+    qs = active_holds().filter(product=OuterRef("pk"))
+    if exclude_cart is not None:
+        qs = qs.exclude(cart=exclude_cart)
+    qs = qs.order_by().values("product").annotate(total=Sum("qty")).values("total")
+    return Coalesce(Subquery(qs, output_field=IntegerField()), Value(0))
+
+def available_stock(product_ids) -> dict:
+    """{product_id: disponible para vender} en una sola consulta."""
+    rows = (
+        Product.objects.filter(pk__in=product_ids)
+        .annotate(held=held_qty())
+        .values_list("id", "stock", "held")
+    )
+    return {pid: max(stock - held, 0) for pid, stock, held in rows}
+
+@transaction.atomic
+def hold_stock(cart, product_id, qty: int) -> bool:
+    """
+    Deja retenidas `qty` unidades del producto para el carrito durante
+    SHOP_STOCK_HOLD_TTL segundos (reemplaza el hold anterior). Devuelve False
+    si el stock libre no alcanza.
+    """
+    allow_queries(HOLD_QUERIES)
+    # Lock de la fila del producto: serializa los holds y checkouts del mismo producto
+    stock = Product.objects.select_for_update().values_list("stock", flat=True).get(pk=product_id)
+    now = timezone.now()
+    held = (
+        active_holds(now).filter(product_id=product_id).exclude(cart=cart)
+        .aggregate(total=Sum("qty"))["total"] or 0
+    )
+    if stock - held < qty:
+        return False
+    StockHold.objects.update_or_create(
+        cart=cart, product_id=product_id,
+        defaults={"qty": qty, "expires_at": now + timedelta(seconds=settings.SHOP_STOCK_HOLD_TTL)},
+    )
+    return True
+
+@transaction.atomic
+def hold_stock_many(cart, quantities: dict, release=()) -> list:
+    """
+    Como hold_stock para varios productos ({product_id: qty}) con una cantidad
+    fija de consultas; de paso suelta los holds de `release`. Devuelve los
+    product_id sin stock libre suficiente; si hay alguno no se toca nada.
+    """
+    allow_queries(HOLD_MANY_QUERIES)
+    pids = sorted(quantities)
+    # Lock en orden de id, igual que el checkout, para no cruzarse con él
+    stock = dict(Product.objects.select_for_update().filter(pk__in=pids).order_by("pk").values_list("id", "stock"))
+    now = timezone.now()
+    held = dict(
+        active_holds(now).filter(product_id__in=pids).exclude(cart=cart)
+        .values("product_id").annotate(total=Sum("qty")).order_by().values_list("product_id", "total")
+    )
+    short = [pid for pid in pids if stock.get(pid, 0) - held.get(pid, 0) < quantities[pid]]
+    if short:
+        return short
+    expires_at = now + timedelta(seconds=settings.SHOP_STOCK_HOLD_TTL)
+    StockHold.objects.filter(cart=cart, product_id__in=[*pids, *release]).delete()
+    StockHold.objects.bulk_create([
+        StockHold(cart=cart, product_id=pid, qty=quantities[pid], expires_at=expires_at) for pid in pids
+    ])
+    return []
+
+def release_hold(cart, product_id):
+    release_holds(cart, [product_id])
+
+def release_holds(cart, product_ids=None):
+    """Suelta los holds del carrito para esos productos (todos si es None)."""
+    allow_queries(1)
+    holds = StockHold.objects.filter(cart=cart)
+    if product_ids is not None:
+        holds = holds.filter(product_id__in=product_ids)
+    holds.delete()
+
+def release_expired_holds(batch_size: int = 500, pause: float = 0.0) -> int:
+    """Borra holds vencidos en lotes cortos (cada lote es su propia transacción)."""
+    expired = StockHold.objects.filter(expires_at__lte=timezone.now())
+    return delete_in_batches(expired, batch_size, pause, order_by="expires_at").get(StockHold._meta.label, 0)
@@ -0,0 +1,66 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from .models import Cart, CartItem
+
+# Limpieza periódica de tablas que solo crecen: sesiones vencidas, carritos de
+# invitado que ya nadie puede abrir y items huérfanos. Todo se borra en lotes
+# cortos, cada uno en su propia transacción (no se llama dentro de atomic), así
+# los locks de escritura duran un lote y no todo el barrido.
+
+DB_SESSION_ENGINES = ("django.contrib.sessions.backends.db", "django.contrib.sessions.backends.cached_db")
+
+def delete_in_batches(qs, batch_size: int = 500, pause: float = 0.0, order_by: str = "pk") -> dict:
+    """
+    Borra las filas de `qs` de a `batch_size` (por pk) y devuelve las filas
+    borradas por modelo, cascadas incluidas. `pause` son segundos entre lotes.
+    """
+    removed = {}
+    while True:
+        pks = list(qs.order_by(order_by).values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            break
+        _, per_model = qs.model.objects.filter(pk__in=pks).delete()
+        for label, n in per_model.items():
+            removed[label] = removed.get(label, 0) + n
+        if len(pks) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return removed
+
+def expired_sessions(now=None):
+    return Session.objects.filter(expire_date__lt=now or timezone.now())
+
+def abandoned_guest_carts(now=None):
+    """
+    Carritos de invitado que ya no se pueden abrir: su sesión venció o no
+    existe. Si las sesiones no viven en la base, los que llevan más de
+    SESSION_COOKIE_AGE sin cambios.
+    """
+    now = now or timezone.now()
+    carts = Cart.objects.filter(user=None)
+    if settings.SESSION_ENGINE in DB_SESSION_ENGINES:
+        live = Session.objects.filter(session_key=OuterRef("session_key"), expire_date__gte=now)
+        return carts.filter(~Exists(live))
+    return carts.filter(updated_at__lt=now - timedelta(seconds=settings.SESSION_COOKIE_AGE))
+
+def orphaned_cart_items():
+    return CartItem.objects.filter(~Exists(Cart.objects.filter(pk=OuterRef("cart_id"))))
+
+def collect_garbage(batch_size: int = 500, pause: float = 0.0) -> dict:
+    """Sesiones vencidas, carritos abandonados e items huérfanos. Para cron."""
+    now = timezone.now()
+    stats = {"sessions": 0, "carts": 0, "cart_items": 0}
+    if settings.SESSION_ENGINE in DB_SESSION_ENGINES:
+        removed = delete_in_batches(expired_sessions(now), batch_size, pause, order_by="expire_date")
+        stats["sessions"] = removed.get(Session._meta.label, 0)
+    removed = delete_in_batches(abandoned_guest_carts(now), batch_size, pause)
+    stats["carts"] = removed.get(Cart._meta.label, 0)
+    stats["cart_items"] = removed.get(CartItem._meta.label, 0)
+    removed = delete_in_batches(orphaned_cart_items(), batch_size, pause)
+    stats["cart_items"] += removed.get(CartItem._meta.label, 0)
+    return stats
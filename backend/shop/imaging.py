@@ -0,0 +1,48 @@
+import os
+from PIL import Image, ImageOps
+
+# Generación de variantes de imágenes de producto. Este módulo no importa Django
+# para que los procesos del pool (spawn) lo puedan cargar sin configurar nada.
+
+SAVE_OPTIONS = {
+    "webp": {"quality": 80, "method": 4},
+    "avif": {"quality": 55},
+    "jpeg": {"quality": 82, "optimize": True, "progressive": True},
+    "png": {"optimize": True},
+}
+
+def variant_dir(name: str) -> str:
+    return f"variants/{name}"
+
+def variant_name(name: str, variant: str, box: int, fmt: str) -> str:
+    # blobs/ab/ab12….jpg -> variants/blobs/ab/ab12….jpg/card-480.webp
+    # Con el tamaño en el nombre, cambiar SHOP_IMAGE_VARIANTS da nombres nuevos
+    # y una variante vieja cacheada como inmutable nunca pasa por la nueva
+    return f"{variant_dir(name)}/{variant}-{box}.{fmt}"
+
+def render_variants(root: str, name: str, sizes: dict, formats) -> dict:
+    """
+    Genera cada tamaño (lado mayor en px, sin agrandar) en cada formato moderno
+    más uno de respaldo (jpeg, o png si la imagen tiene transparencia).
+    Devuelve {variante: {formato: nombre relativo a root}}.
+    """
+    with Image.open(os.path.join(root, name)) as src:
+        im = ImageOps.exif_transpose(src)
+        has_alpha = im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info)
+        im = im.convert("RGBA" if has_alpha else "RGB")
+
+    fallback = "png" if has_alpha else "jpeg"
+    out = {}
+    # De mayor a menor: cada tamaño se reduce desde el anterior, que es más barato
+    for variant, box in sorted(sizes.items(), key=lambda kv: -kv[1]):
+        im.thumbnail((box, box), Image.Resampling.LANCZOS)
+        out[variant] = {}
+        for fmt in (*formats, fallback):
+            rel = variant_name(name, variant, box, fmt)
+            path = os.path.join(root, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.tmp"
+            im.save(tmp, format=fmt.upper(), **SAVE_OPTIONS.get(fmt, {}))
+            os.replace(tmp, path)
+            out[variant][fmt] = rel
+    return out
@@ -0,0 +1,168 @@
+import http.client
+import json
+import socket
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+# Benchmark de carga HTTP sobre las rutas reales de core/urls.py (lo usa
+# `manage.py bench_http`). Cada usuario virtual es un thread con su propia
+# conexión keep-alive y sus cookies (sesión, CSRF, carrito de invitado) y recorre
+# escenarios como lo haría el frontend. Las latencias se agrupan por endpoint.
+
+PERCENTILES = (50, 95, 99)
+
+class Recorder:
+    """Latencias (segundos) y errores por endpoint, compartido entre threads."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.server_errors = {}
+
+    def add(self, name: str, seconds: float, ok: bool, server_error: bool = False):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+            if server_error:
+                self.server_errors[name] = self.server_errors.get(name, 0) + 1
+
+def percentile(sorted_values, p: int) -> float:
+    # nearest-rank
+    k = max(0, min(len(sorted_values) - 1, -(-len(sorted_values) * p // 100) - 1))
+    return sorted_values[k]
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    for name, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        endpoints[name] = {
+            "requests": len(values),
+            "errors": recorder.errors.get(name, 0),
+            "rps": round(len(values) / elapsed, 1),
+            "mean_ms": round(sum(values) / len(values) * 1000, 2),
+            **{f"p{p}_ms": round(percentile(values, p) * 1000, 2) for p in PERCENTILES},
+        }
+    return endpoints
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """
+    Endpoints cuyo p95 subió o cuyo throughput bajó más de `threshold`
+    (0.2 = 20 %) respecto de `baseline`. Devuelve [(endpoint, métrica, antes, ahora)].
+    """
+    regressions = []
+    for name, now in current.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if now["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append((name, "p95_ms", before["p95_ms"], now["p95_ms"]))
+        if now["rps"] < before["rps"] * (1 - threshold):
+            regressions.append((name, "rps", before["rps"], now["rps"]))
+    return regressions
+
+class NoDelayConnection(http.client.HTTPConnection):
+    # Sin TCP_NODELAY, Nagle + ACK retardado suman ~40 ms a cada request que
+    # se envía en dos escrituras (headers y cuerpo)
+    def connect(self):
+        super().connect()
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+class HttpUser:
+    """Cliente HTTP mínimo con cookies y CSRF, como el navegador del frontend."""
+    def __init__(self, host: str, port: int, recorder: Recorder):
+        self.host, self.port = host, port
+        self.recorder = recorder
+        self.cookies = {}
+        self.conn = NoDelayConnection(host, port, timeout=60)
+
+    def close(self):
+        self.conn.close()
+
+    def _send(self, method, path, body, headers):
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            return self.conn.getresponse()
+        except (http.client.HTTPException, ConnectionError):
+            # El servidor cerró la conexión keep-alive: se reabre una vez
+            self.conn.close()
+            self.conn = NoDelayConnection(self.host, self.port, timeout=60)
+            self.conn.request(method, path, body=body, headers=headers)
+            return self.conn.getresponse()
+
+    def request(self, name: str, method: str, path: str, data=None, params=None, expect=(200, 201)):
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        headers = {"Accept": "application/json"}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        if method != "GET":
+            headers["X-CSRFToken"] = self.cookies.get("csrftoken", "")
+        body = None
+        if data is not None:
+            body = json.dumps(data).encode()
+            headers["Content-Type"] = "application/json"
+        t0 = time.perf_counter()
+        response = self._send(method, path, body, headers)
+        payload = response.read()
+        self.recorder.add(name, time.perf_counter() - t0, response.status in expect, response.status >= 500)
+        for header in response.headers.get_all("Set-Cookie") or ():
+            for key, morsel in SimpleCookie(header).items():
+                if morsel.value and morsel["max-age"] != "0":
+                    self.cookies[key] = morsel.value
+                else:
+                    self.cookies.pop(key, None)
+        if response.status in expect and payload and response.getheader("Content-Type", "").startswith("application/json"):
+            return json.loads(payload)
+        return None
+
+# --- Escenarios -------------------------------------------------------------
+# Cada escenario recibe (usuario HTTP, contexto) y hace una "visita" completa.
+# El contexto trae los ids de productos, términos de búsqueda y la cuenta del
+# usuario virtual.
+
+def browse(user, ctx):
+    page = user.request("products", "GET", "/api/products/")
+    for _ in range(ctx["pages"] - 1):
+        if not page or not page.get("next"):
+            break
+        page = user.request("products", "GET", "/api/products/", params={"cursor": page["next"]})
+    user.request("search", "GET", "/api/products/search/", params={"q": ctx["rng"].choice(ctx["terms"])})
+
+def _fill_cart(user, ctx, lines):
+    cart = None
+    for pid in ctx["rng"].sample(ctx["product_ids"], lines):
+        r = user.request("cart_add", "POST", "/api/cart/items/", {"product_id": pid, "qty": 1})
+        cart = r and r["cart"]
+    return cart
+
+def cart(user, ctx):
+    user.request("csrf", "GET", "/api/csrf/")
+    cart = _fill_cart(user, ctx, 3)
+    if not cart or not cart["items"]:
+        return
+    first, last = cart["items"][0], cart["items"][-1]
+    user.request("cart_update", "PATCH", f"/api/cart/items/{first['id']}/", {"qty": 2})
+    user.request("cart_remove", "DELETE", f"/api/cart/items/{last['id']}/delete/")
+    user.request("cart", "GET", "/api/cart/")
+
+def checkout(user, ctx):
+    user.request("csrf", "GET", "/api/csrf/")
+    _fill_cart(user, ctx, 2)
+    user.request("checkout_summary", "GET", "/api/checkout/summary/")
+    user.request("checkout_confirm", "POST", "/api/checkout/confirm/", {
+        "email": ctx["email"], "full_name": "Bench", "address": "Calle 1", "city": "Santiago",
+    })
+
+def login_merge(user, ctx):
+    # Visitante que arma un carrito y luego inicia sesión (fusión de carritos)
+    user.cookies.clear()
+    user.request("csrf", "GET", "/api/csrf/")
+    _fill_cart(user, ctx, 2)
+    user.request("login", "POST", "/api/auth/login/", {"username": ctx["username"], "password": ctx["password"]})
+    user.request("cart", "GET", "/api/cart/")
+    user.request("logout", "POST", "/api/auth/logout/")
+
+SCENARIOS = {"browse": browse, "cart": cart, "checkout": checkout, "login": login_merge}
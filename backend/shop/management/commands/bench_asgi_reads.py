@@ -0,0 +1,111 @@
+import asyncio
+import statistics
+import time
+from decimal import Decimal
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from core.asgi import application
+from shop.models import Cart, Product
+
+ENDPOINTS = [
+    ("products", "/api/products/", "/api/async/products/"),
+    ("cart", "/api/cart/", "/api/async/cart/"),
+    ("checkout_summary", "/api/checkout/summary/", "/api/async/checkout/summary/"),
+    ("me", "/api/auth/me/", "/api/async/auth/me/"),
+]
+
+async def asgi_get(path: str, cookie: str) -> int:
+    """Hace un GET contra core.asgi.application como lo haría un servidor ASGI."""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"cookie", cookie.encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+    comm = ApplicationCommunicator(application, scope)
+    await comm.send_input({"type": "http.request", "body": b"", "more_body": False})
+    start = await comm.receive_output(timeout=30)
+    while True:
+        message = await comm.receive_output(timeout=30)
+        if not message.get("more_body"):
+            break
+    await comm.wait(timeout=30)
+    return start["status"]
+
+async def run_endpoint(path: str, cookie: str, total: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            status = await asgi_get(path, cookie)
+            latencies.append(time.perf_counter() - t0)
+            if status >= 400:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara los endpoints de lectura sync (DRF) con los async bajo el handler "
+        "ASGI, con N requests concurrentes. Usa una base de datos temporal."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--products", type=int, default=200)
+        parser.add_argument("--cart-items", type=int, default=10)
+
+    def handle(self, *args, **opts):
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            cookie = self.seed(opts["products"], opts["cart_items"])
+            for name, sync_path, async_path in ENDPOINTS:
+                for kind, path in (("sync", sync_path), ("async", async_path)):
+                    r = asyncio.run(run_endpoint(path, cookie, opts["requests"], opts["concurrency"]))
+                    self.stdout.write(
+                        f"{name:<17} {kind:<5} {r['rps']:8.1f} req/s  "
+                        f"p50 {r['p50_ms']:7.1f} ms  p95 {r['p95_ms']:7.1f} ms  errores {r['errors']}"
+                    )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, n_products: int, n_items: int) -> str:
+        Product.objects.bulk_create(
+            Product(name=f"Producto {i}", slug=f"producto-{i}", price=Decimal("9990.00"), stock=100)
+            for i in range(n_products)
+        )
+        user = get_user_model().objects.create_user("bench", "bench@example.com")
+        cart = Cart.objects.create(user=user)
+        for p in Product.objects.order_by("id")[:n_items]:
+            cart.items.create(product=p, qty=1, unit_price=p.price)
+        client = Client()
+        client.force_login(user)
+        return f"sessionid={client.cookies['sessionid'].value}"
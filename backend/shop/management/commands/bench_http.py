@@ -0,0 +1,171 @@
+import json
+import platform
+import random
+import socket
+import subprocess
+import threading
+import time
+from decimal import Decimal
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.utils import timezone
+from shop.loadbench import SCENARIOS, HttpUser, Recorder, compare, summarize
+from shop.models import Product
+
+TERMS = ["mesa", "silla", "cajon", "repisa", "roble", "pino", "nogal", "rustico"]
+PASSWORD = "bench-clave-123"
+
+
+class QuietHandler(WSGIRequestHandler):
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de carga HTTP de la API de la tienda: levanta un servidor WSGI local "
+        "sobre una base de datos temporal y corre usuarios concurrentes por los escenarios "
+        "elegidos. Reporta req/s y p50/p95/p99 por endpoint y puede guardar y comparar JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10, help="usuarios virtuales concurrentes")
+        parser.add_argument("--iterations", type=int, default=20, help="visitas por usuario")
+        parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                            help=f"lista separada por comas ({', '.join(SCENARIOS)})")
+        parser.add_argument("--products", type=int, default=2000)
+        parser.add_argument("--pages", type=int, default=3, help="páginas del catálogo por visita")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--output", help="guardar resultados en este JSON")
+        parser.add_argument("--compare", help="JSON de una corrida anterior para detectar regresiones")
+        parser.add_argument("--threshold", type=float, default=0.2,
+                            help="regresión si p95 sube o req/s baja más que esta fracción")
+
+    def handle(self, *args, **opts):
+        scenarios = [s.strip() for s in opts["scenarios"].split(",") if s.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown or not scenarios:
+            raise CommandError(f"escenarios desconocidos: {', '.join(sorted(unknown)) or '-'}")
+        baseline = None
+        if opts["compare"]:
+            with open(opts["compare"], encoding="utf-8") as fh:
+                baseline = json.load(fh)["endpoints"]
+
+        # Como en producción: sin DEBUG (no acumula connection.queries) y sin
+        # fallar por presupuesto de consultas (se calculó con el DEBUG de settings)
+        settings.DEBUG = False
+        settings.SHOP_QUERY_BUDGET_RAISE = False
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        server = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler)
+        server.set_app(get_wsgi_application())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            product_ids, accounts = self.seed(opts["products"], opts["users"])
+            connection.close()
+            elapsed, recorder = self.run(server.server_address, scenarios, product_ids, accounts, opts)
+        finally:
+            server.shutdown()
+            server.server_close()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        # Con 5xx los tiempos no son de la API funcionando: no se reportan
+        if recorder.server_errors:
+            failed = ", ".join(f"{name} {n}" for name, n in sorted(recorder.server_errors.items()))
+            raise CommandError(f"respuestas 5xx durante el benchmark ({failed}): sin resultados")
+        endpoints = summarize(recorder, elapsed)
+        self.report(endpoints, elapsed)
+        result = {
+            "meta": {
+                "date": timezone.now().isoformat(),
+                "commit": self.git_commit(),
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                **{k: opts[k] for k in ("users", "iterations", "products", "pages", "seed")},
+                "scenarios": scenarios,
+                "elapsed_s": round(elapsed, 2),
+            },
+            "endpoints": endpoints,
+        }
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as fh:
+                json.dump(result, fh, indent=2)
+            self.stdout.write(f"resultados en {opts['output']}")
+        if baseline is not None:
+            regressions = compare(endpoints, baseline, opts["threshold"])
+            for name, metric, before, now in regressions:
+                self.stdout.write(self.style.ERROR(f"regresión {name} {metric}: {before} -> {now}"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regresiones sobre {opts['compare']}")
+            self.stdout.write(self.style.SUCCESS("sin regresiones"))
+
+    def seed(self, n_products: int, n_users: int):
+        rng = random.Random(0)
+        Product.objects.bulk_create(
+            Product(
+                name=f"{rng.choice(TERMS).capitalize()} {rng.choice(TERMS)} {i}",
+                slug=f"producto-{i}", price=Decimal("9990.00"), stock=1_000_000,
+            )
+            for i in range(n_products)
+        )
+        # Un solo hash para todas las cuentas (el login igual lo verifica)
+        hashed = make_password(PASSWORD)
+        User = get_user_model()
+        User.objects.bulk_create(
+            User(username=f"bench{i}", email=f"bench{i}@example.com", password=hashed) for i in range(n_users)
+        )
+        accounts = [(f"bench{i}", f"bench{i}@example.com") for i in range(n_users)]
+        return list(Product.objects.values_list("id", flat=True)), accounts
+
+    def run(self, address, scenarios, product_ids, accounts, opts):
+        recorder = Recorder()
+        host, port = address[:2]
+
+        def worker(i):
+            username, email = accounts[i]
+            ctx = {
+                "rng": random.Random(opts["seed"] * 1000 + i), "product_ids": product_ids, "terms": TERMS,
+                "pages": opts["pages"], "username": username, "email": email, "password": PASSWORD,
+            }
+            user = HttpUser(host, port, recorder)
+            try:
+                for n in range(opts["iterations"]):
+                    SCENARIOS[scenarios[(i + n) % len(scenarios)]](user, ctx)
+            finally:
+                user.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(opts["users"])]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - t0, recorder
+
+    def report(self, endpoints, elapsed):
+        self.stdout.write(f"{'endpoint':<17} {'req':>6} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for name, r in endpoints.items():
+            self.stdout.write(
+                f"{name:<17} {r['requests']:>6} {r['errors']:>4} {r['rps']:>8.1f} "
+                f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}"
+            )
+        total = sum(r["requests"] for r in endpoints.values())
+        self.stdout.write(f"total {total} requests en {elapsed:.1f} s ({total / elapsed:.1f} req/s)")
+
+    def git_commit(self):
+        try:
+            out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        except OSError:
+            return None
+        return out.stdout.strip() or None
@@ -0,0 +1,97 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from shop.catalog import catalog_page
+from shop.fastserializers import cart_data, order_list, order_values
+from shop.models import Cart, Order, OrderItem, Product
+from shop.pagination import keyset_page
+from shop.renderers import ORJSONRenderer
+from shop.serializers import OrderAdminSerializer
+from shop.utils import prefetch_cart
+from shop.views_admin import OrderAdminViewSet
+
+def best_of(fn, repeat: int) -> float:
+    """Mejor tiempo de `repeat` corridas, en ms (el menos afectado por ruido)."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara los serializers de DRF + JSONRenderer con el camino rápido "
+        "(filas .values() + orjson) para catálogo, carrito y órdenes. Usa una "
+        "base de datos temporal."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=200)
+        parser.add_argument("--cart-items", type=int, default=30)
+        parser.add_argument("--orders", type=int, default=50)
+        parser.add_argument("--order-items", type=int, default=5)
+        parser.add_argument("--repeat", type=int, default=30)
+
+    def handle(self, *args, **opts):
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            cart = self.seed(opts)
+            payloads = [
+                (f"catálogo ({opts['products']})", lambda: catalog_page(None, opts["products"])),
+                (f"carrito ({opts['cart_items']})", lambda: cart_data(prefetch_cart(cart))),
+                (f"órdenes ({opts['orders']})", lambda: order_list(
+                    keyset_page(order_values(OrderAdminViewSet.queryset.all()), None, opts["orders"], descending=True)[0],
+                    OrderAdminSerializer,
+                )),
+            ]
+            self.stdout.write(f"{'':<16} {'armar':>17} {'render':>17} {'total':>17}")
+            for name, build in payloads:
+                times = {}
+                for fast, renderer in ((False, JSONRenderer()), (True, ORJSONRenderer())):
+                    with override_settings(SHOP_FAST_SERIALIZERS=fast):
+                        data = build()
+                        times[fast] = (best_of(build, opts["repeat"]), best_of(lambda: renderer.render(data), opts["repeat"]))
+                (b0, r0), (b1, r1) = times[False], times[True]
+                self.stdout.write(
+                    f"{name:<16} {b0:6.2f} → {b1:5.2f} ms {r0:6.2f} → {r1:5.2f} ms "
+                    f"{b0 + r0:6.2f} → {b1 + r1:5.2f} ms  x{(b0 + r0) / (b1 + r1):.1f}"
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, opts) -> Cart:
+        now = timezone.now()
+        products = Product.objects.bulk_create(
+            Product(
+                name=f"Producto {i}", slug=f"producto-{i}", price=Decimal("9990.00"), stock=100,
+                image=f"products/main/p{i}.jpg",
+                image_variants={v: {"webp": f"products/variants/p{i}-{v}.webp"} for v in ("thumb", "card")},
+                created_at=now - timedelta(seconds=i),
+            )
+            for i in range(opts["products"])
+        )
+        user = get_user_model().objects.create_user("bench", "bench@example.com")
+        cart = Cart.objects.create(user=user)
+        cart.items.bulk_create(
+            cart.items.model(cart=cart, product=p, qty=2, unit_price=p.price) for p in products[:opts["cart_items"]]
+        )
+        for i in range(opts["orders"]):
+            order = Order.objects.create(
+                email="a@example.com", full_name="A", address="Calle 1", city="Santiago",
+                subtotal=Decimal("0.00"), total=Decimal("0.00"), number=f"ORD-BENCH-{i:05d}",
+                created_at=now - timedelta(minutes=i),
+            )
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=p, qty=1, unit_price=p.price, subtotal=p.price)
+                for p in products[:opts["order_items"]]
+            )
+        return cart
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from shop.housekeeping import collect_garbage
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra en lotes las sesiones vencidas, los carritos de invitado abandonados "
+        "y los items huérfanos. Pensado para cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--pause", type=float, default=0.0, help="segundos entre lotes")
+
+    def handle(self, *args, **opts):
+        stats = collect_garbage(opts["batch_size"], opts["pause"])
+        self.stdout.write(
+            f"sesiones: {stats['sessions']}, carritos: {stats['carts']}, items: {stats['cart_items']}"
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from shop.media import collect_media_garbage
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra los blobs de imágenes que ya no usa ningún producto (con sus "
+        "variantes) y los temporales de subidas interrumpidas. Pensado para cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        stats = collect_media_garbage(opts["batch_size"])
+        self.stdout.write(f"blobs: {stats['blobs']}, temporales: {stats['tmp']}")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from shop.uploads import expire_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra en lotes las subidas por partes vencidas (SHOP_UPLOAD_TTL) con sus "
+        "archivos .part, y los archivos de uploads/ sin sesión. Pensado para cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--pause", type=float, default=0.0, help="segundos entre lotes")
+
+    def handle(self, *args, **opts):
+        stats = expire_uploads(opts["batch_size"], opts["pause"])
+        self.stdout.write(f"sesiones: {stats['sessions']}, archivos: {stats['files']}")
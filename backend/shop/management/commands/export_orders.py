@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from shop.exports import CONTENT_TYPES, KINDS, export_rows, filter_orders, render_export
+from shop.models import Order
+
+
+class Command(BaseCommand):
+    help = "Exporta órdenes o líneas de orden a CSV/NDJSON en streaming (memoria constante)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", choices=sorted(CONTENT_TYPES), default="csv")
+        parser.add_argument("--kind", choices=sorted(KINDS), default="orders")
+        parser.add_argument("--status")
+        parser.add_argument("--date-from")
+        parser.add_argument("--date-to")
+        parser.add_argument("--file", help="ruta de salida (por defecto stdout)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        params = {"status": opts["status"], "date_from": opts["date_from"], "date_to": opts["date_to"]}
+        try:
+            qs = filter_orders(Order.objects.all(), params)
+        except ValueError as e:
+            raise CommandError(str(e))
+        chunks = render_export(export_rows(qs, opts["kind"], opts["batch_size"]), opts["kind"], opts["output"])
+        if opts["file"]:
+            with open(opts["file"], "w", encoding="utf-8", newline="") as fh:
+                fh.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from shop.models import Product
+from shop.product_io import FORMATS, product_rows, render_products
+
+
+class Command(BaseCommand):
+    help = "Exporta el catálogo a CSV/NDJSON en streaming, con las columnas que acepta import_products."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", choices=FORMATS, default="csv")
+        parser.add_argument("--file", help="ruta de salida (por defecto stdout)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        chunks = render_products(product_rows(Product.objects.all(), opts["batch_size"]), opts["output"])
+        if opts["file"]:
+            with open(opts["file"], "w", encoding="utf-8", newline="") as fh:
+                fh.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
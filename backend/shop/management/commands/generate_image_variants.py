@@ -0,0 +1,61 @@
+from concurrent.futures import as_completed
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from shop.catalog import bump_catalog_version
+from shop.derivatives import VARIANT_FIELDS, process_pool, render_args, save_variants
+from shop.imaging import render_variants
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera las variantes (thumb/card/detail, webp...) de las imágenes ya subidas "
+        "en products/main/ y products/gallery/. Por defecto solo las que no tienen."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="regenerar también las que ya tienen variantes")
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **opts):
+        done = failed = 0
+        for model, field in VARIANT_FIELDS.items():
+            qs = model.objects.exclude(image="").exclude(image__isnull=True)
+            if not opts["all"]:
+                qs = qs.filter(**{field: {}})
+            last_pk = 0
+            while True:
+                batch = list(qs.filter(pk__gt=last_pk).order_by("pk").values_list("pk", "image")[:opts["batch_size"]])
+                if not batch:
+                    break
+                last_pk = batch[-1][0]
+                d, f = self.process(model, batch)
+                done, failed = done + d, failed + f
+        if done:
+            bump_catalog_version()
+        self.stdout.write(f"variantes generadas: {done}, con error: {failed}")
+
+    def process(self, model, batch):
+        if settings.SHOP_IMAGE_WORKERS <= 0:
+            jobs = []
+            for pk, name in batch:
+                try:
+                    jobs.append((pk, name, render_variants(*render_args(name)), None))
+                except Exception as e:
+                    jobs.append((pk, name, None, e))
+        else:
+            pool = process_pool()
+            futures = {pool.submit(render_variants, *render_args(name)): (pk, name) for pk, name in batch}
+            jobs = []
+            for fut in as_completed(futures):
+                pk, name = futures[fut]
+                exc = fut.exception()
+                jobs.append((pk, name, None if exc else fut.result(), exc))
+
+        done = failed = 0
+        for pk, name, variants, exc in jobs:
+            if exc is not None:
+                self.stderr.write(f"{name}: {exc}")
+                failed += 1
+            else:
+                done += save_variants(model, pk, name, variants, bump=False)
+        return done, failed
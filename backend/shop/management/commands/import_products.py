@@ -0,0 +1,32 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from shop.product_io import FORMATS, guess_format, import_products, read_rows
+
+
+class Command(BaseCommand):
+    help = "Importa productos desde CSV/NDJSON en lotes (upsert por slug, memoria constante)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="ruta del archivo ('-' = stdin)")
+        parser.add_argument("--input", choices=FORMATS, help="formato (por defecto según la extensión)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="solo valida, no escribe")
+
+    def handle(self, *args, **opts):
+        fmt = opts["input"] or guess_format(opts["file"])
+        if opts["file"] == "-":
+            stats = import_products(read_rows(sys.stdin, fmt), opts["batch_size"], opts["dry_run"])
+        else:
+            try:
+                fh = open(opts["file"], encoding="utf-8-sig", newline="")
+            except OSError as e:
+                raise CommandError(str(e))
+            with fh:
+                stats = import_products(read_rows(fh, fmt), opts["batch_size"], opts["dry_run"])
+        for err in stats["error_rows"]:
+            fields = ", ".join(f"{k}: {v}" for k, v in err["errors"].items())
+            self.stderr.write(f"línea {err['line']} ({err['slug'] or '-'}): {fields}")
+        self.stdout.write(
+            f"creados: {stats['created']}, actualizados: {stats['updated']}, "
+            f"sin cambios: {stats['unchanged']}, errores: {stats['errors']}"
+        )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from shop.analytics import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los resúmenes diarios de ventas desde las órdenes (todo o un rango "
+        "de días). Corre en una transacción; conviene hacerlo con poco tráfico."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date-from", help="YYYY-MM-DD (inclusive)")
+        parser.add_argument("--date-to", help="YYYY-MM-DD (inclusive)")
+
+    def handle(self, *args, **opts):
+        days = {}
+        for key in ("date_from", "date_to"):
+            if opts[key]:
+                try:
+                    days[key] = parse_date(opts[key])
+                except ValueError:
+                    days[key] = None
+                if days[key] is None:
+                    raise CommandError(f"fecha inválida: {opts[key]}")
+        stats = rebuild_rollups(**days)
+        self.stdout.write(f"días: {stats['days']}, filas: {stats['rows']}, filas por producto: {stats['product_rows']}")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from shop.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de búsqueda de productos (FTS5 en SQLite, GIN en Postgres)."
+
+    def handle(self, *args, **opts):
+        rebuild_search_index()
+        self.stdout.write("índice de búsqueda reconstruido")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from shop.holds import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Libera (borra) en lotes las reservas de stock vencidas. Pensado para cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--pause", type=float, default=0.0, help="segundos entre lotes")
+
+    def handle(self, *args, **opts):
+        removed = release_expired_holds(opts["batch_size"], opts["pause"])
+        self.stdout.write(f"holds liberados: {removed}")
@@ -0,0 +1,183 @@
+import mimetypes
+import os
+import re
+import shutil
+import stat
+import time
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+from .imaging import variant_dir
+from .models import Product, ProductImage
+from .storage import BLOB_DIR, blob_digest, content_storage
+
+# Archivos de MEDIA_ROOT: limpieza de blobs que ya nadie usa y la vista que los
+# sirve. Los blobs (y sus variantes, que llevan el blob y el tamaño en el
+# nombre) no cambian nunca de contenido: se sirven con Cache-Control immutable
+# por SHOP_MEDIA_MAX_AGE; el resto con ETag y revalidación. Todos aceptan Range
+# (un solo rango) para que el navegador o un CDN pidan sólo lo que les falta.
+
+BLOCK = 64 * 1024
+BLOB_VARIANTS = f"{variant_dir(BLOB_DIR)}/"
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def _referenced(names) -> set:
+    names = list(names)
+    return (
+        set(Product.objects.filter(image__in=names).values_list("image", flat=True))
+        | set(ProductImage.objects.filter(image__in=names).values_list("image", flat=True))
+    )
+
+def _recent(path: str, now: float) -> bool:
+    # Una subida que reusó el blob puede no haber guardado todavía su fila
+    try:
+        return os.stat(path).st_mtime > now - settings.SHOP_MEDIA_GRACE_SECONDS
+    except FileNotFoundError:
+        return False
+
+def _delete_blob(name: str):
+    content_storage.delete(name)
+    shutil.rmtree(content_storage.path(variant_dir(name)), ignore_errors=True)
+
+def release_media(names) -> int:
+    """
+    Borra los blobs de `names` (y sus variantes) que ya no usa ninguna
+    imagen. Llamar después del commit que quitó la referencia. Devuelve los
+    blobs borrados.
+    """
+    candidates = {n for n in names if blob_digest(n)}
+    if not candidates:
+        return 0
+    now = time.time()
+    removed = 0
+    for name in sorted(candidates - _referenced(candidates)):
+        if not _recent(content_storage.path(name), now):
+            _delete_blob(name)
+            removed += 1
+    return removed
+
+def collect_media_garbage(batch_size: int = 500) -> dict:
+    """
+    Barrido para cron: blobs sin referencias (imágenes borradas en cascada o
+    justo después de subirlas) y temporales de subidas interrumpidas.
+    """
+    root = content_storage.path(BLOB_DIR)
+    now = time.time()
+    stats = {"blobs": 0, "tmp": 0}
+    batch = []
+
+    def flush():
+        for name in sorted(set(batch) - _referenced(batch)):
+            _delete_blob(name)
+            stats["blobs"] += 1
+        batch.clear()
+
+    for dirpath, _, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(dirpath, filename)
+            if _recent(path, now):
+                continue
+            name = os.path.relpath(path, content_storage.location).replace(os.sep, "/")
+            if name.endswith(".tmp"):
+                os.remove(path)
+                stats["tmp"] += 1
+            elif blob_digest(name):
+                batch.append(name)
+                if len(batch) >= batch_size:
+                    flush()
+    flush()
+    return stats
+
+def parse_range(header: str, size: int):
+    """
+    (inicio, fin inclusive) de un Range de un solo rango en bytes. None si no
+    se entiende o no aplica (se responde el archivo entero); ValueError si no
+    se puede satisfacer (416).
+    """
+    m = RANGE_RE.match(header.strip())
+    if not m or m.groups() == ("", ""):
+        return None
+    first, last = m.groups()
+    if not first:
+        # Sufijo: los últimos N bytes
+        if int(last) == 0 or size == 0:
+            raise ValueError("unsatisfiable")
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError("unsatisfiable")
+    return start, min(int(last), size - 1) if last else size - 1
+
+def _read(path: str, start: int, length: int):
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        while length > 0:
+            block = fh.read(min(BLOCK, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+def _if_range_matches(request, etag: str, mtime: int) -> bool:
+    value = request.headers.get("If-Range")
+    if not value:
+        return True
+    if value.startswith(('"', 'W/"')):
+        return value == etag
+    return parse_http_date_safe(value) == mtime
+
+def _file_response(request, full: str, size: int, etag: str, mtime: int):
+    content_type = mimetypes.guess_type(full)[0] or "application/octet-stream"
+    byte_range = None
+    if "Range" in request.headers and _if_range_matches(request, etag, mtime):
+        try:
+            byte_range = parse_range(request.headers["Range"], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+    if request.method == "HEAD":
+        response = HttpResponse(content_type=content_type)
+        response["Content-Length"] = size
+        return response
+    if byte_range is None:
+        return FileResponse(open(full, "rb"), content_type=content_type)
+    start, end = byte_range
+    response = StreamingHttpResponse(_read(full, start, end - start + 1), status=206, content_type=content_type)
+    response["Content-Length"] = end - start + 1
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return response
+
+@require_safe
+def serve_media(request, path):
+    try:
+        full = os.path.realpath(safe_join(content_storage.location, path))
+        st = os.stat(full)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    # Ni las subidas por partes ni los temporales del storage son públicos; se
+    # mira la ruta ya resuelta ("blobs/../uploads/..." es lo mismo)
+    uploads = os.path.realpath(content_storage.path("uploads"))
+    if full.startswith(uploads + os.sep) or full.endswith(".tmp") or not stat.S_ISREG(st.st_mode):
+        raise Http404
+    path = os.path.relpath(full, os.path.realpath(content_storage.location)).replace(os.sep, "/")
+
+    mtime = int(st.st_mtime)
+    etag = quote_etag(blob_digest(path) or f"{st.st_size:x}-{st.st_mtime_ns:x}")
+    response = get_conditional_response(request, etag=etag, last_modified=mtime)
+    if response is None:
+        response = _file_response(request, full, st.st_size, etag, mtime)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(mtime)
+    response["Accept-Ranges"] = "bytes"
+    if blob_digest(path) or path.startswith(BLOB_VARIANTS):
+        response["Cache-Control"] = f"public, max-age={settings.SHOP_MEDIA_MAX_AGE}, immutable"
+    else:
+        response["Cache-Control"] = "public, no-cache"
+    return response
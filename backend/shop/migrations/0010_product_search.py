@@ -0,0 +1,59 @@
+from django.db import migrations
+
+# SQL fijo a propósito: la migración no depende de shop/search.py, que puede cambiar.
+# SQLite: tabla FTS5 de contenido externo más triggers que la mantienen al día.
+# Postgres: índice GIN sobre el tsvector que arma la búsqueda.
+
+SQLITE_TRIGGERS = [
+    """CREATE TRIGGER shop_product_fts_ai AFTER INSERT ON shop_product BEGIN
+        INSERT INTO shop_product_fts(rowid, name, slug) VALUES (new.id, new.name, new.slug);
+    END""",
+    """CREATE TRIGGER shop_product_fts_ad AFTER DELETE ON shop_product BEGIN
+        INSERT INTO shop_product_fts(shop_product_fts, rowid, name, slug) VALUES ('delete', old.id, old.name, old.slug);
+    END""",
+    """CREATE TRIGGER shop_product_fts_au AFTER UPDATE OF name, slug ON shop_product BEGIN
+        INSERT INTO shop_product_fts(shop_product_fts, rowid, name, slug) VALUES ('delete', old.id, old.name, old.slug);
+        INSERT INTO shop_product_fts(rowid, name, slug) VALUES (new.id, new.name, new.slug);
+    END""",
+]
+SQLITE_SETUP = [
+    """CREATE VIRTUAL TABLE shop_product_fts USING fts5(
+        name, slug, content='shop_product', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2", prefix='1 2 3'
+    )""",
+    *SQLITE_TRIGGERS,
+    # Indexa los productos que ya existen
+    "INSERT INTO shop_product_fts(shop_product_fts) VALUES ('rebuild')",
+]
+SQLITE_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS shop_product_fts_au",
+    "DROP TRIGGER IF EXISTS shop_product_fts_ad",
+    "DROP TRIGGER IF EXISTS shop_product_fts_ai",
+    "DROP TABLE IF EXISTS shop_product_fts",
+]
+PG_SETUP = [
+    "CREATE INDEX IF NOT EXISTS shop_product_search_idx ON shop_product "
+    "USING gin (to_tsvector('simple', name || ' ' || replace(slug, '-', ' ')))"
+]
+PG_TEARDOWN = ["DROP INDEX IF EXISTS shop_product_search_idx"]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_order_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({"sqlite": SQLITE_SETUP, "postgresql": PG_SETUP}),
+            run({"sqlite": SQLITE_TEARDOWN, "postgresql": PG_TEARDOWN}),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:02
+
+import shop.storage
+from django.db import migrations, models
+
+
+# En SQLite AlterField rehace shop_product y se pierden los triggers que
+# mantienen shop_product_fts (0010): se sacan antes y se vuelven a crear
+# después. La tabla FTS no cambia (los id se conservan). SQL fijo a propósito.
+
+SQLITE_DROP_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS shop_product_fts_au",
+    "DROP TRIGGER IF EXISTS shop_product_fts_ad",
+    "DROP TRIGGER IF EXISTS shop_product_fts_ai",
+]
+SQLITE_CREATE_TRIGGERS = [
+    """CREATE TRIGGER shop_product_fts_ai AFTER INSERT ON shop_product BEGIN
+        INSERT INTO shop_product_fts(rowid, name, slug) VALUES (new.id, new.name, new.slug);
+    END""",
+    """CREATE TRIGGER shop_product_fts_ad AFTER DELETE ON shop_product BEGIN
+        INSERT INTO shop_product_fts(shop_product_fts, rowid, name, slug) VALUES ('delete', old.id, old.name, old.slug);
+    END""",
+    """CREATE TRIGGER shop_product_fts_au AFTER UPDATE OF name, slug ON shop_product BEGIN
+        INSERT INTO shop_product_fts(shop_product_fts, rowid, name, slug) VALUES ('delete', old.id, old.name, old.slug);
+        INSERT INTO shop_product_fts(rowid, name, slug) VALUES (new.id, new.name, new.slug);
+    END""",
+]
+
+
+def sqlite(statements):
+    def apply(apps, schema_editor):
+        if schema_editor.connection.vendor == "sqlite":
+            for sql in statements:
+                schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0011_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(sqlite(SQLITE_DROP_TRIGGERS), sqlite(SQLITE_CREATE_TRIGGERS)),
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, null=True, storage=shop.storage.product_media_storage, upload_to='products/main/'),
+        ),
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=models.ImageField(db_index=True, storage=shop.storage.product_media_storage, upload_to='products/gallery/'),
+        ),
+        migrations.RunPython(sqlite(SQLITE_CREATE_TRIGGERS), sqlite(SQLITE_DROP_TRIGGERS)),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:13
+
+import shop.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0012_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True, default=shop.models.upload_expiry),
+        ),
+    ]
@@ -1,6 +1,10 @@
+import uuid
+from datetime import timedelta
 from django.conf import settings
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
+from .storage import product_media_storage
 
 User = settings.AUTH_USER_MODEL
 
@@ -10,18 +14,44 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
-    image = models.ImageField(upload_to="products/main/", blank=True, null=True)  # imagen principal
+    # imagen principal; se guarda por contenido (shop/storage.py)
+    image = models.ImageField(upload_to="products/main/", storage=product_media_storage, blank=True, null=True, db_index=True)
+    image_variants = models.JSONField(default=dict, blank=True)  # {variante: {formato: ruta}}, ver shop/imaging.py
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"]),
+        ]
+
     def __str__(self):
         return self.name
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, related_name="images", on_delete=models.CASCADE)
-    image = models.ImageField(upload_to="products/gallery/")
+    image = models.ImageField(upload_to="products/gallery/", storage=product_media_storage, db_index=True)
+    variants = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
 
 
+def upload_expiry():
+    return timezone.now() + timedelta(seconds=settings.SHOP_UPLOAD_TTL)
+
+class UploadSession(models.Model):
+    """Subida por partes de una imagen de galería (ver shop/uploads.py)."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    product = models.ForeignKey(Product, related_name="upload_sessions", on_delete=models.CASCADE)
+    filename = models.CharField(max_length=200)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    received = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    # Se corre con cada parte; vencida, la borra `manage.py cleanup_uploads`
+    expires_at = models.DateTimeField(default=upload_expiry, db_index=True)
+    # La imagen creada al finalizar: repetir el finalize la devuelve en vez de crear otra
+    image = models.OneToOneField(ProductImage, null=True, blank=True, related_name="+", on_delete=models.CASCADE)
+
+
 class Cart(models.Model):
     user = models.ForeignKey(User, null=True, blank=True, on_delete=models.CASCADE)
     session_key = models.CharField(max_length=40, null=True, blank=True, db_index=True)
@@ -40,7 +70,8 @@ class Cart(models.Model):
 
     @property
     def total(self):
-        return sum((i.subtotal for i in self.items.select_related("product")), 0)
+        # subtotal no necesita el producto; usa los items prefetcheados si los hay
+        return sum((i.subtotal for i in self.items.all()), 0)
 
 
 class CartItem(models.Model):
@@ -56,6 +87,20 @@ class CartItem(models.Model):
     def subtotal(self):
         return self.unit_price * self.qty
     
+class StockHold(models.Model):
+    """Unidades retenidas por un carrito hasta expires_at (ver shop/holds.py)."""
+    cart = models.ForeignKey(Cart, related_name="holds", on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name="holds", on_delete=models.CASCADE)
+    qty = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("cart", "product")
+        indexes = [
+            models.Index(fields=["product", "expires_at"]),
+            models.Index(fields=["expires_at"]),
+        ]
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ("pending", "Pending"),
@@ -79,8 +124,24 @@ class Order(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     number = models.CharField(max_length=20, unique=True, db_index=True)  # ej: ORD-20250903-0001
 
+    class Meta:
+        # Listado del admin: orden (-created_at, -id) con filtros por estado y email
+        indexes = [
+            models.Index(fields=["created_at", "id"]),
+            models.Index(fields=["status", "created_at", "id"]),
+            models.Index(Upper("email"), "created_at", name="shop_order_email_created_idx"),
+        ]
+
     def __str__(self):
         return self.number
+
+class OrderSequence(models.Model):
+    """Último correlativo de orden asignado por día (ORD-YYYYMMDD-NNNN)."""
+    day = models.DateField(unique=True)
+    last = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day:%Y%m%d}:{self.last}"
     
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name="items", on_delete=models.CASCADE)
@@ -88,3 +149,41 @@ class OrderItem(models.Model):
     qty = models.PositiveIntegerField()
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+
+class DailySales(models.Model):
+    """
+    Resumen diario de ventas por estado de orden (día local de created_at).
+    Lo mantiene shop.analytics al crear órdenes y cambiar su estado; se
+    reconstruye con `manage.py rebuild_sales_rollups`.
+    """
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["day", "status"], name="shop_dailysales_day_status_uniq")]
+
+    def __str__(self):
+        return f"{self.day} {self.status}"
+
+class DailyProductSales(models.Model):
+    """Unidades y venta (suma de subtotales de línea) por producto, día y estado."""
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "status", "product"], name="shop_dailyproductsales_uniq"),
+        ]
+        # Cubre el ranking por rango de días sin leer la tabla
+        indexes = [
+            models.Index(fields=["day", "status", "product", "units", "revenue"], name="shop_dailyproductsales_cov"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status} {self.product_id}"
@@ -0,0 +1,68 @@
+import base64
+import binascii
+import json
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# Paginación por cursor (keyset) sobre (created_at, id).
+# El cursor es opaco para el cliente: base64 de [created_at, id] de la última fila.
+
+def encode_cursor(created_at, pk) -> str:
+    raw = json.dumps([created_at.isoformat(), pk], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        ts, pk = json.loads(raw)
+        created_at = parse_datetime(ts)
+        if created_at is None:
+            raise ValueError(ts)
+        return created_at, int(pk)
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("invalid_cursor")
+
+def page_size(params, default: int, maximum: int) -> int:
+    raw = params.get("limit")
+    if raw in (None, ""):
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ValueError("invalid_limit")
+    if limit < 1:
+        raise ValueError("invalid_limit")
+    return min(limit, maximum)
+
+def keyset_queryset(qs, after, limit: int, descending: bool = False):
+    """Filtra después del cursor y trae limit+1 filas, para saber si hay otra página sin un COUNT."""
+    if after is not None:
+        created_at, pk = after
+        if descending:
+            qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+        else:
+            qs = qs.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+    order = ("-created_at", "-id") if descending else ("created_at", "id")
+    return qs.order_by(*order)[:limit + 1]
+
+def keyset_split(rows, limit: int):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        # Instancias o filas .values()
+        if isinstance(last, dict):
+            next_cursor = encode_cursor(last["created_at"], last["id"])
+        else:
+            next_cursor = encode_cursor(last.created_at, last.id)
+    return rows, next_cursor
+
+def keyset_page(qs, after, limit: int, descending: bool = False):
+    """Devuelve (filas, cursor_siguiente)."""
+    return keyset_split(list(keyset_queryset(qs, after, limit, descending)), limit)
+
+async def akeyset_page(qs, after, limit: int, descending: bool = False):
+    rows = [row async for row in keyset_queryset(qs, after, limit, descending)]
+    return keyset_split(rows, limit)
@@ -0,0 +1,147 @@
+import csv
+import json
+from itertools import islice
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from .catalog import bump_catalog_version
+from .exports import _value, render_rows
+from .models import Product
+from .pagination import decode_cursor, keyset_page
+
+# Carga y descarga masiva del catálogo (CSV / NDJSON) con las mismas columnas
+# en ambos sentidos. La importación hace upsert por slug en lotes: por lote una
+# consulta para traer los existentes, un bulk_create de los nuevos y otro con
+# update_conflicts (INSERT ... ON CONFLICT DO UPDATE) para los que cambiaron,
+# cada lote en su propia transacción. bulk_update arma un CASE por fila y
+# columna, y con lotes grandes resulta varias veces más lento. Las filas se validan con los campos del
+# modelo (sin consultas) y las que fallan se reportan con su número de línea
+# sin detener el resto. Nada se acumula entre lotes salvo los contadores.
+
+PRODUCT_FIELDS = ["slug", "name", "price", "stock", "is_active"]
+REQUIRED_ON_CREATE = ("name", "price")
+FORMATS = ("csv", "ndjson")
+MAX_REPORTED_ERRORS = 1000
+TRUE_VALUES = {"1", "true", "t", "yes", "y", "si", "sí"}
+FALSE_VALUES = {"0", "false", "f", "no", "n"}
+
+def guess_format(filename: str) -> str:
+    return "ndjson" if filename.lower().endswith((".ndjson", ".jsonl", ".json")) else "csv"
+
+def read_rows(stream, fmt: str):
+    """(línea, fila, error) por cada fila de un archivo de texto. Celdas vacías = sin valor."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {k: v for k, v in row.items() if k in PRODUCT_FIELDS and v not in ("", None)}, None
+        return
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_no, None, "invalid_json"
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, "invalid_json"
+            continue
+        yield line_no, {k: v for k, v in row.items() if k in PRODUCT_FIELDS and v is not None}, None
+
+def clean_value(name: str, raw):
+    """Valor limpio según el campo del modelo; levanta ValidationError."""
+    if name == "is_active" and isinstance(raw, str):
+        low = raw.strip().lower()
+        raw = True if low in TRUE_VALUES else False if low in FALSE_VALUES else raw
+    elif isinstance(raw, str):
+        raw = raw.strip()
+    return Product._meta.get_field(name).clean(raw, None)
+
+def clean_row(row: dict):
+    """Valida con los campos del modelo. Devuelve (valores, errores por campo)."""
+    values, errors = {}, {}
+    if "slug" not in row:
+        errors["slug"] = "required"
+    for name, raw in row.items():
+        try:
+            values[name] = clean_value(name, raw)
+        except ValidationError as e:
+            errors[name] = " ".join(e.messages)
+    return values, errors
+
+def _batches(iterable, size):
+    it = iter(iterable)
+    while batch := list(islice(it, size)):
+        yield batch
+
+def import_products(rows, batch_size: int = 1000, dry_run: bool = False) -> dict:
+    """
+    Upsert por slug de las filas de read_rows(). Una fila repetida dentro del
+    mismo lote se combina con la anterior (gana la última).
+    """
+    stats = {"created": 0, "updated": 0, "unchanged": 0, "errors": 0, "error_rows": []}
+
+    def reject(line, slug, errors):
+        stats["errors"] += 1
+        if len(stats["error_rows"]) < MAX_REPORTED_ERRORS:
+            stats["error_rows"].append({"line": line, "slug": slug, "errors": errors})
+
+    for batch in _batches(rows, batch_size):
+        valid = {}
+        for line, row, error in batch:
+            if error:
+                reject(line, None, {"row": error})
+                continue
+            values, errors = clean_row(row)
+            if errors:
+                reject(line, row.get("slug"), errors)
+                continue
+            prev = valid.get(values["slug"])
+            valid[values["slug"]] = (line, {**prev[1], **values} if prev else values)
+
+        existing = Product.objects.only("id", *PRODUCT_FIELDS).in_bulk(list(valid), field_name="slug")
+        to_create, to_update, fields = [], [], set()
+        for slug, (line, values) in valid.items():
+            product = existing.get(slug)
+            if product is None:
+                missing = [f for f in REQUIRED_ON_CREATE if f not in values]
+                if missing:
+                    reject(line, slug, {f: "required" for f in missing})
+                    continue
+                to_create.append(Product(**values))
+                continue
+            changed = {f for f, v in values.items() if getattr(product, f) != v}
+            if not changed:
+                stats["unchanged"] += 1
+                continue
+            fields |= changed
+            to_update.append(Product(**{f: getattr(product, f) for f in PRODUCT_FIELDS} | values))
+
+        if not dry_run:
+            with transaction.atomic():
+                Product.objects.bulk_create(to_create)
+                if to_update:
+                    Product.objects.bulk_create(
+                        to_update, update_conflicts=True, unique_fields=["slug"], update_fields=sorted(fields)
+                    )
+        stats["created"] += len(to_create)
+        stats["updated"] += len(to_update)
+
+    # bulk_create/bulk_update no disparan señales: una sola invalidación al final
+    if not dry_run and (stats["created"] or stats["updated"]):
+        bump_catalog_version()
+    return stats
+
+def product_rows(qs, batch_size: int = 1000):
+    """Filas de exportación recorriendo por cursor (created_at, id)."""
+    qs = qs.only("id", "created_at", *PRODUCT_FIELDS)
+    after = None
+    while True:
+        products, next_cursor = keyset_page(qs, after, batch_size)
+        for p in products:
+            yield {f: _value(getattr(p, f)) for f in PRODUCT_FIELDS}
+        if not next_cursor:
+            return
+        after = decode_cursor(next_cursor)
+
+def render_products(rows, fmt: str):
+    return render_rows(rows, PRODUCT_FIELDS, fmt)
@@ -0,0 +1,160 @@
+import contextvars
+import cProfile
+import logging
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework import authentication
+from .querybudget import current_stats
+from .renderers import ORJSONRenderer
+
+# Tiempos por fase de cada request en el header Server-Timing (los muestran las
+# devtools del navegador):
+#   auth       autenticación de DRF (sesión + usuario)
+#   db         tiempo en la base (lo cuenta querybudget)
+#   serialize  serializers de DRF (sólo el nivel exterior)
+#   view       la vista completa (incluye auth, db y serialize)
+#   render     JSON de la respuesta
+#   total      todo lo que corre dentro del middleware
+# Más las fases propias que marque el código con `phase("nombre")` (p. ej.
+# "order" en el checkout). Las fases se miden con un ContextVar: sin
+# SHOP_SERVER_TIMING no hay nada que medir y cada punto de medición es un get().
+#
+# Perfiles: con SHOP_PROFILE_SAMPLE_RATE (fracción de requests al azar) o con el
+# header X-Profile: 1 de un usuario staff se corre el request bajo cProfile y se
+# guarda un .prof en SHOP_PROFILE_DIR (se abre con pstats o snakeviz). Sólo en
+# el camino sync: bajo ASGI el loop atiende varios requests a la vez.
+# SHOP_SERVER_TIMING viene con DEBUG: en producción el header (tiempo en la base,
+# cantidad de consultas) sólo va a quien pide un perfil con X-Profile y es staff.
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+_BUILTIN = ("auth", "db", "serialize", "view", "render")
+
+_current = contextvars.ContextVar("server_timing", default=None)
+
+class Timings:
+    __slots__ = ("durations", "open")
+
+    def __init__(self):
+        self.durations = {}
+        self.open = set()
+
+@contextmanager
+def phase(name: str):
+    """Suma el tiempo del bloque a la fase `name` del request en curso."""
+    timings = _current.get()
+    if timings is None or name in timings.open:
+        yield
+        return
+    timings.open.add(name)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.durations[name] = timings.durations.get(name, 0.0) + time.perf_counter() - t0
+        timings.open.discard(name)
+
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        timings = _current.get()
+        if timings is None or "serialize" in timings.open:
+            return super().to_representation(instance)
+        with phase("serialize"):
+            return super().to_representation(instance)
+
+class SessionAuthentication(authentication.SessionAuthentication):
+    def authenticate(self, request):
+        with phase("auth"):
+            return super().authenticate(request)
+
+class JSONRenderer(ORJSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with phase("render"):
+            return super().render(data, accepted_media_type, renderer_context)
+
+def server_timing(timings: Timings, total: float, profile=None) -> str:
+    durations = dict(timings.durations)
+    # La vista es lo que no fue render (el render de DRF corre dentro del handler)
+    durations["view"] = max(0.0, total - durations.get("render", 0.0))
+    stats = current_stats()
+    metrics = []
+    for name in (*_BUILTIN, *sorted(set(durations) - set(_BUILTIN))):
+        if name == "db" and stats is not None:
+            metrics.append(f'db;dur={stats.time * 1000:.1f};desc="{stats.count} consultas"')
+        elif name in durations:
+            metrics.append(f"{name};dur={durations[name] * 1000:.1f}")
+    metrics.append(f"total;dur={total * 1000:.1f}")
+    if profile:
+        metrics.append(f'profile;desc="{profile}"')
+    return ", ".join(metrics)
+
+def _staff_profile(request) -> bool:
+    if request.headers.get(PROFILE_HEADER) != "1":
+        return False
+    user = getattr(request, "user", None)
+    return user is not None and user.is_staff
+
+def _sampled() -> bool:
+    rate = settings.SHOP_PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+def _start_profiler():
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Ya hay otro profiler activo (otro request o una herramienta externa)
+        return None
+    return profiler
+
+def _save_profile(profiler, request, total: float) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", request.path).strip("-") or "root"
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{slug}-{total * 1000:.0f}ms-{random.getrandbits(24):06x}.prof"
+    os.makedirs(settings.SHOP_PROFILE_DIR, exist_ok=True)
+    profiler.dump_stats(os.path.join(settings.SHOP_PROFILE_DIR, name))
+    logger.info("perfil de %s %s en %s", request.method, request.path, name)
+    return name
+
+@sync_and_async_middleware
+def server_timing_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not settings.SHOP_SERVER_TIMING:
+                return await get_response(request)
+            timings = Timings()
+            token = _current.set(timings)
+            t0 = time.perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            response["Server-Timing"] = server_timing(timings, time.perf_counter() - t0)
+            return response
+    else:
+        def middleware(request):
+            staff = _staff_profile(request)
+            profiler = _start_profiler() if staff or _sampled() else None
+            timings = Timings() if settings.SHOP_SERVER_TIMING or (staff and profiler) else None
+            if timings is None and profiler is None:
+                return get_response(request)
+            token = _current.set(timings)
+            t0 = time.perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+                if profiler is not None:
+                    profiler.disable()
+            total = time.perf_counter() - t0
+            profile = _save_profile(profiler, request, total) if profiler is not None else None
+            if timings is not None:
+                response["Server-Timing"] = server_timing(timings, total, profile)
+            return response
+    return middleware
@@ -0,0 +1,139 @@
+import contextvars
+import logging
+import time
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.utils.decorators import sync_and_async_middleware
+
+# Presupuesto de consultas por request. Cada conexión a la base lleva un
+# execute_wrapper (se instala al conectarse, ver ShopConfig.ready) que suma
+# consultas y tiempo en el QueryStats del request en curso; el request se
+# identifica con un ContextVar, así también cuentan las consultas que una vista
+# async hace en threads vía sync_to_async.
+# El presupuesto sale de SHOP_QUERY_BUDGET_ROUTES["<MÉTODO> <ruta>"] (la ruta
+# como queda en request.resolver_match.route) o de SHOP_QUERY_BUDGET. Si se
+# excede se registra un warning, y con SHOP_QUERY_BUDGET_RAISE (tests / DEBUG)
+# el request falla con QueryBudgetExceeded, sólo si no escribió nada: con la
+# escritura ya confirmada un 500 le diría al cliente que falló algo que quedó
+# hecho (tampoco si ya falló con un 5xx, para no tapar el error real). Las
+# rutas que escriben se controlan en los tests comparando lo medido con el
+# presupuesto. Lo que no está en todos los requests de la
+# ruta (una consulta por línea del carrito, pasar el carrito de la cookie a la
+# base) no va en el presupuesto fijo: el código que lo hace lo declara con
+# allow_queries(n).
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("query_stats", default=None)
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+class QueryStats:
+    __slots__ = ("count", "time", "allowed", "wrote")
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.allowed = 0
+        self.wrote = False
+
+# El control de transacciones no cuenta: los savepoints son cada atomic() en
+# los tests (que corren dentro de una transacción) y BEGIN/COMMIT cada atomic()
+# de primer nivel en producción; ninguno depende de lo que hace la vista
+TRANSACTION_CONTROL = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK", "BEGIN", "COMMIT")
+WRITES = ("INSERT", "UPDATE", "DELETE")
+
+def count_queries(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None or sql.startswith(TRANSACTION_CONTROL):
+        return execute(sql, params, many, context)
+    t0 = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.time += time.perf_counter() - t0
+        stats.wrote = stats.wrote or sql.lstrip()[:6].upper() in WRITES
+
+def install(connection, **kwargs):
+    """Receptor de connection_created (y útil para conexiones ya abiertas)."""
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+def current_stats():
+    """QueryStats del request en curso (None fuera de un request)."""
+    return _current.get()
+
+def allow_queries(n: int):
+    """Suma `n` consultas al presupuesto del request en curso (por elemento de la entrada o por un camino aparte)."""
+    stats = _current.get()
+    if stats is not None:
+        stats.allowed += n
+
+def route_key(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    return f"{request.method} {match.route if match else request.path_info}"
+
+def budget_for(key: str):
+    return settings.SHOP_QUERY_BUDGET_ROUTES.get(key, settings.SHOP_QUERY_BUDGET)
+
+def _streamed(content, request, stats):
+    # Las respuestas en streaming (exportaciones) consultan mientras se envían:
+    # se sigue contando hasta el último bloque y recién ahí se revisa
+    iterator = iter(content)
+    while True:
+        token = _current.set(stats)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            break
+        finally:
+            _current.reset(token)
+        yield chunk
+    _check(request, stats)
+
+def _finish(request, response, stats):
+    if response.streaming and not response.is_async:
+        response.streaming_content = _streamed(response.streaming_content, request, stats)
+    else:
+        _check(request, stats, failed=response.status_code >= 500)
+    return response
+
+def _check(request, stats, failed: bool = False):
+    request.query_stats = stats
+    key = route_key(request)
+    budget = budget_for(key)
+    if budget is None or stats.count <= budget + stats.allowed:
+        return
+    limit = f"{budget} + {stats.allowed}" if stats.allowed else budget
+    message = f"{key}: {stats.count} consultas (presupuesto {limit}), {stats.time * 1000:.1f} ms en la base"
+    logger.warning(message)
+    if settings.SHOP_QUERY_BUDGET_RAISE and not failed and not stats.wrote:
+        raise QueryBudgetExceeded(message)
+
+@sync_and_async_middleware
+def query_budget_middleware(get_response):
+    for connection in connections.all(initialized_only=True):
+        install(connection)
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            stats = QueryStats()
+            token = _current.set(stats)
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            return _finish(request, response, stats)
+    else:
+        def middleware(request):
+            stats = QueryStats()
+            token = _current.set(stats)
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+            return _finish(request, response, stats)
+    return middleware
@@ -0,0 +1,30 @@
+import orjson
+from rest_framework import renderers
+
+# JSON de las respuestas con orjson en vez de json.dumps: mismos bytes que el
+# JSONRenderer de DRF con la configuración por defecto (compacto, UTF-8 sin
+# escapar, U+2028/U+2029 escapados). Lo que orjson no sabe serializar (Decimal,
+# datetime, lazy strings...) pasa por el mismo JSONEncoder de DRF.
+# Diferencias conocidas, ninguna con lo que devuelve la API: floats con
+# exponente (>= 1e16 o < 1e-4) salen como 1e16 en vez de 1e+16 (el mismo
+# número) y NaN/Infinity salen como null en vez de fallar.
+
+OPTIONS = (
+    orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+)
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        # Indentado o con la configuración de json no por defecto: el de DRF
+        if self.get_indent(accepted_media_type, renderer_context or {}) or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            # Enteros de más de 64 bits, tipos desconocidos: el de DRF da el resultado o el error de siempre
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
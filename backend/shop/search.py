@@ -0,0 +1,82 @@
+import re
+from django.conf import settings
+from django.db import connection, connections, router
+from .models import Product
+
+# Búsqueda de productos por nombre y slug, con ranking y prefijos ("mes" -> "mesa").
+# SQLite: tabla FTS5 de contenido externo (shop_product_fts) que mantienen al
+# día triggers sobre shop_product, así también cubre update() y bulk_create.
+# Postgres: índice GIN sobre el mismo tsvector que arma la consulta.
+# Otros motores: icontains sin ranking. La tabla, los triggers y el índice los
+# crea la migración 0010; PG_DOCUMENT tiene que ser la expresión de ese índice.
+# Ver también `rebuild_search_index`.
+
+FTS_TABLE = "shop_product_fts"
+PG_INDEX = "shop_product_search_idx"
+PG_DOCUMENT = "to_tsvector('simple', name || ' ' || replace(slug, '-', ' '))"
+
+def search_terms(q: str) -> list:
+    return re.findall(r"\w+", q.lower())[:8]
+
+# Se rankean todos los productos activos que calzan y se corta recién después
+# del ORDER BY: con LIMIT la base ordena guardando solo los mejores `limit`, y
+# un término muy común no deja afuera los calces más relevantes.
+
+def _sqlite_ids(db, terms, limit):
+    # Cada término entre comillas (sin sintaxis FTS del usuario) y como prefijo.
+    # rank es bm25, que pondera más el nombre que el slug.
+    match = " ".join(f'"{t}"*' for t in terms)
+    sql = (
+        f"SELECT p.id FROM {FTS_TABLE} JOIN shop_product p ON p.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rank MATCH 'bm25(10.0, 1.0)' AND p.is_active "
+        f"ORDER BY {FTS_TABLE}.rank, p.id LIMIT %s"
+    )
+    with connections[db].cursor() as c:
+        c.execute(sql, [match, limit])
+        return [row[0] for row in c.fetchall()]
+
+def _postgres_ids(db, terms, limit):
+    query = " & ".join(f"{t}:*" for t in terms)
+    sql = (
+        f"SELECT id FROM shop_product, to_tsquery('simple', %s) q "
+        f"WHERE is_active AND {PG_DOCUMENT} @@ q "
+        f"ORDER BY ts_rank({PG_DOCUMENT}, q) DESC, id LIMIT %s"
+    )
+    with connections[db].cursor() as c:
+        c.execute(sql, [query, limit])
+        return [row[0] for row in c.fetchall()]
+
+def search_products(q: str, limit: int, fields=None) -> list:
+    """
+    Productos activos que calzan con todos los términos de `q`, del más
+    relevante al menos. Con `fields`, filas .values() en vez de instancias.
+    """
+    terms = search_terms(q)
+    if not terms:
+        return []
+    # SQL crudo: la base la elige el router, igual que para el ORM (réplicas)
+    db = router.db_for_read(Product)
+    vendor = connections[db].vendor
+    if vendor == "sqlite":
+        ids = _sqlite_ids(db, terms, limit)
+    elif vendor == "postgresql":
+        ids = _postgres_ids(db, terms, limit)
+    else:
+        qs = Product.objects.filter(is_active=True)
+        for t in terms:
+            qs = qs.filter(name__icontains=t)
+        qs = qs.order_by("name", "id")[:limit]
+        return list(qs.values(*fields) if fields else qs)
+    if fields:
+        products = {r["id"]: r for r in Product.objects.using(db).filter(pk__in=ids).values(*fields)}
+    else:
+        products = Product.objects.using(db).in_bulk(ids)
+    return [products[pk] for pk in ids if pk in products]
+
+def rebuild_search_index():
+    """Reconstruye el índice desde shop_product (p. ej. tras cargar datos con SQL crudo)."""
+    with connection.cursor() as c:
+        if connection.vendor == "sqlite":
+            c.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        elif connection.vendor == "postgresql":
+            c.execute(f"REINDEX INDEX {PG_INDEX}")
@@ -1,29 +1,42 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from .models import Product, ProductImage, Cart, CartItem, Order, OrderItem
+from .profiling import TimedSerializerMixin
 
-class ProductSerializer(serializers.ModelSerializer):
+class ImageVariantsField(serializers.ReadOnlyField):
+    """{variante: {formato: ruta}} -> {variante: {formato: url}}"""
+    def to_representation(self, value):
+        return {
+            variant: {fmt: default_storage.url(name) for fmt, name in formats.items()}
+            for variant, formats in (value or {}).items()
+        }
+
+class ProductSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
     class Meta:
         model = Product
-        fields = ["id", "name", "slug", "price", "stock", "is_active"]
+        fields = ["id", "name", "slug", "price", "stock", "is_active", "image", "image_variants"]
 
-class ProductImageSerializer(serializers.ModelSerializer):
+class ProductImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    variants = ImageVariantsField()
     class Meta:
         model = ProductImage
-        fields = ["id", "image"]
+        fields = ["id", "image", "variants"]
 
-class ProductAdminSerializer(serializers.ModelSerializer):
+class ProductAdminSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     images = ProductImageSerializer(many=True, read_only=True)
+    image_variants = ImageVariantsField()
     class Meta:
         model = Product
-        fields = ["id","name","slug","price","stock","is_active","image","images"]
+        fields = ["id","name","slug","price","stock","is_active","image","image_variants","images"]
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     class Meta:
         model = CartItem
         fields = ["id", "product", "qty", "unit_price", "subtotal"]
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total = serializers.SerializerMethodField()
     class Meta:
@@ -31,15 +44,15 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ["id", "items", "total"]
 
     def get_total(self, obj):
-        return sum((i.subtotal for i in obj.items.all()), 0)
+        return obj.total
     
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     product_name = serializers.CharField(source="product.name", read_only=True)
     class Meta:
         model = OrderItem
         fields = ["id", "product", "product_name", "qty", "unit_price", "subtotal"]
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     class Meta:
         model = Order
@@ -48,7 +61,7 @@ class OrderSerializer(serializers.ModelSerializer):
             "subtotal","shipping","total","created_at","items"
         ]
 
-class OrderAdminSerializer(serializers.ModelSerializer):
+class OrderAdminSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     class Meta:
         model = Order
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .catalog import bump_catalog_version
+from .models import Product, ProductImage
+
+# Cubre también las escrituras de ProductAdminViewSet y de las vistas de
+# subida de imágenes, que pasan por save()/create()/delete().
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def catalog_changed(sender, **kwargs):
+    # Se invalida al hacer commit para que nadie cachee datos viejos con la versión nueva
+    transaction.on_commit(bump_catalog_version)
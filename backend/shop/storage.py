@@ -0,0 +1,58 @@
+import hashlib
+import os
+import re
+import uuid
+from django.core.files.storage import FileSystemStorage
+
+# Imágenes de producto guardadas por contenido: el nombre es el sha256 del
+# archivo (blobs/ab/<sha256>.jpg), así la misma imagen subida a varios
+# productos o a la galería se guarda una sola vez, y un nombre nunca cambia de
+# contenido (se sirve con cache inmutable, ver shop/media.py). El upload_to de
+# los campos no se usa. Borrar la fila no borra el archivo: eso lo hace
+# shop.media.release_media cuando ya nadie lo usa.
+
+BLOB_DIR = "blobs"
+BLOCK = 64 * 1024
+BLOB_RE = re.compile(rf"^{BLOB_DIR}/[0-9a-f]{{2}}/([0-9a-f]{{64}})(\.[a-z0-9]+)?$")
+
+def blob_digest(name: str):
+    """sha256 del contenido si `name` es un blob, o None."""
+    m = BLOB_RE.match(name or "")
+    return m.group(1) if m else None
+
+def content_sha256(content) -> str:
+    # Quien ya verificó el sha256 (subidas por partes) lo deja en el archivo
+    known = getattr(content, "content_sha256", None)
+    if known:
+        return known
+    digest = hashlib.sha256()
+    for chunk in content.chunks(BLOCK):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # El nombre final lo decide _save según el contenido
+        return name
+
+    def _save(self, name, content):
+        digest = content_sha256(content)
+        ext = os.path.splitext(name)[1].lower()
+        final = f"{BLOB_DIR}/{digest[:2]}/{digest}{ext}"
+        path = self.path(final)
+        if os.path.exists(path):
+            # Ya está: se reusa. El mtime nuevo evita que la limpieza lo borre
+            # mientras la fila que lo referencia todavía no se guarda
+            os.utime(path)
+            return final
+        # A un nombre temporal y después rename: dos subidas iguales a la vez
+        # escriben lo mismo y ninguna ve un archivo a medias
+        tmp = super()._save(f"{final}.{uuid.uuid4().hex}.tmp", content)
+        os.replace(self.path(tmp), path)
+        return final
+
+content_storage = ContentAddressedStorage()
+
+def product_media_storage():
+    """Storage de Product.image y ProductImage.image (callable, para que las migraciones no lo congelen)."""
+    return content_storage
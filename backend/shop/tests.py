@@ -1,3 +1,1619 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from PIL import Image
+import hashlib
+import csv
+import io
+import json
+import os
+import pstats
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError, connection, connections, transaction
+from django.test.utils import CaptureQueriesContext
+from django.conf import settings
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase, override_settings
+from django.urls import URLResolver, get_resolver
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from .catalog import catalog_cache, catalog_version
+from .dbrouter import STICKY_COOKIE, read_replica
+from .fastserializers import order_data
+from .exports import export_rows, filter_orders
+from .product_io import import_products
+from .querybudget import QueryBudgetExceeded, budget_for, route_key
+from .renderers import ORJSONRenderer
+from .holds import release_expired_holds
+from .housekeeping import collect_garbage
+from .loadbench import Recorder, compare, summarize
+from .serializers import OrderSerializer
+from .models import (
+    Cart, CartItem, DailyProductSales, DailySales, Order, OrderItem, OrderSequence, Product, ProductImage, StockHold,
+    UploadSession,
+)
+from .utils import OrderNumberAllocator, merge_guest_cart_to_user, next_order_number, reserve_order_sequence
 
-# Create your tests here.
+User = get_user_model()
+
+
+def make_product(i, **kwargs):
+    data = {
+        "name": f"Producto {i}",
+        "slug": f"producto-{i}",
+        "price": Decimal("1000.00"),
+        "stock": 10,
+    }
+    data.update(kwargs)
+    return Product.objects.create(**data)
+
+
+class CatalogTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog_cache.clear()
+
+
+class ProductListTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        # Dos productos con el mismo created_at para ejercitar el desempate por id
+        self.products = [make_product(i, created_at=now + timedelta(seconds=i // 2)) for i in range(5)]
+        make_product(99, is_active=False)
+
+    def test_cursor_walks_every_active_product_once(self):
+        seen, cursor = [], ""
+        while True:
+            r = self.client.get("/api/products/", {"limit": 2, "cursor": cursor})
+            self.assertEqual(r.status_code, 200)
+            body = r.json()
+            self.assertLessEqual(len(body["results"]), 2)
+            seen += [p["id"] for p in body["results"]]
+            cursor = body["next"]
+            if not cursor:
+                break
+        self.assertEqual(seen, [p.id for p in self.products])
+
+    def test_invalid_cursor(self):
+        r = self.client.get("/api/products/", {"cursor": "nope"})
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json()["detail"], "invalid_cursor")
+
+    def test_if_none_match_returns_304_without_queries(self):
+        r = self.client.get("/api/products/")
+        etag = r["ETag"]
+        with self.assertNumQueries(0):
+            r = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r.content, b"")
+        self.assertEqual(r["ETag"], etag)
+
+    def test_product_write_changes_etag(self):
+        etag = self.client.get("/api/products/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.products[0].pk).get().save()
+        r = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r["ETag"], etag)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.mesa = Product.objects.create(name="Mesa de centro", slug="mesa-centro", price=Decimal("10.00"))
+        self.silla = Product.objects.create(name="Silla", slug="silla-para-mesa", price=Decimal("10.00"))
+        self.cajon = Product.objects.create(name="Cajón de madera", slug="cajon", price=Decimal("10.00"))
+
+    def search(self, q, **params):
+        r = self.client.get("/api/products/search/", {"q": q, **params})
+        self.assertEqual(r.status_code, 200)
+        return [p["id"] for p in r.json()["results"]]
+
+    def test_ranked_prefix_search_over_name_and_slug(self):
+        self.assertEqual(self.search("mes"), [self.mesa.id, self.silla.id])
+        self.assertEqual(self.search("mesa cen"), [self.mesa.id])
+        self.assertEqual(self.search("cajon"), [self.cajon.id])  # sin tildes
+        self.assertEqual(self.search("mes", limit=1), [self.mesa.id])
+        self.assertEqual(self.search('"mesa* ('), [self.mesa.id, self.silla.id])
+        self.assertEqual(self.search(""), [])
+
+    def test_index_follows_product_writes(self):
+        Product.objects.filter(pk=self.cajon.pk).update(name="Banca")  # sin señales
+        self.assertEqual(self.search("cajon"), [self.cajon.id])  # el slug sigue
+        self.assertEqual(self.search("banca"), [self.cajon.id])
+        self.mesa.is_active = False
+        self.mesa.save()
+        self.silla.delete()
+        self.assertEqual(self.search("mesa"), [])
+
+    def test_ranks_every_active_match_before_limiting(self):
+        # Muchos calces previos (inactivos o peores) no tapan al más relevante
+        Product.objects.bulk_create(
+            Product(name=f"Mesa vieja {i}", slug=f"mesa-vieja-{i}", price=Decimal("10.00"), is_active=False)
+            for i in range(2100)
+        )
+        Product.objects.bulk_create(
+            Product(name=f"Lámpara de mesa {i}", slug=f"lampara-{i}", price=Decimal("10.00")) for i in range(50)
+        )
+        exacta = Product.objects.create(name="Mesa", slug="mesa", price=Decimal("10.00"))
+        self.assertEqual(self.search("mesa", limit=2), [exacta.id, self.mesa.id])
+
+    def test_rebuild_command(self):
+        call_command("rebuild_search_index", stdout=io.StringIO())
+        self.assertEqual(self.search("silla"), [self.silla.id])
+
+
+class CatalogCacheTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = make_product(1)
+        self.admin = User.objects.create_user("admin", "admin@example.com", "pass12345", is_staff=True)
+
+    def test_repeated_reads_hit_cache(self):
+        self.client.get("/api/products/")
+        with self.assertNumQueries(0):
+            r = self.client.get("/api/products/")
+        self.assertEqual(r.json()["results"][0]["id"], self.product.id)
+        stats = catalog_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_admin_patch_invalidates_catalog(self):
+        self.client.get("/api/products/")
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.patch(
+                f"/api/admin/products/{self.product.id}/", {"price": "1500.00"}, content_type="application/json"
+            )
+        self.assertEqual(r.status_code, 200)
+        r = self.client.get("/api/products/")
+        self.assertEqual(r.json()["results"][0]["price"], "1500.00")
+        self.assertEqual(catalog_cache.stats()["misses"], 2)
+
+    def test_version_bumped_in_another_process_invalidates_this_one(self):
+        self.client.get("/api/products/")
+        # Otro worker: otro proceso con los mismos settings
+        subprocess.run(
+            [sys.executable, "-c", "import django; django.setup(); from shop.catalog import bump_catalog_version; bump_catalog_version()"],
+            cwd=settings.BASE_DIR, env={**os.environ, "DJANGO_SETTINGS_MODULE": "core.settings"}, check=True,
+        )
+        self.client.get("/api/products/")
+        self.assertEqual(catalog_cache.stats()["misses"], 2)
+
+
+class CartQueryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("ana", "ana@example.com", "pass12345")
+        self.client.force_login(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        self.products = [make_product(i, price=Decimal("10.00")) for i in range(6)]
+
+    def fill(self, n):
+        for p in self.products[:n]:
+            self.cart.items.create(product=p, qty=2, unit_price=p.price)
+
+    def test_cart_detail_query_count_is_constant(self):
+        # sesión + usuario + carrito + items con productos
+        for n in (1, 6):
+            self.cart.items.all().delete()
+            self.fill(n)
+            with self.assertNumQueries(4):
+                r = self.client.get("/api/cart/")
+            self.assertEqual(len(r.json()["items"]), n)
+            self.assertEqual(r.json()["total"], 20.0 * n)
+
+    def test_checkout_summary_query_count_and_totals(self):
+        self.fill(6)
+        with self.assertNumQueries(4):
+            r = self.client.get("/api/checkout/summary/")
+        cart = r.json()["cart"]
+        self.assertEqual(cart["shipping"], "4.990")
+        self.assertEqual(cart["total"], "124.990")
+
+    def test_cart_update_query_count_is_constant(self):
+        self.fill(6)
+        item = self.cart.items.first()
+        # sesión + usuario + carrito + item + update + items con productos
+        with self.assertNumQueries(6):
+            r = self.client.patch(f"/api/cart/items/{item.id}/", {"qty": 5}, content_type="application/json")
+        self.assertEqual(r.json()["cart"]["total"], 20.0 * 5 + 50.0)
+
+
+
+class CartBatchTests(TestCase):
+    def setUp(self):
+        self.p1, self.p2, self.p3 = make_product(1), make_product(2, price=Decimal("250.00")), make_product(3)
+
+    def batch(self, client, operations, response="delta"):
+        return client.post("/api/cart/batch/", {"operations": operations, "response": response}, content_type="application/json")
+
+    def test_batch_applies_in_order_and_returns_delta(self):
+        self.client.force_login(User.objects.create_user("ana", "ana@example.com"))
+        cart = Cart.objects.create(user=User.objects.get())
+        first = CartItem.objects.create(cart=cart, product=self.p1, qty=1, unit_price=self.p1.price)
+        second = CartItem.objects.create(cart=cart, product=self.p2, qty=2, unit_price=self.p2.price)
+        r = self.batch(self.client, [
+            {"op": "add", "product_id": self.p3.id},
+            {"op": "add", "product_id": self.p3.id, "qty": 2},
+            {"op": "set", "item_id": first.id, "qty": 5},
+            {"op": "remove", "product_id": self.p2.id},
+            {"op": "set", "item_id": -self.p1.id, "qty": 4},
+        ])
+        self.assertEqual(r.status_code, 200, r.content)
+        data = r.json()
+        self.assertEqual(sorted((i["product"]["id"], i["qty"]) for i in data["changed"]), [(self.p1.id, 4), (self.p3.id, 3)])
+        self.assertEqual(data["removed"], [second.id])
+        self.assertEqual(Decimal(str(data["total"])), Decimal("7000.00"))
+        self.assertEqual(
+            sorted(CartItem.objects.values_list("product_id", "qty")), [(self.p1.id, 4), (self.p3.id, 3)]
+        )
+        full = self.batch(self.client, [{"op": "set", "product_id": self.p3.id, "qty": 1}], response="full").json()
+        self.assertEqual(full["cart"], self.client.get("/api/cart/").json())
+
+    def test_failed_batch_writes_nothing(self):
+        client = Client()
+        client.force_login(User.objects.create_user("ana", "ana@example.com"))
+        r = self.batch(client, [
+            {"op": "add", "product_id": self.p1.id},
+            {"op": "set", "item_id": 999, "qty": 2},
+            {"op": "add", "product_id": 999},
+        ])
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json()["errors"], [
+            {"index": 1, "errors": {"item_id": "not_found"}}, {"index": 2, "errors": {"product_id": "not_found"}},
+        ])
+        r = self.batch(client, [{"op": "add", "qty": 0}, {"op": "remove", "item_id": 1, "product_id": 1}, "x"])
+        self.assertEqual([e["index"] for e in r.json()["errors"]], [0, 1, 2])
+        self.assertEqual(r.json()["errors"][0]["errors"], {"product_id": "required", "qty": "invalid"})
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(self.batch(client, []).status_code, 400)
+
+    def test_guest_cookie_cart(self):
+        client = Client()
+        r = self.batch(client, [{"op": "add", "product_id": self.p1.id}, {"op": "add", "product_id": self.p2.id, "qty": 2}])
+        self.assertEqual([i["id"] for i in r.json()["changed"]], [-self.p1.id, -self.p2.id])
+        r = self.batch(client, [{"op": "remove", "item_id": -self.p1.id}, {"op": "set", "item_id": -self.p2.id, "qty": 3}])
+        self.assertEqual((r.json()["removed"], r.json()["changed"][0]["qty"]), ([-self.p1.id], 3))
+        self.assertFalse(Cart.objects.exists())
+        self.assertEqual([(i["id"], i["qty"]) for i in client.get("/api/cart/").json()["items"]], [(-self.p2.id, 3)])
+
+    @override_settings(SHOP_STOCK_HOLDS=True)
+    def test_holds_reject_the_whole_batch(self):
+        client = Client()
+        r = self.batch(client, [{"op": "add", "product_id": self.p1.id, "qty": 2}, {"op": "add", "product_id": self.p2.id, "qty": 11}])
+        self.assertEqual(r.json()["errors"], [{"index": 1, "errors": {"qty": "no_stock"}}])
+        self.assertFalse(CartItem.objects.exists())
+        self.assertFalse(StockHold.objects.exists())
+        r = self.batch(client, [{"op": "add", "product_id": self.p1.id, "qty": 2}, {"op": "add", "product_id": self.p2.id, "qty": 10}])
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(sorted(StockHold.objects.values_list("product_id", "qty")), [(self.p1.id, 2), (self.p2.id, 10)])
+        self.batch(client, [{"op": "remove", "product_id": self.p2.id}])
+        self.assertEqual(list(StockHold.objects.values_list("product_id", flat=True)), [self.p1.id])
+
+class CartMergeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("ana", "ana@example.com")
+        self.products = [make_product(i) for i in range(40)]
+
+    def merge(self, guest_items, user_items):
+        guest = Cart.objects.create(session_key="guest")
+        user_cart, _ = Cart.objects.get_or_create(user=self.user)
+        CartItem.objects.bulk_create(
+            [CartItem(cart=guest, product=p, qty=2, unit_price=p.price) for p in self.products[:guest_items]]
+            + [CartItem(cart=user_cart, product=p, qty=1, unit_price=p.price) for p in self.products[:user_items]]
+        )
+        # Mismo número de consultas (savepoints incluidos) para cualquier tamaño de carrito
+        with self.assertNumQueries(10):
+            stats = merge_guest_cart_to_user(None, self.user, session_key="guest")
+        return stats, user_cart
+
+    def test_merge_query_count_does_not_grow_with_cart_size(self):
+        for guest_items, user_items in ((3, 1), (40, 10)):
+            Cart.objects.all().delete()
+            stats, user_cart = self.merge(guest_items, user_items)
+            self.assertEqual(stats, {"added": guest_items - user_items, "updated": user_items})
+            qtys = dict(user_cart.items.values_list("product_id", "qty"))
+            self.assertEqual(len(qtys), guest_items)
+            self.assertEqual(qtys[self.products[0].id], 3)
+            self.assertFalse(Cart.objects.filter(session_key="guest").exists())
+
+
+class GuestCartTests(TestCase):
+    def setUp(self):
+        self.products = [make_product(i, price=Decimal("10.00")) for i in range(3)]
+
+    def add(self, product, qty=1):
+        return self.client.post("/api/cart/items/", {"product_id": product.id, "qty": qty}, content_type="application/json")
+
+    def test_new_visitor_reads_without_queries_or_session(self):
+        for path in ("/api/cart/", "/api/checkout/summary/", "/api/async/cart/", "/api/async/checkout/summary/"):
+            with self.subTest(path=path), self.assertNumQueries(0):
+                r = self.client.get(path)
+            self.assertEqual(r.status_code, 200)
+            self.assertNotIn("sessionid", r.cookies)
+        self.assertEqual(r.json()["cart"], {"id": None, "items": [], "total": "0.00", "shipping": "0.00"})
+        self.assertFalse(Session.objects.exists())
+        self.assertFalse(Cart.objects.exists())
+
+    def test_cookie_cart_matches_database_cart_payload(self):
+        self.add(self.products[0], 2)
+        r = self.add(self.products[1])
+        self.assertEqual(r.status_code, 201)
+        self.assertFalse(Cart.objects.exists())
+        with self.assertNumQueries(1):
+            guest = self.client.get("/api/cart/").json()
+        self.assertEqual([i["id"] for i in guest["items"]], [-self.products[0].id, -self.products[1].id])
+
+        user = User.objects.create_user("ana", "ana@example.com")
+        cart = Cart.objects.create(user=user)
+        cart.items.create(product=self.products[0], qty=2, unit_price=Decimal("10.00"))
+        cart.items.create(product=self.products[1], qty=1, unit_price=Decimal("10.00"))
+        client = Client()
+        client.force_login(user)
+        expected = client.get("/api/cart/").json()
+        for payload in (guest, expected):
+            payload.pop("id")
+            for item in payload["items"]:
+                item.pop("id")
+        self.assertEqual(guest, expected)
+
+    def test_update_and_remove_by_negative_id(self):
+        self.add(self.products[0])
+        self.add(self.products[1])
+        r = self.client.patch(f"/api/cart/items/{-self.products[0].id}/", {"qty": 4}, content_type="application/json")
+        self.assertEqual(r.json()["cart"]["total"], 50.0)
+        r = self.client.delete(f"/api/cart/items/{-self.products[1].id}/delete/")
+        self.assertEqual([i["qty"] for i in r.json()["cart"]["items"]], [4])
+        r = self.client.delete(f"/api/cart/items/{-self.products[2].id}/delete/")
+        self.assertEqual(r.status_code, 404)
+
+    def test_tampered_cookie_is_ignored(self):
+        self.add(self.products[0])
+        self.client.cookies["guest_cart"] = self.client.cookies["guest_cart"].value + "x"
+        self.assertEqual(self.client.get("/api/cart/").json()["items"], [])
+
+    @override_settings(SHOP_GUEST_CART_MAX_LINES=1)
+    def test_large_cart_moves_to_database(self):
+        self.add(self.products[0])
+        r = self.add(self.products[1])
+        self.assertEqual(r.cookies["guest_cart"].value, "")
+        cart = Cart.objects.get(user=None)
+        self.assertEqual(r.json()["cart"]["id"], cart.id)
+        self.assertEqual(cart.items.count(), 2)
+        # Los ids negativos que ya tenía el cliente siguen sirviendo
+        r = self.client.patch(f"/api/cart/items/{-self.products[0].id}/", {"qty": 3}, content_type="application/json")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(cart.items.get(product=self.products[0]).qty, 3)
+
+    @override_settings(SHOP_GUEST_CART_MAX_LINES=2)
+    def test_batch_that_moves_cart_to_database_returns_full_cart(self):
+        self.add(self.products[0])
+        self.add(self.products[1])
+        r = self.client.post("/api/cart/batch/", {"operations": [
+            {"op": "remove", "item_id": -self.products[1].id},
+            {"op": "add", "product_id": self.products[1].id, "qty": 1},
+            {"op": "add", "product_id": self.products[2].id, "qty": 1},
+        ], "response": "delta"}, content_type="application/json")
+        self.assertEqual(r.status_code, 200)
+        cart = Cart.objects.get(user=None)
+        body = r.json()
+        # Sin delta: los ids negativos que tenía el cliente ya no existen
+        self.assertNotIn("changed", body)
+        self.assertEqual(body["cart"]["id"], cart.id)
+        self.assertEqual(
+            sorted(i["id"] for i in body["cart"]["items"]), sorted(cart.items.values_list("id", flat=True))
+        )
+        self.assertEqual(len(body["cart"]["items"]), 3)
+
+    def test_checkout_from_cookie_cart(self):
+        self.add(self.products[0], 2)
+        r = self.client.post("/api/checkout/confirm/", CHECKOUT_PAYLOAD, content_type="application/json")
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(r.json()["order"]["items"][0]["qty"], 2)
+        self.assertEqual(r.cookies["guest_cart"].value, "")
+        self.assertEqual(self.client.get("/api/cart/").json()["items"], [])
+
+
+class CartGarbageTests(TestCase):
+    def setUp(self):
+        self.product = make_product(1)
+        now = timezone.now()
+        Session.objects.create(session_key="viva", session_data="", expire_date=now + timedelta(days=1))
+        Session.objects.create(session_key="vencida", session_data="", expire_date=now - timedelta(days=1))
+        self.user = User.objects.create_user("ana", "ana@example.com")
+        for owner in ({"session_key": "viva"}, {"session_key": "vencida"}, {"session_key": "perdida"}, {"user": self.user}):
+            Cart.objects.create(**owner).items.create(product=self.product, qty=1, unit_price=self.product.price)
+
+    def test_collects_expired_sessions_and_unreachable_carts_in_batches(self):
+        stats = collect_garbage(batch_size=1)
+        self.assertEqual(stats, {"sessions": 1, "carts": 2, "cart_items": 2})
+        self.assertEqual(list(Session.objects.values_list("session_key", flat=True)), ["viva"])
+        self.assertEqual(Cart.objects.filter(user=None).get().session_key, "viva")
+        self.assertTrue(Cart.objects.filter(user=self.user).exists())
+        self.assertEqual(collect_garbage(), {"sessions": 0, "carts": 0, "cart_items": 0})
+
+    def test_collects_orphaned_items(self):
+        cart = Cart.objects.get(user=self.user)
+        with connection.cursor() as c:  # la FK se revisa recién al commit
+            c.execute("DELETE FROM shop_cart WHERE id = %s", [cart.id])
+        self.assertEqual(collect_garbage()["cart_items"], 3)
+        self.assertFalse(CartItem.objects.filter(cart_id=cart.id).exists())
+
+    def test_command_reports_rows_removed(self):
+        out = io.StringIO()
+        call_command("cleanup_carts", "--batch-size=1", stdout=out)
+        self.assertEqual(out.getvalue().strip(), "sesiones: 1, carritos: 2, items: 2")
+
+
+CHECKOUT_PAYLOAD = {"email": "a@example.com", "full_name": "A", "address": "Calle 1", "city": "Santiago"}
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("ana", "ana@example.com")
+        self.client.force_login(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+
+    def test_checkout_bulk_inserts_items_and_decrements_stock(self):
+        products = [make_product(i, stock=3) for i in range(4)]
+        for p in products:
+            self.cart.items.create(product=p, qty=2, unit_price=p.price)
+        r = self.client.post("/api/checkout/confirm/", CHECKOUT_PAYLOAD, content_type="application/json")
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(OrderItem.objects.count(), 4)
+        self.assertEqual(set(Product.objects.values_list("stock", flat=True)), {1})
+        self.assertFalse(self.cart.items.exists())
+
+    def test_checkout_reports_every_product_without_stock(self):
+        ok = make_product(1, stock=5)
+        short = [make_product(2, stock=1), make_product(3, stock=0)]
+        for p in [ok, *short]:
+            self.cart.items.create(product=p, qty=2, unit_price=p.price)
+        r = self.client.post("/api/checkout/confirm/", CHECKOUT_PAYLOAD, content_type="application/json")
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json()["detail"], "no_stock")
+        self.assertEqual(r.json()["product_ids"], [p.id for p in short])
+        # Todo se revierte, incluido el producto que sí tenía stock
+        ok.refresh_from_db()
+        self.assertEqual(ok.stock, 5)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.cart.items.count(), 3)
+
+    @override_settings(SHOP_QUERY_BUDGET_RAISE=True)
+    def test_checkout_costs_one_query_per_line_over_its_budget(self):
+        for p in [make_product(i, stock=3) for i in range(12)]:
+            self.cart.items.create(product=p, qty=1, unit_price=p.price)
+        r = self.client.post("/api/checkout/confirm/", CHECKOUT_PAYLOAD, content_type="application/json")
+        self.assertEqual(r.status_code, 201)
+        stats = r.wsgi_request.query_stats
+        self.assertEqual(stats.allowed, 12)
+        self.assertLessEqual(stats.count - stats.allowed, settings.SHOP_QUERY_BUDGET_ROUTES["POST api/checkout/confirm/"])
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    def test_parallel_checkouts_never_oversell(self):
+        stock, buyers = 5, 16
+        product = make_product(1, stock=stock)
+        clients = []
+        for i in range(buyers):
+            user = User.objects.create_user(f"u{i}", f"u{i}@example.com")
+            Cart.objects.create(user=user).items.create(product=product, qty=1, unit_price=product.price)
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+
+        def checkout(client):
+            try:
+                r = client.post("/api/checkout/confirm/", CHECKOUT_PAYLOAD, content_type="application/json")
+                return r.status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            codes = list(pool.map(checkout, clients))
+
+        product.refresh_from_db()
+        self.assertEqual(codes.count(201), stock)
+        self.assertEqual(codes.count(400), buyers - stock)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(OrderItem.objects.filter(product=product).count(), stock)
+
+
+class OrderNumberTests(TestCase):
+    def test_sequence_continues_from_existing_orders(self):
+        today = timezone.now().date()
+        Order.objects.create(
+            email="a@example.com", full_name="A", address="x", city="y",
+            subtotal=0, total=0, number=f"ORD-{today:%Y%m%d}-0041",
+        )
+        self.assertEqual(next_order_number(), f"ORD-{today:%Y%m%d}-0042")
+        self.assertEqual(next_order_number(), f"ORD-{today:%Y%m%d}-0043")
+        self.assertEqual(OrderSequence.objects.get(day=today).last, 43)
+
+    def test_block_allocators_never_repeat(self):
+        day = timezone.now().date()
+        workers = [OrderNumberAllocator(block_size=5), OrderNumberAllocator(block_size=5)]
+        seen = []
+        for i in range(12):
+            with self.captureOnCommitCallbacks(execute=True):
+                seen.append(workers[i % 2].next(day))
+        self.assertEqual(len(seen), len(set(seen)))
+        # Dos bloques de 5 por worker: el contador solo se tocó 4 veces
+        self.assertEqual(OrderSequence.objects.get(day=day).last, 20)
+
+
+class ConcurrentOrderNumberTests(TransactionTestCase):
+    def test_parallel_reservations_are_unique(self):
+        day = timezone.now().date()
+
+        def reserve(_):
+            try:
+                return reserve_order_sequence(day)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            numbers = list(pool.map(reserve, range(40)))
+        self.assertEqual(sorted(numbers), list(range(1, 41)))
+
+
+@override_settings(SHOP_STOCK_HOLDS=True)
+class StockHoldTests(TestCase):
+    def setUp(self):
+        self.product = make_product(1, stock=3)
+        self.buyers = []
+        for name in ("ana", "beto"):
+            client = Client()
+            client.force_login(User.objects.create_user(name, f"{name}@example.com"))
+            self.buyers.append(client)
+
+    def add(self, client, qty):
+        return client.post("/api/cart/items/", {"product_id": self.product.id, "qty": qty}, content_type="application/json")
+
+    def available(self):
+        r = self.client.get("/api/products/availability/", {"ids": str(self.product.id)})
+        return r.json()["results"][0]["available"]
+
+    def test_hold_blocks_other_carts_until_it_expires(self):
+        ana, beto = self.buyers
+        self.assertEqual(self.add(ana, 2).status_code, 201)
+        self.assertEqual(self.available(), 1)
+        r = self.add(beto, 2)
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json()["detail"], "no_stock")
+        self.assertFalse(Cart.objects.get(user__username="beto").items.exists())
+
+        StockHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.available(), 3)
+        self.assertEqual(release_expired_holds(batch_size=1), 1)
+        self.assertEqual(self.add(beto, 2).status_code, 201)
+
+    def test_checkout_converts_holds_into_decrements(self):
+        ana, beto = self.buyers
+        self.add(ana, 2)
+        self.add(beto, 1)
+        r = ana.post("/api/checkout/confirm/", CHECKOUT_PAYLOAD, content_type="application/json")
+        self.assertEqual(r.status_code, 201)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 1)
+        self.assertEqual(list(StockHold.objects.values_list("cart__user__username", flat=True)), ["beto"])
+        self.assertEqual(self.available(), 0)
+
+    def test_checkout_cannot_take_stock_held_by_others(self):
+        ana, beto = self.buyers
+        self.add(ana, 2)
+        self.add(beto, 1)
+        # El hold de ana vence; beto sigue reteniendo 1, así que ana ya no puede comprar 3
+        StockHold.objects.filter(cart__user__username="ana").update(expires_at=timezone.now())
+        Cart.objects.get(user__username="ana").items.update(qty=3)
+        r = ana.post("/api/checkout/confirm/", CHECKOUT_PAYLOAD, content_type="application/json")
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json()["product_ids"], [self.product.id])
+
+    def test_failed_item_update_keeps_the_previous_hold(self):
+        ana, _ = self.buyers
+        item_id = self.add(ana, 2).json()["cart"]["items"][0]["id"]
+        with mock.patch.object(CartItem, "save", side_effect=DatabaseError), self.assertRaises(DatabaseError):
+            ana.patch(f"/api/cart/items/{item_id}/", {"qty": 3}, content_type="application/json")
+        self.assertEqual(list(StockHold.objects.values_list("qty", flat=True)), [2])
+        self.assertEqual(self.available(), 1)
+
+
+class AsyncReadTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("ana", "ana@example.com")
+        cart = Cart.objects.create(user=self.user)
+        for i in range(3):
+            p = make_product(i, price=Decimal("10.00"))
+            cart.items.create(product=p, qty=i + 1, unit_price=p.price)
+
+    async def test_async_endpoints_match_sync_ones(self):
+        sync_client, async_client = Client(), AsyncClient()
+        await sync_client.aforce_login(self.user)
+        await async_client.aforce_login(self.user)
+        for path in ("products/?limit=2", "cart/", "checkout/summary/", "auth/me/"):
+            with self.subTest(path=path):
+                expected = await sync_to_async(sync_client.get)(f"/api/{path}")
+                r = await async_client.get(f"/api/async/{path}")
+                self.assertEqual(r.status_code, 200)
+                self.assertEqual(r.content, expected.content)
+
+    async def test_async_product_list_honours_etag(self):
+        r = await AsyncClient().get("/api/async/products/")
+        r = await AsyncClient().get("/api/async/products/", headers={"If-None-Match": r["ETag"]})
+        self.assertEqual(r.status_code, 304)
+
+
+def make_order(number, products, status="pending", created_at=None, email="a@example.com"):
+    order = Order.objects.create(
+        email=email, full_name="A", address="Calle 1", city="Santiago", status=status,
+        subtotal=Decimal("0.00"), total=Decimal("0.00"), number=number,
+        created_at=created_at or timezone.now(),
+    )
+    OrderItem.objects.bulk_create(
+        OrderItem(order=order, product=p, qty=1, unit_price=p.price, subtotal=p.price) for p in products
+    )
+    return order
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user("admin", "admin@example.com", is_staff=True)
+        self.client.force_login(self.admin)
+        products = [make_product(i) for i in range(3)]
+        day = timezone.localtime().replace(hour=12)
+        self.orders = [
+            make_order(f"ORD-{i:04d}", products[: i % 3 + 1], status="paid" if i % 2 else "pending",
+                       created_at=day - timedelta(days=i))
+            for i in range(7)
+        ]
+
+    def test_query_count_is_per_batch(self):
+        # 7 órdenes en lotes de 3: 3 lotes x (órdenes + líneas)
+        with self.assertNumQueries(6):
+            rows = list(export_rows(Order.objects.all(), "lines", batch_size=3))
+        self.assertEqual(len(rows), sum(o.items.count() for o in self.orders))
+
+    def test_csv_lines_filtered_by_status_and_date(self):
+        today = timezone.localdate()
+        r = self.client.get("/api/admin/orders/export/", {
+            "output": "csv", "kind": "lines", "status": "paid",
+            "date_from": str(today - timedelta(days=4)), "date_to": str(today),
+        })
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r["Content-Type"], "text/csv; charset=utf-8")
+        rows = list(csv.DictReader(io.StringIO(b"".join(r.streaming_content).decode())))
+        self.assertEqual({row["order_number"] for row in rows}, {"ORD-0001", "ORD-0003"})
+        self.assertEqual(len(rows), 2 + 1)
+
+    def test_ndjson_orders_oldest_first(self):
+        r = self.client.get("/api/admin/orders/export/", {"output": "ndjson"})
+        rows = [json.loads(line) for line in b"".join(r.streaming_content).decode().splitlines()]
+        self.assertEqual([row["number"] for row in rows], [f"ORD-{i:04d}" for i in reversed(range(7))])
+        self.assertEqual(rows[0]["total"], "0.00")
+
+    def test_invalid_filters(self):
+        r = self.client.get("/api/admin/orders/export/", {"date_from": "ayer"})
+        self.assertEqual(r.json()["detail"], "invalid_date")
+
+
+class ProductImportExportTests(CatalogTestCase):
+    CSV = (
+        "slug,name,price,stock,is_active\n"
+        "producto-1,Producto uno,15.50,,\n"         # existe: cambia nombre y precio
+        "nuevo-a,Nuevo A,9.90,4,true\n"
+        "nuevo-b,Nuevo B,1.00,1,no\n"
+        "mal slug,X,1.00,1,\n"
+        "nuevo-c,,1.00,1,\n"                        # nuevo sin nombre
+        "nuevo-d,Nuevo D,12.345,1,\n"
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user("admin", "admin@example.com", is_staff=True)
+        self.client.force_login(self.admin)
+        self.existing = make_product(1, stock=7)
+
+    def upload(self, content, name="productos.csv", **params):
+        url = "/api/admin/products/import/"
+        if params:
+            url += "?" + "&".join(f"{k}={v}" for k, v in params.items())
+        return self.client.post(url, {"file": SimpleUploadedFile(name, content.encode())})
+
+    def test_upsert_by_slug_with_row_errors(self):
+        version = catalog_version()
+        r = self.upload(self.CSV)
+        self.assertEqual(r.status_code, 200)
+        stats = r.json()
+        self.assertEqual((stats["created"], stats["updated"], stats["errors"]), (2, 1, 3))
+        self.assertEqual([(e["line"], list(e["errors"])) for e in stats["error_rows"]],
+                         [(5, ["slug"]), (7, ["price"]), (6, ["name"])])
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.name, self.existing.price, self.existing.stock), ("Producto uno", Decimal("15.50"), 7))
+        self.assertFalse(Product.objects.get(slug="nuevo-b").is_active)
+        self.assertNotEqual(catalog_version(), version)
+
+    def test_dry_run_writes_nothing(self):
+        stats = self.upload(self.CSV, dry_run=1).json()
+        self.assertEqual(stats["created"], 2)
+        self.assertEqual(Product.objects.count(), 1)
+
+    def test_query_count_is_per_batch(self):
+        rows = [(n, {"slug": f"p-{n}", "name": "P", "price": "1.00"}, None) for n in range(10)]
+        rows.append((10, {"slug": self.existing.slug, "stock": "3"}, None))
+        # 3 lotes x (existentes + savepoint + insert + liberar savepoint) + 1 upsert
+        with self.assertNumQueries(13):
+            stats = import_products(rows, batch_size=4)
+        self.assertEqual((stats["created"], stats["updated"]), (10, 1))
+
+    def test_export_round_trip(self):
+        self.upload(self.CSV)
+        r = self.client.get("/api/admin/products/export/", {"output": "ndjson"})
+        self.assertEqual(r["Content-Type"], "application/x-ndjson")
+        body = b"".join(r.streaming_content).decode()
+        self.assertEqual(json.loads(body.splitlines()[0]),
+                         {"slug": "producto-1", "name": "Producto uno", "price": "15.50", "stock": 7, "is_active": True})
+        stats = self.upload(body, name="productos.ndjson").json()
+        self.assertEqual((stats["created"], stats["updated"], stats["unchanged"], stats["errors"]), (0, 0, 3, 0))
+
+    def test_commands(self):
+        path = os.path.join(tempfile.mkdtemp(), "productos.csv")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(self.CSV)
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_products", path, stdout=out, stderr=err)
+        self.assertEqual(out.getvalue().strip(), "creados: 2, actualizados: 1, sin cambios: 0, errores: 3")
+        self.assertIn("línea 6 (nuevo-c): name: required", err.getvalue())
+        out = io.StringIO()
+        call_command("export_products", stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 1 + 3)
+
+
+class ProductBatchTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user("admin", "admin@example.com", is_staff=True)
+        self.client.force_login(self.admin)
+        self.products = [make_product(i, stock=5) for i in range(40)]
+
+    def batch(self, operations):
+        return self.client.post("/api/admin/products/batch/", {"operations": operations}, content_type="application/json")
+
+    def test_applies_operations_with_constant_queries(self):
+        for n in (2, 40):
+            ops = [{"id": p.id, "price": "9.90", "stock_delta": -1} for p in self.products[:n]]
+            # sesión + usuario + savepoint + select for update + update + liberar savepoint
+            with self.assertNumQueries(6), self.captureOnCommitCallbacks() as callbacks:
+                r = self.batch(ops)
+            self.assertEqual(r.json(), {"operations": n, "updated": n})
+            self.assertEqual(len(callbacks), 1)  # una invalidación del catálogo por lote
+        p = self.products[0]
+        p.refresh_from_db()
+        self.assertEqual((p.price, p.stock), (Decimal("9.90"), 3))
+
+    def test_operations_on_same_product_are_combined(self):
+        p = self.products[0]
+        r = self.batch([
+            {"slug": p.slug, "stock": 10},
+            {"id": p.id, "stock_delta": -3},
+            {"id": p.id, "stock_delta": 1, "is_active": "false"},
+        ])
+        self.assertEqual(r.json()["updated"], 1)
+        p.refresh_from_db()
+        self.assertEqual((p.stock, p.is_active), (8, False))
+
+    def test_invalid_batch_changes_nothing(self):
+        p, q = self.products[:2]
+        r = self.batch([
+            {"id": p.id, "price": "1.00"},
+            {"id": q.id, "stock_delta": -6},
+            {"slug": "no-existe", "stock": 1},
+            {"id": p.id, "price": "abc"},
+            {"price": "1.00"},
+        ])
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual([e["index"] for e in r.json()["errors"]], [3, 4])
+        r = self.batch([
+            {"id": p.id, "price": "1.00"}, {"id": q.id, "stock_delta": -6}, {"slug": "no-existe", "stock": 1},
+            {"id": 999999, "stock": 1},
+        ])
+        self.assertEqual(r.json()["errors"], [
+            {"index": 1, "errors": {"stock_delta": "insufficient_stock"}},
+            {"index": 2, "errors": {"slug": "not_found"}},
+            {"index": 3, "errors": {"id": "not_found"}},
+        ])
+        p.refresh_from_db()
+        self.assertEqual(p.price, Decimal("1000.00"))
+
+
+class OrderAdminListTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user("admin", "admin@example.com", is_staff=True)
+        self.client.force_login(self.admin)
+        products = [make_product(i) for i in range(4)]
+        now = timezone.now()
+        for i in range(9):
+            make_order(f"ORD-2025010{i % 3}-{i:04d}", products[: i % 4 + 1],
+                       status="paid" if i % 3 == 0 else "pending",
+                       email="Cliente@Example.com" if i < 3 else "otro@example.com",
+                       created_at=now - timedelta(hours=i))
+
+    def test_pages_newest_first_with_constant_queries(self):
+        numbers, cursor = [], ""
+        while True:
+            # sesión + usuario + órdenes + líneas con producto
+            with self.assertNumQueries(4):
+                r = self.client.get("/api/admin/orders/", {"limit": 4, "cursor": cursor})
+            body = r.json()
+            numbers += [o["number"] for o in body["results"]]
+            cursor = body["next"]
+            if not cursor:
+                break
+        self.assertEqual([n[-4:] for n in numbers], [f"{i:04d}" for i in range(9)])
+        self.assertTrue(body["results"][0]["items"][0]["product_name"].startswith("Producto"))
+
+    def test_filters(self):
+        def numbers(**params):
+            return sorted(o["number"][-4:] for o in self.client.get("/api/admin/orders/", params).json()["results"])
+        self.assertEqual(numbers(status="paid"), ["0000", "0003", "0006"])
+        self.assertEqual(numbers(email="cliente@example.com"), ["0000", "0001", "0002"])
+        self.assertEqual(numbers(number="ord-20250101", status="pending"), ["0001", "0004", "0007"])
+
+    def test_email_filter_uses_the_upper_email_index(self):
+        qs = filter_orders(Order.objects.order_by("-created_at"), {"email": "CLIENTE@example.com"})
+        self.assertEqual(qs.count(), 3)
+        if connection.vendor == "sqlite":
+            self.assertIn("shop_order_email_created_idx", qs.explain())
+
+
+def make_image(name="foto.png", size=(1600, 900), mode="RGB"):
+    buf = io.BytesIO()
+    Image.new(mode, size, "white").save(buf, format="PNG")
+    return SimpleUploadedFile(name, buf.getvalue(), content_type="image/png")
+
+
+class MediaSetup:
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        catalog_cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=self.media)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.admin = User.objects.create_user("admin", "admin@example.com", is_staff=True)
+        self.client.force_login(self.admin)
+        self.product = make_product(1)
+
+
+class MediaTestCase(MediaSetup, TestCase):
+    pass
+
+
+@override_settings(SHOP_IMAGE_WORKERS=0, SHOP_IMAGE_FORMATS=["webp"])
+class ImageVariantTests(MediaTestCase):
+    def test_main_upload_generates_variants_in_every_format(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post(f"/api/admin/products/{self.product.id}/upload-main/", {"image": make_image()})
+        self.assertEqual(r.status_code, 200)
+        self.product.refresh_from_db()
+        variants = self.product.image_variants
+        self.assertEqual(set(variants), {"thumb", "card", "detail"})
+        self.assertEqual(set(variants["card"]), {"webp", "jpeg"})
+        with Image.open(os.path.join(self.media, variants["card"]["webp"])) as im:
+            self.assertEqual(max(im.size), 480)
+        payload = self.client.get("/api/products/").json()["results"][0]
+        self.assertEqual(payload["image_variants"]["thumb"]["webp"], "/media/" + variants["thumb"]["webp"])
+
+    def test_gallery_upload_keeps_transparency_in_fallback(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post(
+                f"/api/admin/products/{self.product.id}/gallery/", {"image": make_image(mode="RGBA", size=(100, 80))}
+            )
+        self.assertEqual(r.status_code, 201)
+        img = ProductImage.objects.get()
+        self.assertEqual(set(img.variants["detail"]), {"webp", "png"})
+        self.assertTrue(r.json()["id"])
+
+    def test_backfill_command(self):
+        self.product.image = make_image()
+        self.product.save()
+        ProductImage.objects.create(product=self.product, image=make_image("g.png"))
+        out = io.StringIO()
+        call_command("generate_image_variants", stdout=out)
+        self.assertIn("variantes generadas: 2", out.getvalue())
+        self.product.refresh_from_db()
+        self.assertIn("detail", self.product.image_variants)
+
+
+@override_settings(SHOP_IMAGE_WORKERS=0, SHOP_UPLOAD_CHUNK_SIZE=4096)
+class ChunkedUploadTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        # Ruido para que el PNG no se comprima y ocupe varias partes
+        buf = io.BytesIO()
+        Image.frombytes("RGB", (64, 64), os.urandom(64 * 64 * 3)).save(buf, format="PNG")
+        self.data = buf.getvalue()
+
+    def start(self, sha256=None):
+        r = self.client.post(f"/api/admin/products/{self.product.id}/gallery/uploads/", {
+            "filename": "foto grande.png",
+            "size": len(self.data),
+            "sha256": sha256 or hashlib.sha256(self.data).hexdigest(),
+        }, content_type="application/json")
+        self.assertEqual(r.status_code, 201)
+        return r.json()["id"]
+
+    def put(self, upload_id, offset, chunk, **headers):
+        return self.client.put(
+            f"/api/admin/uploads/{upload_id}/", chunk,
+            content_type="application/octet-stream", headers={"Upload-Offset": str(offset), **headers},
+        )
+
+    def send_all(self, upload_id, start=0):
+        for offset in range(start, len(self.data), 4096):
+            r = self.put(upload_id, offset, self.data[offset:offset + 4096])
+            self.assertEqual(r.status_code, 200, r.content)
+
+    def test_upload_in_chunks_and_resume(self):
+        upload_id = self.start()
+        self.put(upload_id, 0, self.data[:4096])
+        # Reintento de la misma parte (p. ej. tras perder la respuesta): se rechaza con el offset real
+        r = self.put(upload_id, 0, self.data[:4096])
+        self.assertEqual((r.status_code, r.json()["offset"]), (409, 4096))
+        r = self.put(upload_id, 4096, self.data[4096:8192], **{"X-Chunk-SHA256": "0" * 64})
+        self.assertEqual((r.status_code, r.json()["detail"]), (400, "chunk_checksum_mismatch"))
+
+        offset = self.client.get(f"/api/admin/uploads/{upload_id}/").json()["offset"]
+        self.send_all(upload_id, start=offset)
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post(f"/api/admin/uploads/{upload_id}/finalize/")
+        self.assertEqual(r.status_code, 201)
+        img = ProductImage.objects.get(pk=r.json()["id"])
+        sha = hashlib.sha256(self.data).hexdigest()
+        self.assertEqual(img.image.name, f"blobs/{sha[:2]}/{sha}.png")
+        with img.image.open("rb") as fh:
+            self.assertEqual(fh.read(), self.data)
+        self.assertIn("card", img.variants)
+        self.assertEqual(UploadSession.objects.get().image, img)
+        self.assertEqual(os.listdir(os.path.join(self.media, "uploads")), [])
+
+        # Finalize repetido (el cliente no vio la respuesta): la misma imagen, no otra
+        r = self.client.post(f"/api/admin/uploads/{upload_id}/finalize/")
+        self.assertEqual((r.status_code, r.json()["id"]), (201, img.id))
+        self.assertEqual(ProductImage.objects.count(), 1)
+        self.assertEqual(self.put(upload_id, len(self.data), b"x").status_code, 400)
+
+    def test_failed_part_write_keeps_the_offset(self):
+        upload_id = self.start()
+        with mock.patch("shop.uploads.shutil.copyfileobj", side_effect=OSError("disco lleno")):
+            with self.assertRaises(OSError):
+                self.put(upload_id, 0, self.data[:4096])
+        self.assertEqual(UploadSession.objects.get().received, 0)
+        self.send_all(upload_id)
+        self.assertEqual(self.client.post(f"/api/admin/uploads/{upload_id}/finalize/").status_code, 201)
+
+    def test_finalize_rejects_bad_checksum(self):
+        upload_id = self.start(sha256="f" * 64)
+        r = self.client.post(f"/api/admin/uploads/{upload_id}/finalize/")
+        self.assertEqual(r.json()["detail"], "incomplete_upload")
+        self.send_all(upload_id)
+        r = self.client.post(f"/api/admin/uploads/{upload_id}/finalize/")
+        self.assertEqual((r.status_code, r.json()["detail"]), (400, "checksum_mismatch"))
+        self.assertFalse(ProductImage.objects.exists())
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_abandoned_uploads_expire(self):
+        stale, live = self.start(), self.start()
+        self.put(stale, 0, self.data[:4096])
+        self.put(live, 0, self.data[:4096])
+        UploadSession.objects.filter(pk=stale).update(expires_at=timezone.now())
+        self.assertEqual(self.client.get(f"/api/admin/uploads/{stale}/").status_code, 404)
+        # Un .part sin sesión (p. ej. el producto se borró) y viejo
+        orphan = os.path.join(self.media, "uploads", "huerfano.part")
+        open(orphan, "wb").close()
+        os.utime(orphan, (0, 0))
+
+        out = io.StringIO()
+        call_command("cleanup_uploads", stdout=out)
+        self.assertEqual(out.getvalue().strip(), "sesiones: 1, archivos: 2")
+        self.assertEqual(os.listdir(os.path.join(self.media, "uploads")), [f"{live}.part"])
+        self.assertEqual(self.client.get(f"/api/admin/uploads/{live}/").json()["offset"], 4096)
+
+
+@override_settings(SHOP_IMAGE_WORKERS=0, SHOP_MEDIA_GRACE_SECONDS=0)
+class MediaStorageTests(MediaTestCase):
+    def upload(self, pk, name="foto.png"):
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post(f"/api/admin/products/{pk}/gallery/", {"image": make_image(name, size=(64, 64))})
+        self.assertEqual(r.status_code, 201)
+        return ProductImage.objects.get(pk=r.json()["id"])
+
+    def delete(self, img):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/admin/products/gallery/{img.id}/delete/")
+
+    def test_same_content_is_stored_once(self):
+        other = make_product(2)
+        a, b = self.upload(self.product.id), self.upload(other.id, "otra.PNG")
+        self.assertEqual(a.image.name, b.image.name)
+        self.assertRegex(a.image.name, r"^blobs/[0-9a-f]{2}/[0-9a-f]{64}\.png$")
+        self.assertEqual(len(os.listdir(os.path.dirname(a.image.path))), 1)
+        # La segunda reusa las variantes de la primera
+        self.assertEqual(b.variants, a.variants)
+
+    def test_gallery_delete_releases_unreferenced_blob(self):
+        a, b = self.upload(self.product.id), self.upload(self.product.id)
+        card = os.path.join(self.media, a.variants["card"]["webp"])
+        self.delete(a)
+        self.assertTrue(os.path.exists(b.image.path))
+        self.delete(b)
+        self.assertFalse(os.path.exists(b.image.path))
+        self.assertFalse(os.path.exists(card))
+
+    def test_cleanup_command_removes_orphans_and_temporaries(self):
+        img = self.upload(self.product.id)
+        ProductImage.objects.filter(pk=img.pk).delete()  # sin pasar por la vista
+        open(img.image.path + ".abc.tmp", "wb").close()
+        out = io.StringIO()
+        call_command("cleanup_media", stdout=out)
+        self.assertEqual(out.getvalue().strip(), "blobs: 1, temporales: 1")
+        self.assertEqual(os.listdir(os.path.dirname(img.image.path)), [])
+
+    def test_serves_blobs_immutable_with_etag_and_ranges(self):
+        img = self.upload(self.product.id)
+        url = "/media/" + img.image.name
+        with open(img.image.path, "rb") as fh:
+            data = fh.read()
+        r = self.client.get(url)
+        self.assertEqual((r.status_code, b"".join(r.streaming_content)), (200, data))
+        self.assertIn("immutable", r["Cache-Control"])
+        self.assertEqual(r["ETag"], f'"{os.path.splitext(os.path.basename(img.image.name))[0]}"')
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": r["ETag"]}).status_code, 304)
+
+        r = self.client.get(url, headers={"Range": "bytes=10-19"})
+        self.assertEqual((r.status_code, r["Content-Range"]), (206, f"bytes 10-19/{len(data)}"))
+        self.assertEqual(b"".join(r.streaming_content), data[10:20])
+        r = self.client.get(url, headers={"Range": "bytes=-5"})
+        self.assertEqual(b"".join(r.streaming_content), data[-5:])
+        # Otra versión (If-Range no calza): el archivo entero
+        r = self.client.get(url, headers={"Range": "bytes=0-1", "If-Range": '"otro"'})
+        self.assertEqual(r.status_code, 200)
+        r = self.client.get(url, headers={"Range": f"bytes={len(data)}-"})
+        self.assertEqual((r.status_code, r["Content-Range"]), (416, f"bytes */{len(data)}"))
+
+        r = self.client.get("/media/" + img.variants["card"]["webp"])
+        self.assertIn("immutable", r["Cache-Control"])
+        for path in ("uploads/x", "../settings.py", "blobs/"):
+            self.assertEqual(self.client.get("/media/" + path).status_code, 404)
+
+    def test_upload_parts_stay_private_through_any_path(self):
+        os.makedirs(os.path.join(self.media, "uploads"))
+        with open(os.path.join(self.media, "uploads", "abc.part"), "wb") as fh:
+            fh.write(b"a medio subir")
+        os.makedirs(os.path.join(self.media, "blobs"), exist_ok=True)
+        open(os.path.join(self.media, "blobs", "x.tmp"), "wb").close()
+        for path in (
+            "uploads/abc.part", "blobs/../uploads/abc.part", "blobs/%2e%2e/uploads/abc.part",
+            ".//uploads/abc.part", "./uploads/abc.part", "blobs/x.tmp", "uploads/../blobs/x.tmp",
+        ):
+            self.assertEqual(self.client.get("/media/" + path).status_code, 404, path)
+
+
+
+class SalesAnalyticsTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user("admin", "admin@example.com", is_staff=True)
+        self.products = [make_product(i, price=Decimal("1000.00") * i) for i in range(1, 4)]
+        self.shopper = Client()
+        self.shopper.force_login(User.objects.create_user("ana", "ana@example.com"))
+        self.client.force_login(self.admin)
+
+    def checkout(self, *lines):
+        for product, qty in lines:
+            self.shopper.post("/api/cart/items/", {"product_id": product.id, "qty": qty}, content_type="application/json")
+        r = self.shopper.post("/api/checkout/confirm/", CHECKOUT_PAYLOAD, content_type="application/json")
+        self.assertEqual(r.status_code, 201)
+        return r.json()["order"]
+
+    def report(self, **params):
+        r = self.client.get("/api/admin/analytics/sales/", params)
+        self.assertEqual(r.status_code, 200, r.content)
+        return r.json()
+
+    def snapshot(self):
+        return (
+            sorted(DailySales.objects.exclude(orders=0).values_list("day", "status", "orders", "units", "revenue")),
+            sorted(DailyProductSales.objects.exclude(units=0).values_list("day", "status", "product_id", "units", "revenue")),
+        )
+
+    def test_rollups_follow_checkout_and_status_changes(self):
+        p1, p2, p3 = self.products
+        first = self.checkout((p1, 2), (p2, 1))
+        second = self.checkout((p2, 3))
+        report = self.report()
+        self.assertEqual(report["totals"]["orders"], 2)
+        self.assertEqual(report["totals"]["units"], 6)
+        self.assertEqual(report["totals"]["revenue"], f"{Decimal(first['total']) + Decimal(second['total']):.2f}")
+        self.assertEqual(report["days"], [{"day": timezone.localdate().isoformat(), **report["totals"]}])
+        self.assertEqual(
+            [(p["product_id"], p["units"], p["revenue"]) for p in report["top_products"]],
+            [(p2.id, 4, "8000.00"), (p1.id, 2, "2000.00")],
+        )
+
+        r = self.client.patch(f"/api/admin/orders/{second['id']}/status/", {"status": "cancelled"}, content_type="application/json")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.report()["totals"]["orders"], 1)
+        cancelled = self.report(status="cancelled")
+        self.assertEqual((cancelled["totals"]["units"], cancelled["top_products"][0]["product_id"]), (3, p2.id))
+
+        # Lo incremental coincide con recalcular desde las órdenes
+        incremental = self.snapshot()
+        DailySales.objects.all().delete()
+        out = io.StringIO()
+        call_command("rebuild_sales_rollups", stdout=out)
+        self.assertIn("días: 1, filas: 2, filas por producto: 3", out.getvalue())
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_rebuild_range_uses_local_days(self):
+        # 01:30 en Santiago es el día anterior en UTC
+        day = timezone.make_aware(datetime(2026, 3, 10, 1, 30))
+        make_order("ORD-0001", self.products[:2], created_at=day)
+        make_order("ORD-0002", self.products[:1], created_at=day - timedelta(days=1), status="paid")
+        make_order("ORD-0003", self.products[:1], created_at=day + timedelta(days=5))
+        DailySales.objects.create(day=day.date() + timedelta(days=5), status="pending", orders=99)
+        call_command("rebuild_sales_rollups", "--date-from", "2026-03-09", "--date-to", "2026-03-10", stdout=io.StringIO())
+
+        report = self.report(date_from="2026-03-09", date_to="2026-03-10", status="pending,paid")
+        self.assertEqual(
+            [(d["day"], d["orders"], d["units"]) for d in report["days"]],
+            [("2026-03-09", 1, 1), ("2026-03-10", 1, 2)],
+        )
+        # Fuera del rango no se toca
+        self.assertEqual(DailySales.objects.get(day="2026-03-15").orders, 99)
+        self.assertEqual(self.report(date_from="2026-03-09", date_to="2026-03-10", limit=1)["top_products"][0]["units"], 2)
+
+    def test_invalid_params(self):
+        for params in ({"date_from": "ayer"}, {"date_from": "2026-03-10", "date_to": "2026-03-01"}, {"status": "lost"}):
+            r = self.client.get("/api/admin/analytics/sales/", params)
+            self.assertEqual(r.status_code, 400, params)
+        self.assertEqual(self.shopper.get("/api/admin/analytics/sales/").status_code, 403)
+
+
+@override_settings(SHOP_DB_REPLICAS=["replica1"])
+class ReadReplicaTests(TransactionTestCase):
+    """Réplica como segundo alias sobre la misma base de tests (datos ya confirmados)."""
+    @classmethod
+    def setUpClass(cls):
+        # El alias se agrega recién acá: el runner no debe crear una base para él
+        connections.settings["replica1"] = {**connections["default"].settings_dict, "TEST": {"MIRROR": "default"}}
+        cls.databases = {"default", "replica1"}
+        cls.addClassCleanup(connections.settings.pop, "replica1")
+        cls.addClassCleanup(connections.__delitem__, "replica1")
+        cls.addClassCleanup(connections["replica1"].close)
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
+        catalog_cache.clear()
+        self.product = make_product(1)
+        self.admin = User.objects.create_user("admin", "admin@example.com", is_staff=True)
+
+    def queries(self, func):
+        with CaptureQueriesContext(connections["default"]) as primary, \
+                CaptureQueriesContext(connections["replica1"]) as replica:
+            result = func()
+        return result, len(primary), len(replica)
+
+    def test_catalog_reads_go_to_replica_and_writes_stick_to_primary(self):
+        client = Client()
+        r, primary, replica = self.queries(lambda: client.get("/api/products/search/", {"q": "producto"}))
+        self.assertEqual(r.json()["results"][0]["id"], self.product.id)
+        self.assertEqual((primary, replica > 0), (0, True))
+        self.assertNotIn(STICKY_COOKIE, r.cookies)
+
+        # El carrito es del primario; después de escribir, el cliente queda en el primario
+        r, _, replica = self.queries(lambda: client.post(
+            "/api/cart/items/", {"product_id": self.product.id, "qty": 1}, content_type="application/json",
+        ))
+        self.assertEqual((r.status_code, replica), (201, 0))
+        self.assertIn(STICKY_COOKIE, r.cookies)
+        _, primary, replica = self.queries(lambda: client.get("/api/products/"))
+        self.assertEqual((primary > 0, replica), (True, 0))
+
+        # Vencida la ventana vuelve a la réplica; el catálogo cacheado sigue en el primario
+        client.cookies[STICKY_COOKIE] = str(int(time.time()) - 1)
+        _, primary, replica = self.queries(lambda: client.get("/api/products/search/", {"q": "producto"}))
+        self.assertEqual((primary, replica > 0), (0, True))
+        _, primary, replica = self.queries(lambda: client.get("/api/async/products/", {"limit": 5}))
+        self.assertEqual((primary > 0, replica), (True, 0))
+
+    def test_admin_export_streams_from_replica(self):
+        self.client.force_login(self.admin)
+        r, _, replica = self.queries(lambda: b"".join(self.client.get("/api/admin/products/export/").streaming_content))
+        self.assertIn(b"producto-1", r)
+        self.assertGreater(replica, 0)
+
+    def test_atomic_blocks_read_from_primary(self):
+        count = read_replica(lambda: Product.objects.count())
+        self.assertEqual(self.queries(count), (1, 0, 1))
+        with transaction.atomic():
+            self.assertEqual(self.queries(count)[1:], (1, 0))
+        with override_settings(SHOP_DB_REPLICAS=[]):
+            self.assertEqual(self.queries(count)[1:], (1, 0))
+
+class ImageVariantPoolTests(TransactionTestCase):
+    def test_upload_is_processed_off_the_request(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        admin = User.objects.create_user("admin", "admin@example.com", is_staff=True)
+        product = make_product(1)
+        self.client.force_login(admin)
+        with override_settings(MEDIA_ROOT=media, SHOP_IMAGE_WORKERS=1):
+            self.client.post(f"/api/admin/products/{product.id}/upload-main/", {"image": make_image()})
+            for _ in range(300):
+                product.refresh_from_db()
+                if product.image_variants:
+                    break
+                time.sleep(0.1)
+        self.assertEqual(set(product.image_variants), {"thumb", "card", "detail"})
+
+
+@skipUnless(connection.vendor == "sqlite", "la copia atrasada usa el backup de SQLite")
+@override_settings(SHOP_DB_REPLICAS=["lagging"])
+class LaggingReplicaTests(TransactionTestCase):
+    """Réplica sobre una copia del archivo tomada antes de escribir: va atrasada."""
+    @classmethod
+    def setUpClass(cls):
+        cls.path = os.path.join(tempfile.mkdtemp(), "lagging.sqlite3")
+        cls.addClassCleanup(shutil.rmtree, os.path.dirname(cls.path), True)
+        connections.settings["lagging"] = {**connections["default"].settings_dict, "NAME": cls.path}
+        cls.databases = {"default", "lagging"}
+        cls.addClassCleanup(connections.settings.pop, "lagging")
+        cls.addClassCleanup(connections.__delitem__, "lagging")
+        cls.addClassCleanup(connections["lagging"].close)
+        super().setUpClass()
+
+    def test_catalog_page_is_not_cached_from_a_lagging_replica(self):
+        cache.clear()
+        catalog_cache.clear()
+        product = make_product(1)
+        admin = User.objects.create_user("admin", "admin@example.com", is_staff=True)
+        target = sqlite3.connect(self.path)
+        connections["default"].connection.backup(target)
+        target.close()
+
+        admin_client = Client()
+        admin_client.force_login(admin)
+        r = admin_client.patch(f"/api/admin/products/{product.id}/", {"price": "1500.00"}, content_type="application/json")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(Product.objects.using("lagging").get(pk=product.id).price, Decimal("1000.00"))
+
+        # Un anónimo (sin cookie sticky) arma la página nueva: tiene que salir del primario
+        for url in ("/api/products/", "/api/async/products/"):
+            r = Client().get(url)
+            self.assertEqual(r.json()["results"][0]["price"], "1500.00", url)
+            r = admin_client.get(url)
+            self.assertEqual(r.json()["results"][0]["price"], "1500.00", url)
+
+
+class LoadBenchTests(TestCase):
+    def test_summary_and_regressions(self):
+        recorder = Recorder()
+        for ms in range(1, 101):
+            recorder.add("products", ms / 1000, ok=ms != 100, server_error=ms == 100)
+        summary = summarize(recorder, elapsed=2.0)["products"]
+        self.assertEqual(
+            {k: summary[k] for k in ("requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms")},
+            {"requests": 100, "errors": 1, "rps": 50.0, "p50_ms": 50.0, "p95_ms": 95.0, "p99_ms": 99.0},
+        )
+        baseline = {"products": {**summary, "p95_ms": 70.0}, "cart": summary}
+        self.assertEqual(compare({"products": summary}, baseline, 0.2), [("products", "p95_ms", 70.0, 95.0)])
+        self.assertEqual(compare({"products": summary}, {"products": summary}, 0.2), [])
+        self.assertEqual(recorder.server_errors, {"products": 1})
+
+
+def api_route_keys():
+    """"<MÉTODO> <ruta>" de cada vista bajo api/, como los arma querybudget.route_key."""
+    keys = set()
+    def walk(patterns, prefix):
+        for p in patterns:
+            route = URLResolver._join_route(prefix, str(p.pattern))
+            if isinstance(p, URLResolver):
+                walk(p.url_patterns, route)
+                continue
+            if not route.startswith("api/") or "format" in route:
+                continue
+            actions = getattr(p.callback, "actions", None)
+            view = getattr(p.callback, "cls", None) or getattr(p.callback, "view_class", None)
+            if actions:
+                methods = [m for m in actions if m != "head"]
+            elif view:
+                methods = [m for m in ("get", "post", "put", "patch", "delete") if hasattr(view, m)]
+            else:
+                methods = ["get"]
+            keys.update(f"{m.upper()} {route}" for m in methods)
+    walk(get_resolver().url_patterns, "")
+    return keys
+
+
+@override_settings(SHOP_IMAGE_WORKERS=0, SHOP_QUERY_BUDGET_RAISE=True, SHOP_UPLOAD_CHUNK_SIZE=1 << 20)
+class QueryBudgetTests(MediaSetup, TransactionTestCase):
+    """
+    Todas las rutas de la API con varias filas en cada listado: cada una debe
+    tener su presupuesto fijo en SHOP_QUERY_BUDGET_ROUTES y no excederlo (un
+    N+1 nuevo falla el test). Sin la transacción envolvente de TestCase, cada
+    atomic() es un BEGIN/COMMIT como en producción.
+    """
+    maxDiff = None
+
+    def setUp(self):
+        super().setUp()
+        self.products = [self.product] + [make_product(i) for i in range(2, 6)]
+        for p in self.products:
+            ProductImage.objects.bulk_create(ProductImage(product=p, image=f"products/gallery/{p.slug}-{n}.png") for n in range(2))
+        self.orders = [make_order(f"ORD-{i:04d}", self.products[:3]) for i in range(4)]
+        self.shopper = Client()
+        self.shopper.force_login(User.objects.create_user("ana", "ana@example.com"))
+        for p in self.products[:3]:
+            self.shopper.post("/api/cart/items/", {"product_id": p.id, "qty": 1}, content_type="application/json")
+        User.objects.create_user("beto", "beto@example.com", "clave-segura-123")
+        self.guest = Client()
+        for p in self.products[3:]:
+            self.guest.post("/api/cart/items/", {"product_id": p.id, "qty": 1}, content_type="application/json")
+
+    def route_requests(self):
+        """(cliente, método, url, kwargs) por ruta, en un orden en que todas responden bien."""
+        pid = self.product.id
+        item = CartItem.objects.filter(cart__user__username="ana").first().id
+        image = ProductImage.objects.filter(product=self.products[1]).first().id
+        blob = make_image(size=(64, 64)).read()
+        upload = hashlib.sha256(blob).hexdigest()
+        js = {"content_type": "application/json"}
+        product = {"name": "Nuevo", "slug": "nuevo", "price": "10.00", "stock": 3, "is_active": True}
+        yield self.guest, "GET", "/api/ping/", {}
+        yield self.guest, "GET", "/api/csrf/", {}
+        yield Client(), "POST", "/api/auth/register/", {"data": {
+            "username": "caro", "email": "caro@example.com", "password": "clave-segura-123", "password2": "clave-segura-123",
+        }, **js}
+        yield self.shopper, "GET", "/api/auth/me/", {}
+        yield self.shopper, "GET", "/api/async/auth/me/", {}
+        yield self.guest, "GET", "/api/products/", {}
+        yield self.guest, "GET", "/api/async/products/", {}
+        yield self.guest, "GET", "/api/products/search/", {"data": {"q": "producto"}}
+        yield self.guest, "GET", "/api/products/availability/", {"data": {"ids": ",".join(str(p.id) for p in self.products)}}
+        yield self.shopper, "GET", "/api/cart/", {}
+        yield self.shopper, "GET", "/api/async/cart/", {}
+        yield self.shopper, "POST", "/api/cart/items/", {"data": {"product_id": self.products[4].id, "qty": 1}, **js}
+        yield self.shopper, "PATCH", f"/api/cart/items/{item}/", {"data": {"qty": 2}, **js}
+        yield self.shopper, "DELETE", f"/api/cart/items/{item}/delete/", {}
+        yield self.shopper, "POST", "/api/cart/batch/", {"data": {"operations": [
+            {"op": "add", "product_id": self.products[3].id, "qty": 2}, {"op": "set", "product_id": self.products[4].id, "qty": 3},
+        ], "response": "delta"}, **js}
+        yield self.shopper, "GET", "/api/checkout/summary/", {}
+        yield self.shopper, "GET", "/api/async/checkout/summary/", {}
+        yield self.shopper, "POST", "/api/checkout/confirm/", {"data": CHECKOUT_PAYLOAD, **js}
+        yield self.guest, "POST", "/api/auth/login/", {"data": {"username": "beto", "password": "clave-segura-123"}, **js}
+        yield self.guest, "POST", "/api/auth/logout/", {}
+
+        yield self.client, "GET", "/api/", {}
+        yield self.client, "GET", "/api/admin/products/", {}
+        yield self.client, "POST", "/api/admin/products/", {"data": product, **js}
+        yield self.client, "GET", f"/api/admin/products/{pid}/", {}
+        yield self.client, "PUT", f"/api/admin/products/{pid}/", {"data": {**product, "slug": "producto-1"}, **js}
+        yield self.client, "PATCH", f"/api/admin/products/{pid}/", {"data": {"stock": 7}, **js}
+        yield self.client, "POST", "/api/admin/products/batch/", {"data": {"operations": [
+            {"id": p.id, "stock_delta": 1} for p in self.products
+        ]}, **js}
+        yield self.client, "GET", "/api/admin/products/export/", {}
+        yield self.client, "POST", "/api/admin/products/import/", {"data": {"file": SimpleUploadedFile(
+            "productos.csv", b"slug,name,price,stock,is_active\nproducto-2,Otro,5.00,1,true\nmesa,Mesa,9.00,2,true\n",
+        )}}
+        yield self.client, "DELETE", f"/api/admin/products/{Product.objects.get(slug='nuevo').id}/", {}
+        yield self.client, "POST", f"/api/admin/products/{pid}/upload-main/", {"data": {"image": make_image(size=(64, 64))}}
+        yield self.client, "POST", f"/api/admin/products/{pid}/gallery/", {"data": {"image": make_image(size=(64, 64))}}
+        yield self.client, "DELETE", f"/api/admin/products/gallery/{image}/delete/", {}
+        yield self.client, "POST", f"/api/admin/products/{pid}/gallery/uploads/", {"data": {
+            "filename": "a.png", "size": len(blob), "sha256": upload,
+        }, **js}
+        session = UploadSession.objects.latest("created_at").id
+        yield self.client, "GET", f"/api/admin/uploads/{session}/", {}
+        yield self.client, "PUT", f"/api/admin/uploads/{session}/", {
+            "data": blob, "content_type": "application/octet-stream", "headers": {"Upload-Offset": "0"},
+        }
+        yield self.client, "POST", f"/api/admin/uploads/{session}/finalize/", {}
+        yield self.client, "POST", f"/api/admin/products/{pid}/gallery/uploads/", {"data": {
+            "filename": "b.png", "size": len(blob), "sha256": upload,
+        }, **js}
+        yield self.client, "DELETE", f"/api/admin/uploads/{UploadSession.objects.get(image=None).id}/", {}
+        yield self.client, "GET", "/api/admin/orders/", {}
+        yield self.client, "GET", "/api/admin/orders/export/", {}
+        yield self.client, "GET", f"/api/admin/orders/{self.orders[0].id}/", {}
+        yield self.client, "PATCH", f"/api/admin/orders/{self.orders[0].id}/status/", {"data": {"status": "paid"}, **js}
+        yield self.client, "GET", "/api/admin/catalog/cache/", {}
+        yield self.client, "GET", "/api/admin/analytics/sales/", {}
+
+    def measure(self):
+        measured = {}
+        # En producción las variantes se generan en el pool, fuera del request
+        self.enterContext(mock.patch("shop.views_admin.generate_variants"))
+        for client, method, url, kwargs in self.route_requests():
+            r = getattr(client, method.lower())(url, **kwargs)
+            body = b"".join(r.streaming_content) if r.streaming else r.content
+            self.assertLess(r.status_code, 400, f"{method} {url}: {r.status_code} {body[:200]}")
+            stats = r.wsgi_request.query_stats
+            measured[route_key(r.wsgi_request)] = (stats.count, stats.allowed)
+        return measured
+
+    def assertWithinBudgets(self, measured):
+        self.assertEqual(api_route_keys() - set(measured), set(), "rutas sin request en este test")
+        unpinned = {k: count for k, (count, _) in measured.items() if k not in settings.SHOP_QUERY_BUDGET_ROUTES}
+        self.assertEqual(unpinned, {}, "rutas sin presupuesto en SHOP_QUERY_BUDGET_ROUTES (consultas medidas)")
+        # Las rutas que escriben no fallan el request al excederse: se controla acá
+        over = {
+            k: (count, budget_for(k), allowed) for k, (count, allowed) in measured.items()
+            if count > budget_for(k) + allowed
+        }
+        self.assertEqual(over, {}, "rutas sobre su presupuesto (medido, presupuesto, permitido aparte)")
+
+    def test_every_route_has_a_budget_and_stays_within_it(self):
+        self.assertWithinBudgets(self.measure())
+
+    @override_settings(SHOP_STOCK_HOLDS=True)
+    def test_budgets_hold_with_stock_holds(self):
+        self.assertWithinBudgets(self.measure())
+
+    def test_overrun_fails_only_requests_that_did_not_write(self):
+        routes = {**settings.SHOP_QUERY_BUDGET_ROUTES, "GET api/cart/": 0, "POST api/auth/register/": 0}
+        data = {"username": "caro", "email": "caro@example.com", "password": "clave-segura-123", "password2": "clave-segura-123"}
+        with override_settings(SHOP_QUERY_BUDGET_ROUTES=routes, SHOP_QUERY_BUDGET_RAISE=True):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get("/api/cart/")
+            # El usuario ya quedó creado: el cliente tiene que enterarse
+            r = Client().post("/api/auth/register/", data, content_type="application/json")
+        self.assertEqual(r.status_code, 201)
+        self.assertTrue(User.objects.filter(username="caro").exists())
+
+
+class ServerTimingTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.profiles = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profiles, ignore_errors=True)
+        profile_settings = override_settings(SHOP_PROFILE_DIR=self.profiles)
+        profile_settings.enable()
+        self.addCleanup(profile_settings.disable)
+
+    def metrics(self, response):
+        return dict(m.split(";", 1) for m in response["Server-Timing"].split(", "))
+
+    def test_phases(self):
+        self.client.post("/api/cart/items/", {"product_id": self.product.id, "qty": 1}, content_type="application/json")
+        r = self.client.get("/api/cart/")
+        metrics = self.metrics(r)
+        self.assertEqual(list(metrics), ["auth", "db", "serialize", "view", "render", "total"])
+        self.assertRegex(metrics["db"], r'^dur=[0-9.]+;desc="\d+ consultas"$')
+
+        r = self.client.post("/api/checkout/confirm/", CHECKOUT_PAYLOAD, content_type="application/json")
+        self.assertEqual(r.status_code, 201)
+        self.assertIn("order", self.metrics(r))
+        self.assertIn("render", self.metrics(self.client.get("/api/async/cart/")))
+
+        with override_settings(SHOP_SERVER_TIMING=False):
+            self.assertNotIn("Server-Timing", self.client.get("/api/cart/"))
+
+    def test_profile_on_staff_header_or_sample(self):
+        r = self.client.get("/api/admin/products/", headers={"X-Profile": "1"})
+        profile = self.metrics(r)["profile"].split('"')[1]
+        self.assertEqual(os.listdir(self.profiles), [profile])
+        self.assertTrue(pstats.Stats(os.path.join(self.profiles, profile)).total_calls)
+
+        # Para el resto el header no hace nada
+        Client().get("/api/products/", headers={"X-Profile": "1"})
+        self.assertEqual(len(os.listdir(self.profiles)), 1)
+        with override_settings(SHOP_PROFILE_SAMPLE_RATE=1.0, SHOP_SERVER_TIMING=False):
+            r = Client().get("/api/products/")
+        self.assertNotIn("Server-Timing", r)
+        self.assertEqual(len(os.listdir(self.profiles)), 2)
+
+    @override_settings(SHOP_SERVER_TIMING=False)
+    def test_timing_only_for_staff_profiles_when_disabled(self):
+        self.assertNotIn("Server-Timing", Client().get("/api/products/", headers={"X-Profile": "1"}))
+        self.assertNotIn("Server-Timing", self.client.get("/api/admin/products/"))
+        r = self.client.get("/api/admin/products/", headers={"X-Profile": "1"})
+        self.assertIn("db", self.metrics(r))
+        self.assertIn("profile", self.metrics(r))
+
+
+class FastSerializerTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product.image = "products/main/foto.png"
+        self.product.image_variants = {
+            "thumb": {"webp": "products/variants/foto-thumb.webp"},
+            "card": {"webp": "products/variants/foto card ñ.webp", "jpeg": "products//./variants/../foto.jpg"},
+        }
+        self.product.save()
+        make_product(2, name="Ñandú \u2028 \"rápido\"", price=Decimal("0.50"))
+        make_product(3, is_active=False)
+        self.shopper = User.objects.create_user("ana", "ana@example.com")
+        cart = Cart.objects.create(user=self.shopper)
+        for p in Product.objects.all():
+            cart.items.create(product=p, qty=2, unit_price=p.price)
+        make_order("ORD-20250101-0001", Product.objects.all(), created_at=timezone.now().replace(microsecond=123456))
+
+    def responses(self):
+        shopper, guest, anonymous = Client(), Client(), Client()
+        shopper.force_login(self.shopper)
+        guest.post("/api/cart/items/", {"product_id": self.product.id, "qty": 3}, content_type="application/json")
+        order = Order.objects.get()
+        cache.clear()
+        catalog_cache.clear()
+        for client, method, url in (
+            (anonymous, "get", "/api/products/"),
+            (anonymous, "get", "/api/products/?limit=1"),
+            (anonymous, "get", "/api/async/products/?limit=2"),
+            (anonymous, "get", "/api/products/search/?q=producto"),
+            (shopper, "get", "/api/cart/"),
+            (shopper, "get", "/api/async/cart/"),
+            (shopper, "get", "/api/checkout/summary/"),
+            (guest, "get", "/api/cart/"),
+            (self.client, "get", "/api/cart/"),
+            (self.client, "patch", f"/api/admin/orders/{order.id}/status/"),
+            (self.client, "get", "/api/admin/orders/"),
+        ):
+            r = getattr(client, method)(url, {"status": "paid"} if method == "patch" else None, content_type="application/json")
+            self.assertEqual(r.status_code, 200, url)
+            yield url, r.content
+
+    def test_same_bytes_as_drf_serializers(self):
+        fast = list(self.responses())
+        with override_settings(SHOP_FAST_SERIALIZERS=False):
+            slow = list(self.responses())
+        for (url, content), (_, expected) in zip(fast, slow):
+            with self.subTest(url=url):
+                self.assertEqual(content, expected)
+        self.assertIn("\\u2028".encode(), fast[0][1])
+
+    def test_checkout_order(self):
+        shopper = Client()
+        shopper.force_login(self.shopper)
+        r = shopper.post("/api/checkout/confirm/", CHECKOUT_PAYLOAD, content_type="application/json")
+        order = Order.objects.get(number=r.json()["order"]["number"])
+        expected = JSONRenderer().render(OrderSerializer(order).data)
+        self.assertEqual(JSONRenderer().render(r.json()["order"]), expected)
+        with self.assertNumQueries(1):
+            self.assertEqual(ORJSONRenderer().render(order_data(order)), expected)
+
+    def test_renderer_matches_drf(self):
+        payloads = [
+            {"texto": "ñ \u2028\u2029 \x00\x1f\x7f \"\\ \n\t </script>", "nada": None, "sí": True, 1: 2, "f": 1.5},
+            [Decimal("7000.00"), Decimal("0.10"), 0, -1, 10**18, 2**70],
+            {"dt": datetime(2025, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.get_fixed_timezone(0)), "d": datetime(2025, 1, 2).date()},
+            {"lazy": gettext_lazy("hola"), "tupla": (1, 2)},
+        ]
+        invalid = OrderSerializer(data={"email": "x"})
+        invalid.is_valid()
+        payloads.append(invalid.errors)
+        for data in payloads:
+            with self.subTest(data=data):
+                self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+        self.assertEqual(
+            ORJSONRenderer().render({"a": [1]}, renderer_context={"indent": 2}),
+            JSONRenderer().render({"a": [1]}, renderer_context={"indent": 2}),
+        )
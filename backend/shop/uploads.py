@@ -0,0 +1,179 @@
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from .models import ProductImage, UploadSession, upload_expiry
+
+# Subidas de imágenes de galería por partes: init -> append (una o más veces,
+# reanudable desde `received`) -> finalize. Las partes se escriben directo a
+# MEDIA_ROOT/uploads/<id>.part sin pasar por memoria; al finalizar se verifica
+# el sha256 leyendo del disco y el archivo se mueve (no se copia) al storage.
+# Cada parte y el finalize se hacen con la fila de la sesión bloqueada: dos
+# requests con el mismo offset no escriben el .part a la vez, y un finalize
+# repetido devuelve la imagen del primero. Una subida que pasa SHOP_UPLOAD_TTL
+# sin partes nuevas vence: ya no se puede reanudar y expire_uploads (cron)
+# borra la sesión y su .part (y las ya finalizadas).
+
+BLOCK = 64 * 1024
+
+class UploadError(ValueError):
+    """El código (str(e)) va tal cual en {"detail": ...}."""
+    status = 400
+
+class OffsetMismatch(UploadError):
+    status = 409
+
+class UploadNotFound(UploadError):
+    status = 404
+
+def upload_dir() -> str:
+    path = os.path.join(settings.MEDIA_ROOT, "uploads")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def live_sessions(now=None):
+    return UploadSession.objects.filter(expires_at__gt=now or timezone.now())
+
+def part_path(session) -> str:
+    return os.path.join(upload_dir(), f"{session.pk}.part")
+
+class PartFile(File):
+    # FileSystemStorage mueve los archivos que tienen temporary_file_path()
+    def temporary_file_path(self):
+        return self.file.name
+
+def locked_session(session):
+    """La sesión releída con su fila bloqueada hasta el fin de la transacción."""
+    locked = UploadSession.objects.select_for_update().filter(pk=session.pk).first()
+    if locked is None:
+        raise UploadNotFound("not_found")
+    return locked
+
+def append_chunk(session, offset: int, stream, length: int, sha256: str = "") -> int:
+    """
+    Agrega `length` bytes de `stream` en `offset`. Devuelve el nuevo offset.
+    La parte se escribe primero a un archivo aparte: si la conexión se corta a
+    mitad de camino no queda nada a medias y el cliente reintenta desde el
+    mismo offset. El lock de la sesión se toma recién para pasarla al .part.
+    """
+    if offset != session.received:
+        raise OffsetMismatch("offset_mismatch")
+    if length < 1 or length > settings.SHOP_UPLOAD_CHUNK_SIZE or offset + length > session.size:
+        raise UploadError("invalid_chunk_size")
+
+    chunk_path = os.path.join(upload_dir(), f"{session.pk}.{uuid.uuid4().hex}.chunk")
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        with open(chunk_path, "wb") as out:
+            while written < length:
+                block = stream.read(min(BLOCK, length - written))
+                if not block:
+                    break
+                digest.update(block)
+                out.write(block)
+                written += len(block)
+        if written != length:
+            raise UploadError("incomplete_chunk")
+        if sha256 and digest.hexdigest() != sha256.lower():
+            raise UploadError("chunk_checksum_mismatch")
+
+        with transaction.atomic():
+            # Si otro request ya escribió este offset, gana ese; si la escritura
+            # falla, `received` no se mueve
+            locked = locked_session(session)
+            if locked.received != offset or locked.image_id:
+                raise OffsetMismatch("offset_mismatch")
+            mode = "r+b" if os.path.exists(part_path(session)) else "wb"
+            with open(part_path(session), mode) as part, open(chunk_path, "rb") as chunk:
+                part.seek(offset)
+                part.truncate()
+                shutil.copyfileobj(chunk, part, BLOCK)
+            UploadSession.objects.filter(pk=session.pk).update(received=offset + length, expires_at=upload_expiry())
+    finally:
+        if os.path.exists(chunk_path):
+            os.remove(chunk_path)
+    session.received = offset + length
+    return session.received
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def finalize_upload(session):
+    """
+    Verifica tamaño y sha256 y crea el ProductImage. Devuelve (imagen, creada);
+    si la subida ya se había finalizado, la imagen de entonces. Si el checksum
+    no coincide se descarta todo.
+    """
+    path = part_path(session)
+    with transaction.atomic():
+        session = locked_session(session)
+        if session.image_id:
+            return session.image, False
+        if session.received != session.size:
+            raise UploadError("incomplete_upload")
+        valid = file_sha256(path) == session.sha256
+        if valid:
+            with open(path, "rb") as fh:
+                img = ProductImage(product_id=session.product_id)
+                part = PartFile(fh, name=session.filename)
+                part.content_sha256 = session.sha256  # recién verificado: el storage no lo vuelve a calcular
+                img.image.save(session.filename, part, save=False)
+            img.save()
+            session.image = img
+            session.save(update_fields=["image"])
+    if not valid:
+        discard_upload(session)
+        raise UploadError("checksum_mismatch")
+    if os.path.exists(path):
+        # El storage no movió el archivo: ya tenía uno igual, o lo copió (p. ej. no es FileSystemStorage)
+        os.remove(path)
+    return img, True
+
+def discard_upload(session):
+    path = part_path(session)
+    if os.path.exists(path):
+        os.remove(path)
+    session.delete()
+
+def expire_uploads(batch_size: int = 500, pause: float = 0.0) -> dict:
+    """
+    Borra en lotes las subidas vencidas con su .part, y los archivos de
+    uploads/ sin sesión (producto borrado, request cortado) más viejos que
+    SHOP_UPLOAD_TTL. Para cron.
+    """
+    now = timezone.now()
+    stats = {"sessions": 0, "files": 0}
+    expired = UploadSession.objects.filter(expires_at__lte=now).order_by("expires_at")
+    while True:
+        sessions = list(expired[:batch_size])
+        if not sessions:
+            break
+        for session in sessions:
+            if os.path.exists(part_path(session)):
+                os.remove(part_path(session))
+                stats["files"] += 1
+        UploadSession.objects.filter(pk__in=[s.pk for s in sessions]).delete()
+        stats["sessions"] += len(sessions)
+        if len(sessions) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    root = upload_dir()
+    cutoff = time.time() - settings.SHOP_UPLOAD_TTL
+    live = {str(pk) for pk in UploadSession.objects.values_list("pk", flat=True)}
+    for entry in os.scandir(root):
+        if entry.is_file() and entry.name.split(".", 1)[0] not in live and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+            stats["files"] += 1
+    return stats
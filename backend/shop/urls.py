@@ -1,15 +1,26 @@
-from django.urls import path
+from django.urls import path, register_converter
 from .views import (
-    ProductList, CartDetail, CartAddItem, CartUpdateItem, CartRemoveItem,
+    ProductList, ProductSearch, ProductAvailability, CartDetail, CartAddItem, CartUpdateItem, CartRemoveItem, CartBatch,
     CheckoutSummary, CheckoutConfirm
 )
 
+class SignedIntConverter:
+    # Los items del carrito de invitado (cookie) tienen id negativo
+    regex = r"-?[0-9]+"
+    to_python = staticmethod(int)
+    to_url = staticmethod(str)
+
+register_converter(SignedIntConverter, "sint")
+
 urlpatterns = [
     path("products/", ProductList.as_view()),
+    path("products/search/", ProductSearch.as_view()),
+    path("products/availability/", ProductAvailability.as_view()),
     path("cart/", CartDetail.as_view()),
     path("cart/items/", CartAddItem.as_view()),
-    path("cart/items/<int:item_id>/", CartUpdateItem.as_view()),
-    path("cart/items/<int:item_id>/delete/", CartRemoveItem.as_view()),
+    path("cart/items/<sint:item_id>/", CartUpdateItem.as_view()),
+    path("cart/items/<sint:item_id>/delete/", CartRemoveItem.as_view()),
+    path("cart/batch/", CartBatch.as_view()),
     path("checkout/summary/", CheckoutSummary.as_view()),
     path("checkout/confirm/", CheckoutConfirm.as_view()),
 ]
@@ -2,7 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views_admin import (
     ProductAdminViewSet, ProductMainImageUpload, ProductGalleryUpload, ProductGalleryDelete,
-    OrderAdminViewSet, OrderStatusUpdate
+    OrderAdminViewSet, OrderStatusUpdate, CatalogCacheStats, SalesAnalytics,
+    ProductGalleryUploadInit, ProductGalleryUploadSession, ProductGalleryUploadFinalize
 )
 
 router = DefaultRouter()
@@ -14,5 +15,10 @@ urlpatterns = [
     path("admin/products/<int:pk>/upload-main/", ProductMainImageUpload.as_view()),
     path("admin/products/<int:pk>/gallery/", ProductGalleryUpload.as_view()),
     path("admin/products/gallery/<int:img_id>/delete/", ProductGalleryDelete.as_view()),
+    path("admin/products/<int:pk>/gallery/uploads/", ProductGalleryUploadInit.as_view()),
+    path("admin/uploads/<uuid:upload_id>/", ProductGalleryUploadSession.as_view()),
+    path("admin/uploads/<uuid:upload_id>/finalize/", ProductGalleryUploadFinalize.as_view()),
     path("admin/orders/<int:pk>/status/", OrderStatusUpdate.as_view()),
+    path("admin/catalog/cache/", CatalogCacheStats.as_view()),
+    path("admin/analytics/sales/", SalesAnalytics.as_view()),
 ]
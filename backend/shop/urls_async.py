@@ -0,0 +1,8 @@
+from django.urls import path
+from .views_async import product_list, cart_detail, checkout_summary
+
+urlpatterns = [
+    path("products/", product_list),
+    path("cart/", cart_detail),
+    path("checkout/summary/", checkout_summary),
+]
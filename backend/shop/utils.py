@@ -1,7 +1,21 @@
+import threading
 from decimal import Decimal
-from django.db import transaction
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Prefetch, aprefetch_related_objects, prefetch_related_objects
 from django.utils import timezone
-from .models import Cart, CartItem, Product, Order, OrderItem
+from .models import Cart, CartItem, Product, Order, OrderItem, OrderSequence
+from .analytics import record_order
+from .catalog import bump_catalog_version
+from .holds import held_qty, holds_enabled, release_holds
+from .querybudget import allow_queries
+from .guest_cart import GuestCart, abuild_guest_cart, build_guest_cart, guest_cookie_mode, read_lines
+
+class OutOfStock(ValueError):
+    """Uno o más productos del carrito no tienen stock suficiente."""
+    def __init__(self, product_ids):
+        self.product_ids = list(product_ids)
+        super().__init__(f"no_stock:{self.product_ids[0]}")
 
 def ensure_session_key(request):
     if not request.session.session_key:
@@ -16,59 +30,204 @@ def get_or_create_cart(request):
         cart, _ = Cart.objects.get_or_create(session_key=sk, user=None)
     return cart
 
-def merge_guest_cart_to_user(request, user):
-    """Fusiona el carrito de sesión (si existe) al del usuario."""
-    sk = request.session.session_key
-    if not sk:
-        return
-    try:
-        guest_cart = Cart.objects.get(session_key=sk, user=None)
-    except Cart.DoesNotExist:
-        return
-
-    user_cart, _ = Cart.objects.get_or_create(user=user)
-    # fusiona items
-    for gi in guest_cart.items.all():
-        ui, created = user_cart.items.get_or_create(
-            product=gi.product,
-            defaults={"qty": gi.qty, "unit_price": gi.unit_price}
-        )
-        if not created:
-            ui.qty += gi.qty
-            ui.save(update_fields=["qty"])
-    guest_cart.delete()
+def get_cart(request):
+    """
+    Carrito para lectura: nunca crea sesión ni filas. Un invitado sin sesión
+    lee su carrito de la cookie firmada; si no hay carrito se devuelve uno vacío.
+    """
+    if guest_cookie_mode(request, request.user):
+        return build_guest_cart(read_lines(request))
+    if request.user.is_authenticated:
+        cart = Cart.objects.filter(user=request.user).first()
+    elif request.session.session_key:
+        cart = Cart.objects.filter(session_key=request.session.session_key, user=None).first()
+    else:
+        cart = None
+    return prefetch_cart(cart) if cart is not None else GuestCart()
+
+async def aget_cart(request):
+    user = await request.auser()
+    if guest_cookie_mode(request, user):
+        return await abuild_guest_cart(read_lines(request))
+    if user.is_authenticated:
+        cart = await Cart.objects.filter(user=user).afirst()
+    elif request.session.session_key:
+        cart = await Cart.objects.filter(session_key=request.session.session_key, user=None).afirst()
+    else:
+        cart = None
+    return await aprefetch_cart(cart) if cart is not None else GuestCart()
+
+def get_cart_item(cart, item_id: int):
+    # Los items de la cookie usan id = -product_id; siguen sirviendo cuando el
+    # carrito ya pasó a la base.
+    if item_id < 0:
+        return CartItem.objects.filter(cart=cart, product_id=-item_id).first()
+    return CartItem.objects.filter(pk=item_id, cart=cart).first()
+
+def cart_items_prefetch():
+    return Prefetch("items", queryset=CartItem.objects.select_related("product").order_by("id"))
+
+def prefetch_cart(cart):
+    """
+    Carga los items del carrito con su producto en una sola consulta y los deja
+    en el cache de prefetch, así serializar y calcular totales no consulta más.
+    Se puede llamar de nuevo después de modificar el carrito.
+    """
+    cart._prefetched_objects_cache = {}
+    prefetch_related_objects([cart], cart_items_prefetch())
+    return cart
+
+async def aprefetch_cart(cart):
+    cart._prefetched_objects_cache = {}
+    await aprefetch_related_objects([cart], cart_items_prefetch())
+    return cart
+
+def merge_guest_cart_to_user(request, user, session_key=None, guest_lines=None) -> dict:
+    """
+    Fusiona el carrito de sesión (si existe) y las líneas de la cookie de
+    invitado (`guest_lines`) al carrito del usuario, en una transacción y con
+    un número fijo de consultas: lee los items de los carritos de una vez, crea
+    los nuevos con bulk_create y suma cantidades con bulk_update.
+    Ojo: login() rota la llave de sesión, así que hay que pasar `session_key`
+    capturada antes del login.
+    """
+    stats = {"added": 0, "updated": 0}
+    sk = session_key or request.session.session_key
+    if not sk and not guest_lines:
+        return stats
+    with transaction.atomic():
+        guest_cart = Cart.objects.filter(session_key=sk, user=None).first() if sk else None
+        if guest_cart is None and not guest_lines:
+            return stats
+        user_cart, _ = Cart.objects.get_or_create(user=user)
+
+        cart_ids = [user_cart.id] + ([guest_cart.id] if guest_cart else [])
+        items = list(CartItem.objects.filter(cart_id__in=cart_ids))
+        existing = {it.product_id: it for it in items if it.cart_id == user_cart.id}
+        guest = [(gi.product_id, gi.qty, gi.unit_price) for gi in items if gi.cart_id != user_cart.id]
+        if guest_lines:
+            known = set(Product.objects.filter(pk__in=[pid for pid, _, _ in guest_lines]).values_list("pk", flat=True))
+            guest += [(pid, qty, Decimal(price)) for pid, qty, price in guest_lines if pid in known]
+        to_create, to_update = {}, {}
+        for pid, qty, unit_price in guest:
+            ui = existing.get(pid) or to_create.get(pid)
+            if ui is None:
+                to_create[pid] = CartItem(cart=user_cart, product_id=pid, qty=qty, unit_price=unit_price)
+            else:
+                ui.qty += qty
+                if pid in existing:
+                    to_update[pid] = ui
+        CartItem.objects.bulk_create(to_create.values())
+        CartItem.objects.bulk_update(to_update.values(), ["qty"])
+        if guest_cart is not None:
+            guest_cart.delete()
+    stats.update(added=len(to_create), updated=len(to_update))
+    return stats
 
 def compute_shipping(cart) -> Decimal:
     # Regla simple: envío fijo si hay items
     return Decimal("0.00") if cart.items.count() == 0 else Decimal("4.990")
 
+def reserve_order_sequence(day, count: int = 1) -> int:
+    """
+    Suma `count` al correlativo del día con un UPDATE atómico y devuelve el
+    último número reservado. La fila del día se crea la primera vez, partiendo
+    del mayor número ya usado ese día por si hay órdenes anteriores al contador.
+    """
+    with transaction.atomic():
+        if not OrderSequence.objects.filter(day=day).update(last=F("last") + count):
+            prefix = f"ORD-{day:%Y%m%d}-"
+            last = (
+                Order.objects.filter(number__startswith=prefix)
+                .order_by("-number").values_list("number", flat=True).first()
+            )
+            start = int(last.rsplit("-", 1)[-1]) if last else 0
+            try:
+                with transaction.atomic():
+                    OrderSequence.objects.create(day=day, last=start + count)
+            except IntegrityError:
+                # Otro proceso creó la fila primero
+                OrderSequence.objects.filter(day=day).update(last=F("last") + count)
+        return OrderSequence.objects.filter(day=day).values_list("last", flat=True).get()
+
+class OrderNumberAllocator:
+    """
+    Entrega correlativos diarios de orden. Con block_size > 1 cada worker
+    reserva un bloque de números de una vez y los reparte en memoria, así el
+    contador se toca una vez cada block_size checkouts (puede dejar huecos,
+    nunca repetidos). El bloque solo se guarda cuando la transacción que lo
+    reservó hace commit; si se revierte, otro worker podría recibir el mismo rango.
+    """
+    def __init__(self, block_size: int = 1):
+        self.block_size = max(1, block_size)
+        self._lock = threading.Lock()
+        self._day = None
+        self._next = self._last = 0
+
+    def next(self, day) -> int:
+        with self._lock:
+            if self._day == day and self._next <= self._last:
+                seq = self._next
+                self._next += 1
+                return seq
+
+        last = reserve_order_sequence(day, self.block_size)
+        first = last - self.block_size + 1
+        if self.block_size > 1:
+            def keep_block():
+                with self._lock:
+                    self._day, self._next, self._last = day, first + 1, last
+            transaction.on_commit(keep_block)
+        return first
+
+order_numbers = OrderNumberAllocator(settings.SHOP_ORDER_NUMBER_BLOCK)
+
 def next_order_number() -> str:
-    today = timezone.now().strftime("%Y%m%d")
-    prefix = f"ORD-{today}-"
-    last = Order.objects.filter(number__startswith=prefix).order_by("-number").first()
-    seq = 1
-    if last:
-        try:
-            seq = int(last.number.split("-")[-1]) + 1
-        except Exception:
-            seq = 1
-    return f"{prefix}{seq:04d}"
+    day = timezone.now().date()
+    return f"ORD-{day:%Y%m%d}-{order_numbers.next(day):04d}"
+
+def reserve_stock(lines, cart=None) -> list:
+    """
+    Descuenta stock con UPDATE condicionales (stock >= qty), uno por producto y
+    en orden de id para que los locks de fila se tomen siempre en el mismo
+    orden. Con reservas activas, lo retenido por otros carritos no se puede
+    vender y lo retenido por `cart` pasa a ser el descuento.
+    Devuelve los ids sin stock suficiente; quien llama debe estar dentro de un
+    atomic y abortarlo si la lista no viene vacía.
+    """
+    use_holds = holds_enabled()
+    failed = []
+    # El único costo por línea del checkout (ver "POST api/checkout/confirm/" en settings)
+    allow_queries(len(lines))
+    for pid, qty in sorted(lines.items()):
+        needed = held_qty(exclude_cart=cart) + qty if use_holds else qty
+        updated = Product.objects.filter(pk=pid, stock__gte=needed).update(stock=F("stock") - qty)
+        if not updated:
+            failed.append(pid)
+    return failed
 
 @transaction.atomic
 def create_order_from_cart(request, payload: dict) -> Order:
     """
     Crea Order + OrderItems desde el carrito actual.
-    Valida stock, descuenta inventario y vacía el carrito.
+    Descuenta inventario de forma atómica (sin sobreventa con checkouts
+    concurrentes) y vacía el carrito. Si falta stock lanza OutOfStock con
+    todos los productos afectados.
     """
-    cart = get_or_create_cart(request)
-    items = list(cart.items.select_related("product"))
+    cart = prefetch_cart(get_or_create_cart(request))
+    items = list(cart.items.all())
     if not items:
         raise ValueError("empty_cart")
 
-    # Validar stock
+    # Descontar stock primero: si algo falla no se escribe nada más
+    lines = {}
     for it in items:
-        if it.qty > it.product.stock:
-            raise ValueError(f"no_stock:{it.product.id}")
+        lines[it.product_id] = lines.get(it.product_id, 0) + it.qty
+    failed = reserve_stock(lines, cart)
+    if failed:
+        raise OutOfStock(failed)
+    if holds_enabled():
+        release_holds(cart)
 
     # Calcular totales
     subtotal = sum((it.subtotal for it in items), Decimal("0.00"))
@@ -92,18 +251,24 @@ def create_order_from_cart(request, payload: dict) -> Order:
         status="pending",
     )
 
-    # Items + descuento de stock
-    for it in items:
-        OrderItem.objects.create(
+    OrderItem.objects.bulk_create([
+        OrderItem(
             order=o,
-            product=it.product,
+            product_id=it.product_id,
             qty=it.qty,
             unit_price=it.unit_price,
             subtotal=it.subtotal
         )
-        it.product.stock -= it.qty
-        it.product.save(update_fields=["stock"])
+        for it in items
+    ])
+    sold = {}
+    for it in items:
+        units, revenue = sold.get(it.product_id, (0, Decimal("0.00")))
+        sold[it.product_id] = (units + it.qty, revenue + it.subtotal)
+    record_order(o, sold)
 
     # Vaciar carrito
-    cart.items.all().delete()
-    return o
\ No newline at end of file
+    CartItem.objects.filter(cart=cart).delete()
+    # El stock cambió con update(), que no dispara señales
+    transaction.on_commit(bump_catalog_version)
+    return o
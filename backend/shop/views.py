@@ -1,71 +1,199 @@
+from contextlib import nullcontext
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from .models import Product, CartItem
-from .serializers import ProductSerializer, CartSerializer, OrderSerializer
-from .utils import get_or_create_cart, compute_shipping, create_order_from_cart
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from .models import Product
+from .utils import (
+    get_cart, get_cart_item, get_or_create_cart, prefetch_cart, compute_shipping, create_order_from_cart, OutOfStock
+)
+from .guest_cart import add_guest_line, guest_cookie_mode, promote_guest_cart, set_guest_line
+from .catalog import (
+    catalog_cache, catalog_digest, catalog_etag, catalog_last_modified, catalog_page, catalog_version
+)
+from .pagination import decode_cursor, page_size
+from .search import search_products
+from .fastserializers import cart_data, cart_items_data, order_data, product_fields, product_list
+from .profiling import phase
+from .dbrouter import read_replica
+from .cart_batch import CartBatchError, apply_cart_batch
+from .holds import available_stock, hold_stock, holds_enabled, release_hold
 from django.views.decorators.csrf import ensure_csrf_cookie
 
 class ProductList(APIView):
+    """
+    Catálogo paginado por cursor (?cursor=&limit=). Responde 304 si el cliente
+    ya tiene la página para la versión actual del catálogo.
+    """
     permission_classes = [AllowAny]
     def get(self, request):
-        qs = Product.objects.filter(is_active=True)
-        return Response(ProductSerializer(qs, many=True).data)
+        cursor = request.query_params.get("cursor") or ""
+        try:
+            limit = page_size(request.query_params, settings.SHOP_CATALOG_PAGE_SIZE, settings.SHOP_CATALOG_MAX_PAGE_SIZE)
+            after = decode_cursor(cursor)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+
+        version = catalog_version()
+        etag = catalog_etag(version, cursor, limit)
+        last_modified = catalog_last_modified(version)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            key = catalog_digest(version, cursor, limit)
+            response = Response(catalog_cache.get_or_build(key, lambda: catalog_page(after, limit)))
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+class ProductSearch(APIView):
+    """Búsqueda por nombre/slug (?q=&limit=), por relevancia y con prefijos."""
+    permission_classes = [AllowAny]
+    @read_replica
+    def get(self, request):
+        try:
+            limit = page_size(request.query_params, settings.SHOP_SEARCH_PAGE_SIZE, settings.SHOP_SEARCH_MAX_PAGE_SIZE)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+        products = search_products(request.query_params.get("q", ""), limit, product_fields())
+        return Response({"results": product_list(products)})
+
+class ProductAvailability(APIView):
+    """Disponible para vender (stock menos reservas vigentes) para ?ids=1,2,3."""
+    permission_classes = [AllowAny]
+    @read_replica
+    def get(self, request):
+        try:
+            ids = [int(x) for x in request.query_params.get("ids", "").split(",") if x.strip()]
+        except ValueError:
+            return Response({"detail": "invalid_ids"}, status=400)
+        if len(ids) > settings.SHOP_CATALOG_MAX_PAGE_SIZE:
+            return Response({"detail": "too_many_ids"}, status=400)
+        available = available_stock(ids)
+        return Response({"results": [{"id": pid, "available": available[pid]} for pid in ids if pid in available]})
 
 class CartDetail(APIView):
     permission_classes = [AllowAny]  # carrito también para invitados (con CSRF en POST)
     def get(self, request):
-        cart = get_or_create_cart(request)
-        return Response(CartSerializer(cart).data)
+        return Response(cart_data(get_cart(request)))
 
 class CartAddItem(APIView):
     permission_classes = [AllowAny]
     def post(self, request):
-        cart = get_or_create_cart(request)
         pid = request.data.get("product_id")
         qty = int(request.data.get("qty", 1))
         if not pid or qty < 1:
             return Response({"detail": "invalid_payload"}, status=400)
         product = get_object_or_404(Product, pk=pid, is_active=True)
-        item, created = cart.items.get_or_create(
-            product=product,
-            defaults={"qty": qty, "unit_price": product.price}
-        )
-        if not created:
-            item.qty += qty
-            item.save(update_fields=["qty"])
-        return Response({"detail": "added", "cart": CartSerializer(cart).data}, status=201)
+        if guest_cookie_mode(request, request.user):
+            cart = add_guest_line(request, product, qty)
+            return Response({"detail": "added", "cart": cart_data(cart)}, status=201)
+        cart = get_or_create_cart(request)
+        with transaction.atomic():
+            item, created = cart.items.get_or_create(
+                product=product,
+                defaults={"qty": qty, "unit_price": product.price}
+            )
+            if not created:
+                item.qty += qty
+                item.save(update_fields=["qty"])
+            if holds_enabled() and not hold_stock(cart, product.id, item.qty):
+                transaction.set_rollback(True)
+                return Response({"detail": "no_stock", "product_id": str(product.id)}, status=400)
+        return Response({"detail": "added", "cart": cart_data(prefetch_cart(cart))}, status=201)
+
+def holds_atomic():
+    # Con reservas, el item y su hold cambian juntos o ninguno; sin ellas es una sola escritura
+    return transaction.atomic() if holds_enabled() else nullcontext()
 
 class CartUpdateItem(APIView):
     permission_classes = [AllowAny]
     def patch(self, request, item_id: int):
-        cart = get_or_create_cart(request)
-        item = get_object_or_404(CartItem, pk=item_id, cart=cart)
         qty = int(request.data.get("qty", 1))
-        if qty < 1:
-            item.delete()
-            return Response({"detail": "removed", "cart": CartSerializer(cart).data})
-        item.qty = qty
-        item.save(update_fields=["qty"])
-        return Response({"detail": "updated", "cart": CartSerializer(cart).data})
+        if guest_cookie_mode(request, request.user):
+            cart = set_guest_line(request, -item_id, qty)
+            if cart is None:
+                raise Http404
+            return Response({"detail": "removed" if qty < 1 else "updated", "cart": cart_data(cart)})
+        cart = get_or_create_cart(request)
+        item = get_cart_item(cart, item_id)
+        if item is None:
+            raise Http404
+        with holds_atomic():
+            if qty < 1:
+                item.delete()
+                if holds_enabled():
+                    release_hold(cart, item.product_id)
+            else:
+                if holds_enabled() and not hold_stock(cart, item.product_id, qty):
+                    transaction.set_rollback(True)
+                    return Response({"detail": "no_stock", "product_id": str(item.product_id)}, status=400)
+                item.qty = qty
+                item.save(update_fields=["qty"])
+        return Response({"detail": "removed" if qty < 1 else "updated", "cart": cart_data(prefetch_cart(cart))})
 
 class CartRemoveItem(APIView):
     permission_classes = [AllowAny]
     def delete(self, request, item_id: int):
+        if guest_cookie_mode(request, request.user):
+            cart = set_guest_line(request, -item_id, 0)
+            if cart is None:
+                raise Http404
+            return Response({"detail": "removed", "cart": cart_data(cart)})
         cart = get_or_create_cart(request)
-        item = get_object_or_404(CartItem, pk=item_id, cart=cart)
-        item.delete()
-        return Response({"detail": "removed", "cart": CartSerializer(cart).data})
+        item = get_cart_item(cart, item_id)
+        if item is None:
+            raise Http404
+        with holds_atomic():
+            item.delete()
+            if holds_enabled():
+                release_hold(cart, item.product_id)
+        return Response({"detail": "removed", "cart": cart_data(prefetch_cart(cart))})
+
+class CartBatch(APIView):
+    """
+    Varias operaciones en orden y todas o ninguna:
+    {"operations": [{"op": "add", "product_id", "qty"}, {"op": "set", "item_id"|"product_id", "qty"},
+    {"op": "remove", "item_id"|"product_id"}], "response": "full"|"delta"}
+    Con "delta" responde sólo las líneas creadas o cambiadas, los ids quitados y el total,
+    salvo que el lote haya pasado el carrito de invitado a la base: ahí va el carrito entero.
+    """
+    permission_classes = [AllowAny]
+    def post(self, request):
+        operations = request.data.get("operations")
+        mode = request.data.get("response", "full")
+        if not isinstance(operations, list) or not operations or mode not in ("full", "delta"):
+            return Response({"detail": "invalid_payload"}, status=400)
+        if len(operations) > settings.SHOP_CART_BATCH_MAX:
+            return Response({"detail": "too_many_operations"}, status=400)
+        try:
+            cart, changed, removed = apply_cart_batch(request, operations)
+        except CartBatchError as e:
+            return Response({"detail": str(e), "errors": e.errors}, status=400)
+        if mode == "full" or changed is None:
+            return Response({"detail": "updated", "cart": cart_data(cart)})
+        changed = set(changed)
+        items = [it for it in cart.items.all() if it.product_id in changed]
+        return Response({
+            "detail": "updated",
+            "changed": cart_items_data(items),
+            "removed": removed,
+            "total": cart.total,
+        })
 
 class CheckoutSummary(APIView):
     permission_classes = [AllowAny]
     def get(self, request):
-        cart = get_or_create_cart(request)
-        s = CartSerializer(cart).data
-        s["shipping"] = str(compute_shipping(cart))
-        s["total"] = str(cart.items.all() and (cart.items.aggregate_total if False else (sum(i["subtotal"] for i in s["items"]) + float(s["shipping"]))) )
-        # Nota: arriba total lo calculamos nuevamente; puedes simplificar si tu CartSerializer ya trae total.
+        cart = get_cart(request)
+        s = cart_data(cart)
+        shipping = compute_shipping(cart)
+        s["shipping"] = str(shipping)
+        s["total"] = str(cart.total + shipping)
         return Response({"cart": s})
 
 class CheckoutConfirm(APIView):
@@ -76,14 +204,20 @@ class CheckoutConfirm(APIView):
         for k in required:
             if not (request.data.get(k) or "").strip():
                 return Response({"detail": f"missing:{k}"}, status=400)
+        if guest_cookie_mode(request, request.user):
+            promote_guest_cart(request)  # la orden sale de Cart/CartItem
         try:
-            order = create_order_from_cart(request, request.data)
+            with phase("order"):
+                order = create_order_from_cart(request, request.data)
+        except OutOfStock as e:
+            return Response({
+                "detail": "no_stock",
+                "product_id": str(e.product_ids[0]),
+                "product_ids": e.product_ids,
+            }, status=400)
         except ValueError as e:
             msg = str(e)
-            if msg.startswith("no_stock:"):
-                pid = msg.split(":")[1]
-                return Response({"detail": "no_stock", "product_id": pid}, status=400)
             if msg == "empty_cart":
                 return Response({"detail": "empty_cart"}, status=400)
             return Response({"detail": "invalid"}, status=400)
-        return Response({"detail": "created", "order": OrderSerializer(order).data}, status=201)
\ No newline at end of file
+        return Response({"detail": "created", "order": order_data(order)}, status=201)
\ No newline at end of file
@@ -1,16 +1,110 @@
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
+import io
+import re
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from .models import Product, ProductImage, Order
+from django.utils.text import get_valid_filename
+from .models import Product, ProductImage, Order, OrderItem, UploadSession
 from .serializers import ProductAdminSerializer, ProductImageSerializer, OrderAdminSerializer
+from .fastserializers import order_data, order_list, order_values
+from .catalog import catalog_cache, catalog_version
+from .derivatives import generate_variants
+from .media import release_media
+from .uploads import UploadError, UploadNotFound, append_chunk, discard_upload, finalize_upload, live_sessions
+from .analytics import parse_range, parse_statuses, record_status_change, sales_report
+from .exports import CONTENT_TYPES, KINDS, export_rows, filter_orders, render_export
+from .product_batch import BatchError, apply_product_batch
+from .product_io import FORMATS, guess_format, import_products, product_rows, read_rows, render_products
+from .pagination import decode_cursor, keyset_page, page_size
+from .dbrouter import read_replica
 
 class ProductAdminViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAdminUser]
-    queryset = Product.objects.all().order_by("-created_at")
+    queryset = Product.objects.all().order_by("-created_at").prefetch_related("images")
     serializer_class = ProductAdminSerializer
 
+    @read_replica
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        self._save(serializer)
+
+    def perform_update(self, serializer):
+        self._save(serializer)
+
+    def perform_destroy(self, instance):
+        names = [instance.image.name if instance.image else "", *(img.image.name for img in instance.images.all())]
+        instance.delete()
+        transaction.on_commit(lambda: release_media(names))
+
+    def _save(self, serializer):
+        # Si viene imagen nueva, las variantes anteriores ya no sirven
+        if "image" in serializer.validated_data:
+            old = serializer.instance.image.name if serializer.instance and serializer.instance.image else ""
+            product = serializer.save(image_variants={})
+            transaction.on_commit(lambda: generate_variants(product))
+            transaction.on_commit(lambda: release_media([old]))
+        else:
+            serializer.save()
+
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        """
+        {"operations": [{"id"|"slug", "price"?, "stock"?, "stock_delta"?, "is_active"?}]}
+        Todo o nada: si alguna operación falla responde 400 con sus errores.
+        """
+        operations = request.data.get("operations")
+        if not isinstance(operations, list) or not operations:
+            return Response({"detail":"invalid_payload"}, status=400)
+        if len(operations) > settings.SHOP_PRODUCT_BATCH_MAX:
+            return Response({"detail":"too_many_operations"}, status=400)
+        try:
+            result = apply_product_batch(operations)
+        except BatchError as e:
+            return Response({"detail": str(e), "errors": e.errors}, status=400)
+        return Response(result)
+
+    @action(detail=False, methods=["get"])
+    @read_replica
+    def export(self, request):
+        """Catálogo en streaming: ?output=csv|ndjson (mismas columnas que la importación)."""
+        fmt = request.query_params.get("output", "csv")
+        if fmt not in FORMATS:
+            return Response({"detail":"invalid_export"}, status=400)
+        rows = product_rows(Product.objects.all())
+        response = StreamingHttpResponse(render_products(rows, fmt), content_type=CONTENT_TYPES[fmt])
+        response["Content-Disposition"] = f'attachment; filename="products.{fmt}"'
+        return response
+
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_file(self, request):
+        """
+        Upsert por slug desde un archivo (multipart `file`), ?input=csv|ndjson
+        (por defecto según la extensión) y ?dry_run=1 para solo validar.
+        """
+        file = request.FILES.get("file")
+        if not file:
+            return Response({"detail":"missing_file"}, status=400)
+        fmt = request.query_params.get("input") or guess_format(file.name)
+        if fmt not in FORMATS:
+            return Response({"detail":"invalid_input"}, status=400)
+        dry_run = request.query_params.get("dry_run") in ("1", "true")
+        # Los archivos grandes quedan en disco (FILE_UPLOAD_MAX_MEMORY_SIZE) y se leen por líneas
+        stream = io.TextIOWrapper(file.open("rb"), encoding="utf-8-sig", newline="")
+        try:
+            stats = import_products(read_rows(stream, fmt), dry_run=dry_run)
+        except UnicodeDecodeError:
+            return Response({"detail":"invalid_encoding"}, status=400)
+        return Response(stats)
+
 class ProductMainImageUpload(APIView):
     permission_classes = [IsAdminUser]
     def post(self, request, pk: int):
@@ -18,8 +112,12 @@ class ProductMainImageUpload(APIView):
         file = request.FILES.get("image")
         if not file:
             return Response({"detail":"missing_file"}, status=400)
+        old = product.image.name if product.image else ""
         product.image = file
-        product.save(update_fields=["image"])
+        product.image_variants = {}
+        product.save(update_fields=["image", "image_variants"])
+        transaction.on_commit(lambda: generate_variants(product))
+        transaction.on_commit(lambda: release_media([old]))
         return Response(ProductAdminSerializer(product).data, status=200)
 
 class ProductGalleryUpload(APIView):
@@ -30,6 +128,72 @@ class ProductGalleryUpload(APIView):
         if not file:
             return Response({"detail":"missing_file"}, status=400)
         img = ProductImage.objects.create(product=product, image=file)
+        transaction.on_commit(lambda: generate_variants(img))
+        return Response(ProductImageSerializer(img).data, status=201)
+
+def upload_state(session):
+    return {"id": str(session.pk), "offset": session.received, "size": session.size,
+            "chunk_size": settings.SHOP_UPLOAD_CHUNK_SIZE}
+
+class ProductGalleryUploadInit(APIView):
+    """Inicia una subida por partes: {filename, size, sha256}."""
+    permission_classes = [IsAdminUser]
+    def post(self, request, pk: int):
+        product = get_object_or_404(Product, pk=pk)
+        filename = get_valid_filename((request.data.get("filename") or "").rsplit("/", 1)[-1])
+        sha256 = (request.data.get("sha256") or "").lower()
+        try:
+            size = int(request.data.get("size") or 0)
+        except (TypeError, ValueError):
+            size = 0
+        if not filename or not re.fullmatch(r"[0-9a-f]{64}", sha256):
+            return Response({"detail":"invalid_payload"}, status=400)
+        if size < 1 or size > settings.SHOP_UPLOAD_MAX_SIZE:
+            return Response({"detail":"invalid_size"}, status=400)
+        session = UploadSession.objects.create(product=product, filename=filename, size=size, sha256=sha256)
+        return Response(upload_state(session), status=201)
+
+class ProductGalleryUploadSession(APIView):
+    """
+    GET: estado (offset para reanudar). PUT: agrega una parte; el cuerpo es el
+    binario y el header Upload-Offset indica dónde va (X-Chunk-SHA256 opcional).
+    DELETE: cancela.
+    """
+    permission_classes = [IsAdminUser]
+    def get(self, request, upload_id):
+        return Response(upload_state(get_object_or_404(live_sessions(), pk=upload_id)))
+
+    def put(self, request, upload_id):
+        session = get_object_or_404(live_sessions(), pk=upload_id)
+        try:
+            offset = int(request.headers.get("Upload-Offset", ""))
+            length = int(request.headers.get("Content-Length", ""))
+        except ValueError:
+            return Response({"detail":"invalid_headers"}, status=400)
+        try:
+            # request.stream y no request.data: el cuerpo se lee por bloques, nunca entero
+            append_chunk(session, offset, request.stream, length, request.headers.get("X-Chunk-SHA256", ""))
+        except UploadNotFound as e:
+            return Response({"detail": str(e)}, status=e.status)
+        except UploadError as e:
+            session.refresh_from_db()
+            return Response({"detail": str(e), "offset": session.received}, status=e.status)
+        return Response(upload_state(session))
+
+    def delete(self, request, upload_id):
+        discard_upload(get_object_or_404(live_sessions(), pk=upload_id))
+        return Response({"detail":"deleted"})
+
+class ProductGalleryUploadFinalize(APIView):
+    permission_classes = [IsAdminUser]
+    def post(self, request, upload_id):
+        session = get_object_or_404(live_sessions(), pk=upload_id)
+        try:
+            img, created = finalize_upload(session)
+        except UploadError as e:
+            return Response({"detail": str(e)}, status=e.status)
+        if created:
+            transaction.on_commit(lambda: generate_variants(img))
         return Response(ProductImageSerializer(img).data, status=201)
 
 class ProductGalleryDelete(APIView):
@@ -37,22 +201,87 @@ class ProductGalleryDelete(APIView):
     def delete(self, request, img_id: int):
         img = get_object_or_404(ProductImage, pk=img_id)
         img.delete()
+        # El archivo puede seguir en uso por otra imagen con el mismo contenido
+        transaction.on_commit(lambda: release_media([img.image.name]))
         return Response({"detail":"deleted"})
 
+class CatalogCacheStats(APIView):
+    """Contadores del cache del catálogo (por proceso)."""
+    permission_classes = [IsAdminUser]
+    def get(self, request):
+        return Response({"version": catalog_version(), **catalog_cache.stats()})
+
 class OrderAdminViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Listado paginado por cursor, de la más nueva a la más antigua:
+    ?status=&date_from=&date_to=&email=&number=&cursor=&limit=
+    Cada página son 2 consultas (órdenes y líneas con su producto).
+    """
     permission_classes = [IsAdminUser]
-    queryset = Order.objects.all().order_by("-created_at")
+    queryset = Order.objects.all().order_by("-created_at", "-id").prefetch_related(
+        Prefetch("items", queryset=OrderItem.objects.select_related("product").order_by("id"))
+    )
     serializer_class = OrderAdminSerializer
 
-from rest_framework.decorators import action
+    @read_replica
+    def list(self, request):
+        try:
+            limit = page_size(request.query_params, settings.SHOP_ADMIN_PAGE_SIZE, settings.SHOP_ADMIN_MAX_PAGE_SIZE)
+            after = decode_cursor(request.query_params.get("cursor"))
+            qs = filter_orders(self.get_queryset(), request.query_params)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+        rows, next_cursor = keyset_page(order_values(qs), after, limit, descending=True)
+        return Response({"results": order_list(rows, OrderAdminSerializer), "next": next_cursor})
+
+    @action(detail=False, methods=["get"])
+    @read_replica
+    def export(self, request):
+        """
+        Exportación en streaming: ?output=csv|ndjson&kind=orders|lines
+        &status=&date_from=&date_to= (usa `output` porque DRF reserva `format`).
+        """
+        fmt = request.query_params.get("output", "csv")
+        kind = request.query_params.get("kind", "orders")
+        if fmt not in CONTENT_TYPES or kind not in KINDS:
+            return Response({"detail":"invalid_export"}, status=400)
+        try:
+            qs = filter_orders(Order.objects.all(), request.query_params)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+        response = StreamingHttpResponse(render_export(export_rows(qs, kind), kind, fmt), content_type=CONTENT_TYPES[fmt])
+        response["Content-Disposition"] = f'attachment; filename="{kind}.{fmt}"'
+        return response
 
 class OrderStatusUpdate(APIView):
     permission_classes = [IsAdminUser]
     def patch(self, request, pk: int):
-        order = get_object_or_404(Order, pk=pk)
-        status_value = request.data.get("status")
-        if status_value not in ["pending","paid","cancelled"]:
-            return Response({"detail":"invalid_status"}, status=400)
-        order.status = status_value
-        order.save(update_fields=["status"])
-        return Response(OrderAdminSerializer(order).data)
+        with transaction.atomic():
+            # Bloqueada para mover los resúmenes de ventas desde el estado que tenía
+            order = get_object_or_404(Order.objects.select_for_update(), pk=pk)
+            status_value = request.data.get("status")
+            if status_value not in ["pending","paid","cancelled"]:
+                return Response({"detail":"invalid_status"}, status=400)
+            old_status = order.status
+            order.status = status_value
+            order.save(update_fields=["status"])
+            record_status_change(order, old_status)
+        return Response(order_data(order, OrderAdminSerializer))
+
+class SalesAnalytics(APIView):
+    """
+    Ventas del rango desde los resúmenes diarios:
+    ?date_from=&date_to= (inclusive, por defecto los últimos 30 días),
+    ?status=paid,pending (por defecto todo menos canceladas) y ?limit= productos
+    en el ranking. Lee sólo los resúmenes (más los nombres del top), no las órdenes.
+    """
+    permission_classes = [IsAdminUser]
+    @read_replica
+    def get(self, request):
+        try:
+            date_from, date_to = parse_range(request.query_params, settings.SHOP_ANALYTICS_DEFAULT_DAYS)
+            statuses = parse_statuses(request.query_params.get("status"))
+            top = page_size(request.query_params, 10, settings.SHOP_ANALYTICS_MAX_TOP)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+        return Response(sales_report(date_from, date_to, statuses, top))
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET
+from .catalog import acatalog_page, acatalog_version, catalog_cache, catalog_digest, catalog_etag, catalog_last_modified
+from .pagination import decode_cursor, page_size
+from .profiling import JSONRenderer
+from .fastserializers import cart_data
+from .utils import aget_cart, compute_shipping
+
+# Versiones async de los endpoints de lectura más usados, para servir bajo ASGI
+# sin pasar cada request por un thread. Responden lo mismo que las vistas DRF de
+# views.py (mismo JSON); solo aceptan GET y no pasan por la autenticación de DRF,
+# el usuario sale de la sesión igual que en SessionAuthentication.
+
+def json_response(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type="application/json")
+
+@require_GET
+async def product_list(request):
+    cursor = request.GET.get("cursor") or ""
+    try:
+        limit = page_size(request.GET, settings.SHOP_CATALOG_PAGE_SIZE, settings.SHOP_CATALOG_MAX_PAGE_SIZE)
+        after = decode_cursor(cursor)
+    except ValueError as e:
+        return json_response({"detail": str(e)}, status=400)
+
+    version = await acatalog_version()
+    etag = catalog_etag(version, cursor, limit)
+    last_modified = catalog_last_modified(version)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        key = catalog_digest(version, cursor, limit)
+        response = json_response(await catalog_cache.aget_or_build(key, lambda: acatalog_page(after, limit)))
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+    return response
+
+@require_GET
+async def cart_detail(request):
+    cart = await aget_cart(request)
+    return json_response(cart_data(cart))
+
+@require_GET
+async def checkout_summary(request):
+    cart = await aget_cart(request)
+    s = cart_data(cart)
+    shipping = compute_shipping(cart)
+    s["shipping"] = str(shipping)
+    s["total"] = str(cart.total + shipping)
+    return json_response({"cart": s})
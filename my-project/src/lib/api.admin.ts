@@ -26,6 +26,28 @@ export async function adminPatchProduct(id:number, patch: any) {
   if (!r.ok) throw await r.text();
   return r.json();
 }
+// Cambios en lote, todo o nada: [{id|slug, price?, stock?, stock_delta?, is_active?}]
+export async function adminBatchProducts(operations: Record<string, any>[]) {
+  const r = await fetch(`${API}/api/admin/products/batch/`, {
+    method: 'POST', credentials: 'include',
+    headers: { 'Content-Type':'application/json', 'X-CSRFToken': getCSRFTOKEN() },
+    body: JSON.stringify({ operations })
+  });
+  if (!r.ok) throw await r.text();
+  return r.json();
+}
+// Carga masiva (CSV/NDJSON, upsert por slug). Devuelve {created, updated, unchanged, errors, error_rows}
+export async function adminImportProducts(file: File, dryRun = false) {
+  const fd = new FormData(); fd.append('file', file);
+  const r = await fetch(`${API}/api/admin/products/import/${dryRun ? '?dry_run=1' : ''}`, {
+    method: 'POST', credentials: 'include',
+    headers: { 'X-CSRFToken': getCSRFTOKEN() }, body: fd
+  });
+  if (!r.ok) throw await r.text(); return r.json();
+}
+export function adminExportProductsUrl(output: 'csv'|'ndjson' = 'csv') {
+  return `${API}/api/admin/products/export/?output=${output}`;
+}
 export async function adminUploadMainImage(id:number, file: File) {
   const fd = new FormData(); fd.append('image', file);
   const r = await fetch(`${API}/api/admin/products/${id}/upload-main/`, {
@@ -35,6 +57,7 @@ export async function adminUploadMainImage(id:number, file: File) {
   if (!r.ok) throw await r.text(); return r.json();
 }
 export async function adminUploadGallery(id:number, file: File) {
+  if (file.size > 8 * 1024 * 1024) return adminUploadGalleryChunked(id, file);
   const fd = new FormData(); fd.append('image', file);
   const r = await fetch(`${API}/api/admin/products/${id}/gallery/`, {
     method: 'POST', credentials: 'include',
@@ -42,6 +65,35 @@ export async function adminUploadGallery(id:number, file: File) {
   });
   if (!r.ok) throw await r.text(); return r.json();
 }
+// Subida por partes para archivos grandes: init -> PUT de cada parte -> finalize.
+// Si una parte falla, se consulta el offset del servidor y se reintenta desde ahí.
+async function sha256Hex(file: Blob) {
+  const hash = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+  return Array.from(new Uint8Array(hash)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+export async function adminUploadGalleryChunked(id:number, file: File, retries = 3) {
+  const headers = { 'Content-Type':'application/json', 'X-CSRFToken': getCSRFTOKEN() };
+  let r = await fetch(`${API}/api/admin/products/${id}/gallery/uploads/`, {
+    method: 'POST', credentials: 'include', headers,
+    body: JSON.stringify({ filename: file.name, size: file.size, sha256: await sha256Hex(file) })
+  });
+  if (!r.ok) throw await r.text();
+  let { id: uploadId, offset, chunk_size } = await r.json();
+  while (offset < file.size) {
+    r = await fetch(`${API}/api/admin/uploads/${uploadId}/`, {
+      method: 'PUT', credentials: 'include',
+      headers: { 'Content-Type': 'application/octet-stream', 'Upload-Offset': String(offset), 'X-CSRFToken': getCSRFTOKEN() },
+      body: file.slice(offset, offset + chunk_size)
+    }).catch(() => null as any);
+    if (r?.ok) { offset = (await r.json()).offset; continue; }
+    if (retries-- <= 0) throw r ? await r.text() : 'upload_failed';
+    r = await fetch(`${API}/api/admin/uploads/${uploadId}/`, { credentials: 'include' });
+    offset = (await r.json()).offset;
+  }
+  r = await fetch(`${API}/api/admin/uploads/${uploadId}/finalize/`, { method: 'POST', credentials: 'include', headers });
+  if (!r.ok) throw await r.text(); return r.json();
+}
+
 export async function adminDeleteGallery(imgId:number) {
   const r = await fetch(`${API}/api/admin/products/gallery/${imgId}/delete/`, {
     method: 'DELETE', credentials: 'include',
@@ -50,8 +102,18 @@ export async function adminDeleteGallery(imgId:number) {
   if (!r.ok) throw await r.text(); return r.json();
 }
 
-export async function adminListOrders() {
-  const r = await fetch(`${API}/api/admin/orders/`, { credentials: 'include' });
+// Paginado por cursor: { results, next }. Filtros: status, date_from, date_to, email, number
+export async function adminListOrders(params: Record<string,string> = {}) {
+  const qs = new URLSearchParams(Object.entries(params).filter(([, v]) => v)).toString();
+  const r = await fetch(`${API}/api/admin/orders/${qs ? `?${qs}` : ''}`, { credentials: 'include' });
+  return r.json();
+}
+// Ventas por día y productos más vendidos, desde los resúmenes diarios.
+// Filtros: date_from, date_to (por defecto últimos 30 días), status (lista con comas), limit
+export async function adminSalesAnalytics(params: Record<string,string> = {}) {
+  const qs = new URLSearchParams(Object.entries(params).filter(([, v]) => v)).toString();
+  const r = await fetch(`${API}/api/admin/analytics/sales/${qs ? `?${qs}` : ''}`, { credentials: 'include' });
+  if (!r.ok) throw await r.text();
   return r.json();
 }
 export async function adminUpdateOrderStatus(id:number, status:'pending'|'paid'|'cancelled') {
@@ -47,8 +47,12 @@ export async function register(payload: {
 
 // ... lo que ya tienes arriba (ensureCsrf, me, login, logout)
 
-export async function listProducts() {
-  return apiGet('/api/products/');
+// Catálogo paginado por cursor: { results, next }
+export async function listProducts(cursor = '') {
+  return apiGet(cursor ? `/api/products/?cursor=${encodeURIComponent(cursor)}` : '/api/products/');
+}
+export async function searchProducts(q: string, limit = 48) {
+  return apiGet(`/api/products/search/?q=${encodeURIComponent(q)}&limit=${limit}`);
 }
 export async function getCart() {
   return apiGet('/api/cart/');
@@ -69,6 +73,16 @@ export async function updateCartItem(item_id: number, qty: number) {
     body: JSON.stringify({ qty })
   }).then(r => { if(!r.ok) throw r.text(); return r.json(); });
 }
+export type CartOperation =
+  | { op: 'add'; product_id: number; qty?: number }
+  | { op: 'set'; item_id?: number; product_id?: number; qty: number }
+  | { op: 'remove'; item_id?: number; product_id?: number };
+// Varias operaciones en un request; todas o ninguna
+export async function cartBatch(operations: CartOperation[], response: 'full' | 'delta' = 'delta') {
+  await ensureCsrf();
+  const token = document.cookie.split('; ').find(r => r.startsWith('csrftoken='))?.split('=')[1] ?? '';
+  return apiPost('/api/cart/batch/', { operations, response }, { 'X-CSRFToken': token });
+}
 export async function removeCartItem(item_id: number) {
   await ensureCsrf();
   const token = document.cookie.split('; ').find(r => r.startsWith('csrftoken='))?.split('=')[1] ?? '';